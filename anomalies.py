@@ -0,0 +1,237 @@
+"""
+Streaming anomaly detection
+
+Every write of test results updates running statistics for the supply and,
+when there is one, the sampling point it was taken at. Two series are
+tracked, each as the share of failed tests in one observation:
+
+    chlorine         chlorine_negative / chlorine_total at submission
+                     (no residual found)
+    bacteriological  positives among newly resolved samples, at submission
+                     and whenever pending samples get results
+
+The state of a series is one anomaly_stats row: count, mean and M2
+(Welford's online variance), an exponentially weighted moving average and
+the number of consecutive observations with a failure. Each observation
+updates it in O(1) inside the write's transaction. An observation raises:
+
+    consecutive  ANOMALY_CONSECUTIVE failing observations in a row
+    spike        a failure share ANOMALY_Z standard deviations above the
+                 series' mean (after ANOMALY_MIN_SAMPLES observations)
+    drift        the EWMA rising above mean + ANOMALY_DRIFT standard deviations
+
+Alerts are stored in anomaly_alerts and, after the write commits, sent as
+"anomaly_detected" to the admin room of the supply's parish
+(admin_<parish>, joined on connect).
+"""
+import math
+import time
+
+from flask import jsonify, request, session
+
+DEFAULT_CONFIG = {
+    'ANOMALY_CONSECUTIVE': 3,
+    'ANOMALY_Z': 3.0,
+    'ANOMALY_DRIFT': 2.0,
+    'ANOMALY_MIN_SAMPLES': 5,
+    'ANOMALY_EWMA_ALPHA': 0.3,
+    # Floor for the standard deviation, so a spotless history does not make any failure a 100-sigma spike
+    'ANOMALY_MIN_STD': 0.1,
+}
+
+METRICS = ('chlorine', 'bacteriological')
+
+MESSAGES = {
+    'consecutive': '{count} {metric} failures in a row at {name}',
+    'spike': '{metric} failures spiked at {name} ({value:.0%} vs usual {mean:.0%})',
+    'drift': '{metric} failure rate drifting up at {name} ({ewma:.0%} recently vs usual {mean:.0%})',
+}
+
+
+def parish_admin_room(parish):
+    return f"admin_{parish}"
+
+
+class SeriesState:
+    """Online statistics of one series (one anomaly_stats row)"""
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, ewma=None, consecutive=0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.consecutive = consecutive
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def update(self, value, failed, alpha):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+        self.consecutive = self.consecutive + 1 if failed else 0
+
+
+class AnomalyDetector:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.socketio = None
+        self.postgres = False
+
+    def init_app(self, app, connect, socketio, postgres=False):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self.socketio = socketio
+        self.postgres = postgres
+        self._register_routes(app)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def check(self, before, after, value):
+        """Kinds of anomaly raised by moving from state ``before`` to ``after`` with ``value``"""
+        config = self.app.config
+        kinds = []
+        if after.consecutive == config['ANOMALY_CONSECUTIVE']:
+            kinds.append('consecutive')
+        if before.n >= config['ANOMALY_MIN_SAMPLES']:
+            std = max(before.std, config['ANOMALY_MIN_STD'])
+            if value - before.mean >= config['ANOMALY_Z'] * std:
+                kinds.append('spike')
+            threshold = before.mean + config['ANOMALY_DRIFT'] * std
+            if before.ewma is not None and before.ewma < threshold <= after.ewma:
+                kinds.append('drift')
+        return kinds
+
+    def _observe(self, conn, scope, entity_id, metric, failures, total):
+        lock = ' FOR UPDATE' if self.postgres else ''
+        row = self._execute(conn, f'''
+            SELECT n, mean, m2, ewma, consecutive FROM anomaly_stats
+            WHERE scope = ? AND entity_id = ? AND metric = ?{lock}
+        ''', (scope, entity_id, metric)).fetchone()
+        before = SeriesState(**dict(row)) if row else SeriesState()
+        after = SeriesState(before.n, before.mean, before.m2, before.ewma, before.consecutive)
+        value = failures / total
+        after.update(value, failures > 0, self.app.config['ANOMALY_EWMA_ALPHA'])
+        self._execute(conn, '''
+            INSERT INTO anomaly_stats (scope, entity_id, metric, n, mean, m2, ewma, consecutive, last_value, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (scope, entity_id, metric) DO UPDATE
+            SET n = excluded.n, mean = excluded.mean, m2 = excluded.m2, ewma = excluded.ewma,
+                consecutive = excluded.consecutive, last_value = excluded.last_value, updated_at = excluded.updated_at
+        ''', (scope, entity_id, metric, after.n, after.mean, after.m2, after.ewma, after.consecutive, value,
+              time.time()))
+        return before, after, value
+
+    def record(self, conn, submission_id, supply_id, sampling_point_id, chlorine=None, bacteriological=None):
+        """
+        Update the series of a supply (and sampling point) with a write's
+        results, each given as (failed tests, tests) or None. Call with the
+        write's connection before its commit; returns the alerts to publish()
+        once it has committed.
+        """
+        observations = [(metric, counts) for metric, counts in zip(METRICS, (chlorine, bacteriological))
+                        if counts and counts[1] > 0]
+        if not observations:
+            return []
+        supply = self._execute(conn, 'SELECT name, parish FROM water_supplies WHERE id = ?', (supply_id,)).fetchone()
+        point = None
+        if sampling_point_id:
+            point = self._execute(conn, 'SELECT name FROM sampling_points WHERE id = ?',
+                                  (sampling_point_id,)).fetchone()
+        entities = [('supply', supply_id, supply['name'])]
+        if point is not None:
+            entities.append(('sampling_point', sampling_point_id, f"{point['name']} ({supply['name']})"))
+
+        alerts = []
+        now = time.time()
+        for metric, (failures, total) in observations:
+            for scope, entity_id, name in entities:
+                before, after, value = self._observe(conn, scope, entity_id, metric, failures, total)
+                for kind in self.check(before, after, value):
+                    message = MESSAGES[kind].format(count=after.consecutive, metric=metric.capitalize(), name=name,
+                                                    value=value, mean=before.mean, ewma=after.ewma or 0)
+                    alert = {
+                        'scope': scope, 'entity_id': entity_id, 'metric': metric, 'kind': kind,
+                        'value': value, 'mean': before.mean, 'std': before.std, 'ewma': after.ewma,
+                        'consecutive': after.consecutive, 'parish': supply['parish'], 'supply_id': supply_id,
+                        'sampling_point_id': sampling_point_id if scope == 'sampling_point' else None,
+                        'submission_id': submission_id, 'message': message, 'created_at': now,
+                    }
+                    cursor = self._execute(conn, f'''
+                        INSERT INTO anomaly_alerts
+                        (scope, entity_id, metric, kind, value, mean, std, ewma, consecutive, parish, supply_id,
+                         sampling_point_id, submission_id, message, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?){' RETURNING id' if self.postgres else ''}
+                    ''', tuple(alert[key] for key in (
+                        'scope', 'entity_id', 'metric', 'kind', 'value', 'mean', 'std', 'ewma', 'consecutive',
+                        'parish', 'supply_id', 'sampling_point_id', 'submission_id', 'message', 'created_at')))
+                    alert['id'] = cursor.fetchone()['id'] if self.postgres else cursor.lastrowid
+                    alerts.append(alert)
+        return alerts
+
+    def publish(self, alerts):
+        for alert in alerts:
+            print(f"[ANOMALY] {alert['parish']}: {alert['message']}")
+            self.socketio.emit('anomaly_detected', alert, room=parish_admin_room(alert['parish']))
+
+    def _register_routes(self, app):
+        @app.route('/api/admin/anomalies')
+        def anomaly_history():
+            """Alert history, newest first; ?parish=, ?supply_id=, ?limit= (default 50)"""
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            conditions, values = [], []
+            for name in ('parish', 'supply_id'):
+                if request.args.get(name):
+                    conditions.append(f'{name} = ?')
+                    values.append(request.args.get(name, type=int) if name == 'supply_id' else request.args[name])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+            conn = self.connect()
+            try:
+                rows = self._execute(conn, f'''
+                    SELECT * FROM anomaly_alerts {where} ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', values + [limit]).fetchall()
+            finally:
+                conn.close()
+            return jsonify([dict(row) for row in rows])
+
+        @app.route('/api/admin/anomalies/stats/<int:supply_id>')
+        def anomaly_stats(supply_id):
+            """Current series statistics of a supply and its sampling points"""
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            conn = self.connect()
+            try:
+                rows = self._execute(conn, '''
+                    SELECT st.* FROM anomaly_stats st
+                    WHERE (st.scope = 'supply' AND st.entity_id = ?)
+                       OR (st.scope = 'sampling_point'
+                           AND st.entity_id IN (SELECT id FROM sampling_points WHERE supply_id = ?))
+                    ORDER BY st.scope DESC, st.entity_id, st.metric
+                ''', (supply_id, supply_id)).fetchall()
+            finally:
+                conn.close()
+            stats = []
+            for row in rows:
+                row = dict(row)
+                state = SeriesState(row['n'], row['mean'], row['m2'], row['ewma'], row['consecutive'])
+                row['std'] = state.std
+                stats.append(row)
+            return jsonify(stats)
+
+
+anomalies = AnomalyDetector()
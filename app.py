@@ -1,22 +1,64 @@
-from flask import Flask, request, jsonify, session, redirect, url_for, render_template_string, render_template, send_file
+from flask import Flask, request, jsonify, session, redirect, url_for, render_template, send_file
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.utils import secure_filename
 import sqlite3
+import gzip
 import hashlib
 from datetime import datetime, date, timedelta
 import json
 import os
+import time
 import urllib.parse
 from dotenv import load_dotenv
+from json_provider import FastJSONProvider
+from compression import init_compression
+from data_cache import data_cache, month_scope, months_between
+from assets import init_assets
+from page_shells import PageShells
+from metrics import (db_connection_open_duration, db_connections, init_metrics, instrument_socketio, record_cache,
+                     submissions_written)
+from profiling import init_profiling
+from report_render import RENDER_VERSION, build_context, render_html, render_pdf
+from report_snapshots import report_snapshots
+from anomalies import anomalies, parish_admin_room
+from compliance import compliance
+from measurements import create_schema as create_measurement_schema, measurements
+from partitions import create_schema as create_partition_schema, partitions
+from priority_alerts import priority_alerts
+from scheduler import scheduler
+from search import create_schema as create_search_schema, search_index
+from typeahead import typeahead
+from submission_documents import render_bundle_batch, submission_documents
+from zip_stream import stream_zip
+from jobs import USER_FIELDS, JobError, JobFile, JobQueueFull, csv_file, init_jobs, run_view
+from perf import TimedSQLiteConnection, init_perf, timed_cursor_class, stats as perf_stats
+from water_supplies_data import PARISHES, PARISH_NAMES, get_parish
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = 'water-monitoring-secret-key-2024'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Sessions last 7 days
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/documents'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['PERF_ENABLED'] = os.environ.get('PERF_ENABLED', 'true').lower() == 'true'
+app.config['PERF_SQL_ENABLED'] = os.environ.get('PERF_SQL_ENABLED', 'true').lower() == 'true'
+app.config['PERF_SLOW_QUERY_MS'] = float(os.environ.get('PERF_SLOW_QUERY_MS', 100))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+# Registered first so their timing includes compression of the response
+init_perf(app)
+init_metrics(app)
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+init_profiling(app)
+init_compression(app)
+init_assets(app)
+# Before the page shells, which compile every template
+submission_documents.init_app(app)
+shells = PageShells()
+shells.init_app(app, parishes=PARISHES)
 
 # Allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg'}
@@ -24,6 +66,8 @@ ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 socketio = SocketIO(app, cors_allowed_origins="*")
+instrument_socketio(socketio)
+jobs = init_jobs(app, socketio)
 
 # Database configuration
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -32,6 +76,7 @@ if DATABASE_URL:
     try:
         import psycopg2
         from psycopg2.extras import RealDictCursor
+        TimedRealDictCursor = timed_cursor_class(RealDictCursor)
         USE_POSTGRESQL = True
         print("[STARTUP] Using PostgreSQL database")
 
@@ -162,6 +207,7 @@ def init_db():
                     remarks TEXT,
                     facility_type VARCHAR(100),
                     water_source_type VARCHAR(100),
+                    revision INTEGER NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (supply_id) REFERENCES water_supplies (id),
                     FOREIGN KEY (inspector_id) REFERENCES users (id),
@@ -169,6 +215,9 @@ def init_db():
                 )
             ''')
 
+            # Incremented by every update; keys the rendered document cache (submission_documents.py)
+            cursor.execute('ALTER TABLE inspection_submissions ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0')
+
             # Inspector signatures table for tracking multiple inspectors per submission
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS inspector_signatures (
@@ -178,7 +227,6 @@ def init_db():
                     action_type VARCHAR(50) NOT NULL,
                     signature_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     notes TEXT,
-                    FOREIGN KEY (submission_id) REFERENCES inspection_submissions (id),
                     FOREIGN KEY (inspector_id) REFERENCES users (id)
                 )
             ''')
@@ -216,6 +264,136 @@ def init_db():
                 )
             ''')
 
+            # Shared response cache and the data versions that invalidate it (data_cache.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    scope VARCHAR(50) PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    stamp TEXT NOT NULL,
+                    body BYTEA NOT NULL,
+                    created DOUBLE PRECISION NOT NULL
+                )
+            ''')
+
+            # Scheduled task state and leases (scheduler.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_tasks (
+                    name VARCHAR(100) PRIMARY KEY,
+                    holder VARCHAR(255),
+                    lease_until DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    last_run DOUBLE PRECISION,
+                    last_status TEXT,
+                    last_duration DOUBLE PRECISION
+                )
+            ''')
+
+            # Frozen reports of closed months and edits made after closing (report_snapshots.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS report_snapshots (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    body BYTEA NOT NULL,
+                    sha256 VARCHAR(64) NOT NULL,
+                    stamp TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    revision INTEGER NOT NULL DEFAULT 1,
+                    closed_at DOUBLE PRECISION NOT NULL,
+                    closed_by INTEGER,
+                    refreshed_at DOUBLE PRECISION NOT NULL,
+                    stale INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (year, month)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS report_snapshot_edits (
+                    id SERIAL PRIMARY KEY,
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    submission_id INTEGER,
+                    user_id INTEGER,
+                    action VARCHAR(50) NOT NULL,
+                    edited_at DOUBLE PRECISION NOT NULL
+                )
+            ''')
+
+            # Running statistics and alert history of the anomaly detector (anomalies.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_stats (
+                    scope VARCHAR(20) NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    metric VARCHAR(50) NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    mean DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    m2 DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    ewma DOUBLE PRECISION,
+                    consecutive INTEGER NOT NULL DEFAULT 0,
+                    last_value DOUBLE PRECISION,
+                    updated_at DOUBLE PRECISION NOT NULL,
+                    PRIMARY KEY (scope, entity_id, metric)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_alerts (
+                    id SERIAL PRIMARY KEY,
+                    scope VARCHAR(20) NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    metric VARCHAR(50) NOT NULL,
+                    kind VARCHAR(20) NOT NULL,
+                    value DOUBLE PRECISION NOT NULL,
+                    mean DOUBLE PRECISION,
+                    std DOUBLE PRECISION,
+                    ewma DOUBLE PRECISION,
+                    consecutive INTEGER,
+                    parish VARCHAR(100),
+                    supply_id INTEGER,
+                    sampling_point_id INTEGER,
+                    submission_id INTEGER,
+                    message TEXT NOT NULL,
+                    created_at DOUBLE PRECISION NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_anomaly_alerts_parish ON anomaly_alerts (parish, created_at)')
+
+            # Positive bacteriological results pushed to admins until acknowledged (priority_alerts.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS priority_alerts (
+                    id SERIAL PRIMARY KEY,
+                    submission_id INTEGER NOT NULL,
+                    supply_id INTEGER NOT NULL,
+                    sampling_point_id INTEGER,
+                    parish VARCHAR(100) NOT NULL,
+                    positives INTEGER NOT NULL,
+                    isolated_organism TEXT,
+                    message TEXT NOT NULL,
+                    written_at DOUBLE PRECISION NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    next_attempt_at DOUBLE PRECISION NOT NULL,
+                    displayed_at DOUBLE PRECISION,
+                    latency DOUBLE PRECISION,
+                    acknowledged_at DOUBLE PRECISION,
+                    acknowledged_by INTEGER
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_priority_alerts_open ON priority_alerts (next_attempt_at)
+                WHERE acknowledged_at IS NULL
+            ''')
+
+            # Range partitions of inspection_submissions by submission_date (partitions.py)
+            create_partition_schema(cursor, postgres=True)
+
+            # Full-text search index, kept in sync by triggers (search.py)
+            create_search_schema(cursor, postgres=True)
+
+            # One row per submission and parameter, from the *_params and *_range columns (measurements.py)
+            create_measurement_schema(cursor, postgres=True)
+
             # Documents table for Tool Kit
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS documents (
@@ -332,6 +510,7 @@ def init_db():
                     remarks TEXT,
                     facility_type TEXT,
                     water_source_type TEXT,
+                    revision INTEGER NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (supply_id) REFERENCES water_supplies (id),
                     FOREIGN KEY (inspector_id) REFERENCES users (id),
@@ -339,6 +518,13 @@ def init_db():
                 )
             ''')
 
+            # Incremented by every update; keys the rendered document cache (submission_documents.py)
+            try:
+                cursor.execute('ALTER TABLE inspection_submissions ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                # Column already exists
+                pass
+
             # Inspector signatures table for tracking multiple inspectors per submission
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS inspector_signatures (
@@ -386,6 +572,136 @@ def init_db():
                 )
             ''')
 
+            # Shared response cache and the data versions that invalidate it (data_cache.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    scope TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    stamp TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    created REAL NOT NULL
+                )
+            ''')
+
+            # Scheduled task state and leases (scheduler.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_tasks (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    last_run REAL,
+                    last_status TEXT,
+                    last_duration REAL
+                )
+            ''')
+
+            # Frozen reports of closed months and edits made after closing (report_snapshots.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS report_snapshots (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    stamp TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    revision INTEGER NOT NULL DEFAULT 1,
+                    closed_at REAL NOT NULL,
+                    closed_by INTEGER,
+                    refreshed_at REAL NOT NULL,
+                    stale INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (year, month)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS report_snapshot_edits (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    submission_id INTEGER,
+                    user_id INTEGER,
+                    action TEXT NOT NULL,
+                    edited_at REAL NOT NULL
+                )
+            ''')
+
+            # Running statistics and alert history of the anomaly detector (anomalies.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_stats (
+                    scope TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    metric TEXT NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    mean REAL NOT NULL DEFAULT 0,
+                    m2 REAL NOT NULL DEFAULT 0,
+                    ewma REAL,
+                    consecutive INTEGER NOT NULL DEFAULT 0,
+                    last_value REAL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (scope, entity_id, metric)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    metric TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    mean REAL,
+                    std REAL,
+                    ewma REAL,
+                    consecutive INTEGER,
+                    parish TEXT,
+                    supply_id INTEGER,
+                    sampling_point_id INTEGER,
+                    submission_id INTEGER,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_anomaly_alerts_parish ON anomaly_alerts (parish, created_at)')
+
+            # Positive bacteriological results pushed to admins until acknowledged (priority_alerts.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS priority_alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    submission_id INTEGER NOT NULL,
+                    supply_id INTEGER NOT NULL,
+                    sampling_point_id INTEGER,
+                    parish TEXT NOT NULL,
+                    positives INTEGER NOT NULL,
+                    isolated_organism TEXT,
+                    message TEXT NOT NULL,
+                    written_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    next_attempt_at REAL NOT NULL,
+                    displayed_at REAL,
+                    latency REAL,
+                    acknowledged_at REAL,
+                    acknowledged_by INTEGER
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_priority_alerts_open ON priority_alerts (next_attempt_at)
+                WHERE acknowledged_at IS NULL
+            ''')
+
+            # Archives of closed years and the submission_date indexes (partitions.py)
+            create_partition_schema(cursor)
+
+            # Full-text search index, kept in sync by triggers (search.py)
+            create_search_schema(cursor)
+
+            # One row per submission and parameter, from the *_params and *_range columns (measurements.py)
+            create_measurement_schema(cursor)
+
             # Documents table for Tool Kit
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS documents (
@@ -773,18 +1089,55 @@ def _populate_initial_data(conn, cursor):
             ''', sampling_points)
 
 def get_db_connection():
+    timed = app.config['PERF_SQL_ENABLED']
+    start = time.perf_counter()
     if USE_POSTGRESQL:
         try:
-            conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+            conn = psycopg2.connect(**DB_CONFIG, cursor_factory=TimedRealDictCursor if timed else RealDictCursor)
+            db_connection_open_duration.observe(time.perf_counter() - start, 'postgresql')
+            db_connections.inc('postgresql')
             return conn
         except Exception as e:
             print(f"[ERROR] PostgreSQL connection failed: {e}")
             raise
     else:
-        conn = sqlite3.connect(DATABASE)
+        conn = sqlite3.connect(DATABASE, factory=TimedSQLiteConnection if timed else sqlite3.Connection)
         conn.row_factory = sqlite3.Row
+        db_connection_open_duration.observe(time.perf_counter() - start, 'sqlite')
+        db_connections.inc('sqlite')
         return conn
 
+data_cache.init_app(app, get_db_connection, USE_POSTGRESQL)
+scheduler.init_app(app, get_db_connection, USE_POSTGRESQL)
+
+def supply_parish(conn, supply_id):
+    """Parish of a supply; labels submission write metrics by where the supply is, not who wrote"""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT parish FROM water_supplies WHERE id = {'%s' if USE_POSTGRESQL else '?'}", (supply_id,))
+    row = cursor.fetchone()
+    return row['parish'] if row else None
+
+def record_submission_write(conn, submission_date, submission_id, action):
+    """
+    Invalidate cached aggregates of the submission's month and flag the edit
+    when that month is closed. Call with the write's connection before its
+    commit; returns the month scope when a closed month was edited.
+    """
+    scope = month_scope(submission_date)
+    data_cache.bump(conn, scope)
+    if report_snapshots.flag_edit(conn, scope, submission_id, session.get('user_id'), action):
+        return scope
+    return None
+
+def refresh_closed_month(scope):
+    """After a closed month was edited: tell admins and rebuild its snapshot in the background"""
+    year, month = int(scope[:4]), int(scope[5:7])
+    socketio.emit('closed_month_edited', {'year': year, 'month': month}, room='admin')
+    try:
+        jobs.submit('report-snapshot', {'year': year, 'month': month}, SCHEDULER_USER)
+    except JobQueueFull:
+        print(f"[SNAPSHOT] Job queue full; {scope} is refreshed by the refresh-snapshots task")
+
 def execute_query(query, params=None, fetch=None):
     """
     Universal query executor that handles both PostgreSQL and SQLite
@@ -824,6 +1177,30 @@ def execute_query(query, params=None, fetch=None):
             conn.close()
         raise e
 
+def wants_columnar():
+    """True when the client asked for the columnar response format (?format=columnar)"""
+    return request.args.get('format') == 'columnar'
+
+def serialize_rows(cursor, rows):
+    """
+    Serialize fetched rows for a JSON response.
+    In columnar mode the rows become a column header plus value arrays read
+    straight from the cursor, otherwise the rows are returned as-is and
+    encoded as objects by the JSON provider.
+    """
+    if not wants_columnar():
+        return rows
+    return columnar_rows(cursor, rows)
+
+def columnar_rows(cursor, rows):
+    """Rows as a column header plus value arrays"""
+    columns = [description[0] for description in cursor.description]
+    if USE_POSTGRESQL:
+        values = [list(row.values()) for row in rows]
+    else:
+        values = [tuple(row) for row in rows]
+    return {'columns': columns, 'rows': values}
+
 def add_sample_data():
     '''Add sample inspection data for testing charts'''
     conn = get_db_connection()
@@ -903,18 +1280,12 @@ def index():
 
     # All admins go to the same admin dashboard regardless of parish
     if user_role == 'admin':
-        return render_template('admin.html')
+        return shells.response('admin.html')
 
-    # Inspectors go to their parish-specific dashboard
+    # Inspectors go to their parish dashboard
     elif user_role == 'inspector':
-        if user_parish == 'Trelawny':
-            return render_template('trelawny.html')
-        elif user_parish == 'Hanover':
-            return render_template('hanover.html')
-        elif user_parish == 'St. James':
-            return render_template('st_james.html')
-        elif user_parish == 'Westmoreland':
-            return render_template('westmoreland.html')
+        if get_parish(user_parish):
+            return shells.response('inspector_dashboard.html')
         else:
             # Fallback for unsupported parishes
             return redirect(url_for('login'))
@@ -926,84 +1297,38 @@ def index():
 def inspector():
     if 'user_id' not in session or session['role'] != 'inspector':
         return redirect(url_for('login'))
-    # Route to parish-specific dashboard based on user's parish
-    user_parish = session.get('parish', 'Westmoreland')
-    if user_parish == 'Trelawny':
-        return render_template('trelawny.html')
-    elif user_parish == 'Hanover':
-        return render_template('hanover.html')
-    elif user_parish == 'St. James':
-        return render_template('st_james.html')
-    else:
-        return render_template('westmoreland.html')
+    # The dashboard shell picks the user's parish itself
+    return shells.response('inspector_dashboard.html')
 
 @app.route('/admin')
 def admin():
     if 'user_id' not in session or session['role'] != 'admin':
         return redirect(url_for('login'))
-    return render_template('admin.html')
-
-@app.route('/trelawny')
-def trelawny():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # Only allow Trelawny inspectors or any admin to access this dashboard
-    user_parish = session.get('parish', 'Westmoreland')
-    user_role = session.get('role')
-
-    if user_role != 'admin' and user_parish != 'Trelawny':
-        return redirect(url_for('index'))
-
-    return render_template('trelawny.html')
-
-@app.route('/hanover')
-def hanover():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # Only allow Hanover inspectors or any admin to access this dashboard
-    user_parish = session.get('parish', 'Westmoreland')
-    user_role = session.get('role')
+    return shells.response('admin.html')
 
-    if user_role != 'admin' and user_parish != 'Hanover':
-        return redirect(url_for('index'))
-
-    return render_template('hanover.html')
-
-@app.route('/westmoreland')
-def westmoreland():
+def parish_dashboard(parish_name):
     if 'user_id' not in session:
         return redirect(url_for('login'))
 
-    # Only allow Westmoreland inspectors or any admin to access this dashboard
+    # Only allow the parish's inspectors or any admin to access its dashboard
     user_parish = session.get('parish', 'Westmoreland')
     user_role = session.get('role')
 
-    if user_role != 'admin' and user_parish != 'Westmoreland':
+    if user_role != 'admin' and user_parish != parish_name:
         return redirect(url_for('index'))
 
-    return render_template('westmoreland.html')
+    return shells.response('inspector_dashboard.html')
 
-@app.route('/st_james')
-def st_james():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # Only allow St. James inspectors or any admin to access this dashboard
-    user_parish = session.get('parish', 'Westmoreland')
-    user_role = session.get('role')
-
-    if user_role != 'admin' and user_parish != 'St. James':
-        return redirect(url_for('index'))
-
-    return render_template('st_james.html')
+# /westmoreland, /trelawny, /hanover, /st_james: one shell, parish read from the URL
+for _parish in PARISHES:
+    app.add_url_rule(f"/{_parish['slug']}", endpoint=_parish['slug'], view_func=parish_dashboard,
+                     defaults={'parish_name': _parish['name']})
 
 @app.route('/report')
 def report():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    return render_template('report.html')
+    return shells.response('report.html')
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -1031,7 +1356,7 @@ def login():
                 conn.close()
 
             # Allow users from supported parishes
-            supported_parishes = ['Westmoreland', 'Trelawny', 'Hanover', 'St. James']
+            supported_parishes = PARISH_NAMES
             if user_parish not in supported_parishes:
                 return jsonify({
                     'success': False,
@@ -1048,467 +1373,7 @@ def login():
         else:
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
 
-    return render_template_string('''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Water Quality Monitoring - Login</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            min-height: 100vh;
-            display: flex;
-            align-items: flex-end;
-            justify-content: flex-end;
-            overflow: hidden;
-            position: relative;
-            padding: 20px;
-        }
-
-        .video-background {
-            position: fixed;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            width: 100vh;
-            height: 100vh;
-            object-fit: cover;
-            object-position: center;
-            z-index: 0;
-            border-radius: 15px;
-            box-shadow:
-                0 8px 32px rgba(0, 0, 0, 0.3),
-                0 4px 16px rgba(0, 0, 0, 0.2),
-                inset 0 0 0 1px rgba(255, 255, 255, 0.1),
-                0 0 0 1px rgba(255, 255, 255, 0.05);
-        }
-
-        /* Video container with water reflection effect */
-        .video-container {
-            position: fixed;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            width: 100vh;
-            height: 100vh;
-            z-index: 0;
-            border-radius: 15px;
-        }
-
-        .video-container::before {
-            content: '';
-            position: absolute;
-            top: -10px;
-            left: -10px;
-            right: -10px;
-            bottom: -10px;
-            background: radial-gradient(ellipse at center, rgba(173, 216, 230, 0.3) 0%, transparent 70%);
-            border-radius: 25px;
-            z-index: -1;
-        }
-
-        .video-container::after {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: linear-gradient(135deg,
-                rgba(255, 255, 255, 0.1) 0%,
-                transparent 20%,
-                transparent 80%,
-                rgba(0, 0, 0, 0.1) 100%);
-            border-radius: 15px;
-            pointer-events: none;
-            z-index: 1;
-        }
-
-
-        .login-container {
-            background: rgba(255, 255, 255, 0.95);
-            backdrop-filter: blur(10px);
-            -webkit-backdrop-filter: blur(10px);
-            padding: 25px;
-            border-radius: 15px;
-            box-shadow: 0 20px 50px rgba(0, 0, 0, 0.3);
-            width: 100%;
-            max-width: 350px;
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            z-index: 1;
-            position: relative;
-        }
-
-        .login-header {
-            text-align: center;
-            margin-bottom: 20px;
-        }
-
-        .login-header h1 {
-            color: #333;
-            font-size: 22px;
-            margin-bottom: 8px;
-            text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-
-        .login-header p {
-            color: #666;
-            font-size: 14px;
-        }
-
-        .form-group {
-            margin-bottom: 15px;
-        }
-
-        .form-group label {
-            display: block;
-            margin-bottom: 8px;
-            color: #333;
-            font-weight: 600;
-            font-size: 14px;
-        }
-
-        .form-group input {
-            width: 100%;
-            padding: 14px;
-            border: 2px solid rgba(102, 126, 234, 0.2);
-            border-radius: 8px;
-            font-size: 16px;
-            background: rgba(255, 255, 255, 0.9);
-            transition: all 0.3s ease;
-        }
-
-        .form-group input:focus {
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 15px rgba(102, 126, 234, 0.2);
-            background: white;
-        }
-
-        .login-btn {
-            width: 100%;
-            padding: 14px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            border-radius: 8px;
-            font-size: 16px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-        }
-
-        .login-btn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
-        }
-
-        .login-btn:active {
-            transform: translateY(0);
-        }
-
-        .demo-creds {
-            margin-top: 15px;
-            padding: 15px;
-            background: rgba(248, 249, 250, 0.9);
-            backdrop-filter: blur(5px);
-            border-radius: 8px;
-            font-size: 12px;
-            border: 1px solid rgba(0,0,0,0.1);
-        }
-
-        .demo-creds h4 {
-            color: #333;
-            margin-bottom: 8px;
-            font-size: 13px;
-        }
-
-        .demo-creds p {
-            margin: 5px 0;
-            color: #555;
-        }
-
-        .alert {
-            padding: 12px;
-            margin-bottom: 20px;
-            border-radius: 8px;
-            color: #721c24;
-            background: rgba(248, 215, 218, 0.95);
-            border: 1px solid rgba(245, 198, 203, 0.8);
-            backdrop-filter: blur(5px);
-            display: none;
-        }
-
-        /* Water-themed background */
-        .video-fallback {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(180deg, #87ceeb 0%, #4682b4 50%, #1e6091 100%);
-            z-index: -2;
-        }
-
-        /* Water bubbles animation container */
-        .water-effects {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            z-index: -1;
-            pointer-events: none;
-            overflow: hidden;
-        }
-
-        .water-bubble {
-            position: absolute;
-            border-radius: 50%;
-            background: radial-gradient(circle at 30% 30%, rgba(255, 255, 255, 0.8), rgba(173, 216, 230, 0.6), rgba(135, 206, 250, 0.3));
-            box-shadow: inset 0 0 10px rgba(255, 255, 255, 0.5), 0 0 20px rgba(173, 216, 230, 0.3);
-            animation: bubbleFloat 8s linear infinite;
-        }
-
-        /* Different bubble sizes and positions */
-        .water-bubble:nth-child(1) { width: 15px; height: 15px; left: 5%; animation-delay: 0s; animation-duration: 6s; }
-        .water-bubble:nth-child(2) { width: 25px; height: 25px; left: 15%; animation-delay: -1s; animation-duration: 8s; }
-        .water-bubble:nth-child(3) { width: 12px; height: 12px; left: 25%; animation-delay: -2s; animation-duration: 7s; }
-        .water-bubble:nth-child(4) { width: 30px; height: 30px; left: 35%; animation-delay: -3s; animation-duration: 9s; }
-        .water-bubble:nth-child(5) { width: 8px; height: 8px; left: 45%; animation-delay: -4s; animation-duration: 5s; }
-        .water-bubble:nth-child(6) { width: 20px; height: 20px; left: 55%; animation-delay: -1.5s; animation-duration: 7.5s; }
-        .water-bubble:nth-child(7) { width: 18px; height: 18px; left: 65%; animation-delay: -2.5s; animation-duration: 6.5s; }
-        .water-bubble:nth-child(8) { width: 22px; height: 22px; left: 75%; animation-delay: -0.5s; animation-duration: 8.5s; }
-        .water-bubble:nth-child(9) { width: 14px; height: 14px; left: 85%; animation-delay: -3.5s; animation-duration: 7s; }
-        .water-bubble:nth-child(10) { width: 28px; height: 28px; left: 95%; animation-delay: -1.2s; animation-duration: 9s; }
-
-        /* Right side bubbles */
-        .water-bubble:nth-child(11) { width: 16px; height: 16px; right: 5%; animation-delay: -0.8s; animation-duration: 6.8s; }
-        .water-bubble:nth-child(12) { width: 24px; height: 24px; right: 15%; animation-delay: -2.2s; animation-duration: 8.2s; }
-        .water-bubble:nth-child(13) { width: 11px; height: 11px; right: 25%; animation-delay: -3.8s; animation-duration: 5.8s; }
-        .water-bubble:nth-child(14) { width: 26px; height: 26px; right: 35%; animation-delay: -1.8s; animation-duration: 7.8s; }
-        .water-bubble:nth-child(15) { width: 19px; height: 19px; right: 45%; animation-delay: -2.8s; animation-duration: 6.8s; }
-
-        /* Additional scattered bubbles */
-        .water-bubble:nth-child(16) { width: 13px; height: 13px; left: 10%; animation-delay: -4.5s; animation-duration: 6.2s; }
-        .water-bubble:nth-child(17) { width: 21px; height: 21px; left: 30%; animation-delay: -1.7s; animation-duration: 8.7s; }
-        .water-bubble:nth-child(18) { width: 17px; height: 17px; left: 50%; animation-delay: -3.2s; animation-duration: 7.2s; }
-        .water-bubble:nth-child(19) { width: 23px; height: 23px; left: 70%; animation-delay: -0.7s; animation-duration: 5.7s; }
-        .water-bubble:nth-child(20) { width: 15px; height: 15px; left: 90%; animation-delay: -2.7s; animation-duration: 6.7s; }
-
-        /* Water ripple effects */
-        .water-ripple {
-            position: absolute;
-            border: 2px solid rgba(173, 216, 230, 0.4);
-            border-radius: 50%;
-            animation: ripple 4s ease-out infinite;
-        }
-
-        .water-ripple:nth-child(21) {
-            width: 50px;
-            height: 50px;
-            top: 20%;
-            left: 20%;
-            animation-delay: 0s;
-        }
-
-        .water-ripple:nth-child(22) {
-            width: 80px;
-            height: 80px;
-            top: 60%;
-            right: 25%;
-            animation-delay: -2s;
-        }
-
-        .water-ripple:nth-child(23) {
-            width: 60px;
-            height: 60px;
-            bottom: 30%;
-            left: 80%;
-            animation-delay: -1s;
-        }
-
-        @keyframes bubbleFloat {
-            0% {
-                transform: translateY(100vh) translateX(0px) scale(0);
-                opacity: 0;
-            }
-            10% {
-                opacity: 1;
-                transform: translateY(90vh) translateX(0px) scale(1);
-            }
-            50% {
-                transform: translateY(50vh) translateX(20px) scale(1.1);
-                opacity: 0.8;
-            }
-            100% {
-                transform: translateY(-10vh) translateX(-10px) scale(0.8);
-                opacity: 0;
-            }
-        }
-
-        @keyframes ripple {
-            0% {
-                transform: scale(0);
-                opacity: 1;
-            }
-            50% {
-                opacity: 0.5;
-            }
-            100% {
-                transform: scale(4);
-                opacity: 0;
-            }
-        }
-
-
-        /* Mobile responsive */
-        @media (max-width: 480px) {
-            body {
-                align-items: center;
-                justify-content: center;
-                padding: 15px;
-            }
-
-            .login-container {
-                max-width: 100%;
-                padding: 20px;
-            }
-
-            .login-header h1 {
-                font-size: 20px;
-            }
-        }
-    </style>
-</head>
-<body>
-    <!-- Fallback background -->
-    <div class="video-fallback"></div>
-
-    <!-- Water effects with bubbles and ripples -->
-    <div class="water-effects">
-        <!-- Water bubbles -->
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <div class="water-bubble"></div>
-        <!-- Water ripples -->
-        <div class="water-ripple"></div>
-        <div class="water-ripple"></div>
-        <div class="water-ripple"></div>
-    </div>
-
-    <!-- Video background with tile effect -->
-    <div class="video-container">
-        <video class="video-background" autoplay muted loop playsinline>
-            <source src="{{ url_for('static', filename='videos/water.mp4') }}" type="video/mp4">
-            <!-- Fallback for browsers that don't support video -->
-            Your browser does not support the video tag.
-        </video>
-    </div>
-
-
-
-    <div class="login-container">
-        <div class="login-header">
-            <h1>💧 Water Quality Monitoring</h1>
-            <p>Please sign in to continue</p>
-        </div>
-
-        <div id="alert" class="alert"></div>
-
-        <form id="loginForm">
-            <div class="form-group">
-                <label for="username">Username</label>
-                <input type="text" id="username" name="username" required autocomplete="username">
-            </div>
-            <div class="form-group">
-                <label for="password">Password</label>
-                <input type="password" id="password" name="password" required autocomplete="current-password">
-            </div>
-            <button type="submit" class="login-btn">Sign In</button>
-        </form>
-
-        <div class="demo-creds">
-            <h4>🔑 Demo Credentials:</h4>
-            <p><strong>Admin:</strong> admin / admin123</p>
-            <p><strong>Inspector:</strong> inspector / inspector123</p>
-        </div>
-    </div>
-
-    <script>
-        // Handle video loading errors
-        const video = document.querySelector('.video-background');
-
-        video.addEventListener('error', function() {
-            console.log('Video failed to load, using fallback background');
-            video.style.display = 'none';
-        });
-
-
-        // Ensure video plays on mobile devices
-        video.addEventListener('loadeddata', function() {
-            video.play().catch(function(error) {
-                console.log('Video autoplay failed:', error);
-                // Video will still show as a static frame
-            });
-        });
-
-
-
-        document.getElementById('loginForm').addEventListener('submit', async (e) => {
-            e.preventDefault();
-            const formData = new FormData(e.target);
-            const data = {
-                username: formData.get('username'),
-                password: formData.get('password')
-            };
-
-            try {
-                const response = await fetch('/login', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(data)
-                });
-
-                const result = await response.json();
-                if (result.success) {
-                    // Redirect to index route which will automatically route to correct dashboard
-                    window.location.href = '/';
-                } else {
-                    document.getElementById('alert').style.display = 'block';
-                    document.getElementById('alert').textContent = result.message;
-                }
-            } catch (error) {
-                document.getElementById('alert').style.display = 'block';
-                document.getElementById('alert').textContent = 'Login failed';
-            }
-        });
-    </script>
-</body>
-</html>
-    ''')
+    return shells.response('login.html')
 
 @app.route('/logout')
 def logout():
@@ -1537,7 +1402,7 @@ def get_supplies():
         (user_parish,)
     ).fetchall()
     conn.close()
-    return jsonify([dict(supply) for supply in supplies])
+    return jsonify(supplies)
 
 @app.route('/api/sampling-points/<int:supply_id>')
 def get_sampling_points(supply_id):
@@ -1588,7 +1453,7 @@ def get_sampling_points(supply_id):
                 WHERE sp.supply_id = ?
                 ORDER BY sp.name
             ''', (supply_id,)).fetchall()
-            result = [dict(point) for point in sampling_points]
+            result = sampling_points
 
         conn.close()
         print(f"[SAMPLING-POINTS] Found {len(result)} sampling points for supply_id {supply_id}")
@@ -1669,7 +1534,21 @@ def debug_database_status():
             }
         }), 500
 
+# Days of history shown for each chart range; anything else means two years
+CHART_RANGE_DAYS = {'3months': 90, '6months': 180, 'year': 365}
+
+def chart_range_start(time_range, now):
+    return now - timedelta(days=CHART_RANGE_DAYS.get(time_range, 730))
+
+def current_month_scopes():
+    return [month_scope(date.today())]
+
+def chart_range_scopes():
+    now = datetime.now()
+    return months_between(chart_range_start(request.args.get('range', '3months'), now), now)
+
 @app.route('/api/monthly-data')
+@data_cache.cached(current_month_scopes)
 def get_monthly_data():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -1681,7 +1560,7 @@ def get_monthly_data():
     conn = get_db_connection()
 
     # Get cumulative data from individual submissions for current month
-    monthly_data = conn.execute('''
+    cursor = conn.execute('''
         SELECT
             ws.id as supply_id,
             ws.name as supply_name,
@@ -1701,16 +1580,21 @@ def get_monthly_data():
             AND strftime('%Y', sub.submission_date) = ?
         GROUP BY ws.id, ws.name, ws.type, ws.agency
         ORDER BY ws.type, ws.agency, ws.name
-    ''', (f"{month:02d}", str(year))).fetchall()
+    ''', (f"{month:02d}", str(year)))
+    monthly_data = cursor.fetchall()
     conn.close()
 
+    if wants_columnar():
+        return jsonify(serialize_rows(cursor, monthly_data))
+
     result = {}
     for data in monthly_data:
-        result[data['supply_id']] = dict(data)
+        result[data['supply_id']] = data
 
     return jsonify(result)
 
 @app.route('/api/dashboard-data')
+@data_cache.cached(current_month_scopes)
 def get_dashboard_data():
     """Combined endpoint for admin dashboard - returns both supplies and monthly data"""
     if 'user_id' not in session:
@@ -1723,10 +1607,11 @@ def get_dashboard_data():
     conn = get_db_connection()
 
     # Get all supplies
-    supplies = conn.execute('SELECT * FROM water_supplies ORDER BY type, name').fetchall()
+    supplies_cursor = conn.execute('SELECT * FROM water_supplies ORDER BY type, name')
+    supplies = supplies_cursor.fetchall()
 
     # Get cumulative data from individual submissions for current month
-    monthly_data = conn.execute('''
+    cursor = conn.execute('''
         SELECT
             ws.id as supply_id,
             ws.name as supply_name,
@@ -1746,21 +1631,29 @@ def get_dashboard_data():
             AND strftime('%Y', sub.submission_date) = ?
         GROUP BY ws.id, ws.name, ws.type, ws.agency
         ORDER BY ws.type, ws.agency, ws.name
-    ''', (f"{month:02d}", str(year))).fetchall()
+    ''', (f"{month:02d}", str(year)))
+    monthly_data = cursor.fetchall()
 
     conn.close()
 
+    if wants_columnar():
+        return jsonify({
+            'supplies': serialize_rows(supplies_cursor, supplies),
+            'monthly_data': serialize_rows(cursor, monthly_data)
+        })
+
     # Format monthly data as dict indexed by supply_id
     monthly_data_dict = {}
     for data in monthly_data:
-        monthly_data_dict[data['supply_id']] = dict(data)
+        monthly_data_dict[data['supply_id']] = data
 
     return jsonify({
-        'supplies': [dict(supply) for supply in supplies],
+        'supplies': supplies,
         'monthly_data': monthly_data_dict
     })
 
 @app.route('/api/chart-data')
+@data_cache.cached(chart_range_scopes, daily=True)
 def get_chart_data():
     """Chart data endpoint for analytics visualization"""
     if 'user_id' not in session:
@@ -1775,14 +1668,9 @@ def get_chart_data():
     try:
         # Calculate date range
         now = datetime.now()
-        if time_range == '3months':
-            start_date = now - timedelta(days=90)
-        elif time_range == '6months':
-            start_date = now - timedelta(days=180)
-        elif time_range == 'year':
-            start_date = now - timedelta(days=365)
-        else:
-            start_date = now - timedelta(days=730)  # 2 years for 'all'
+        start_date = chart_range_start(time_range, now)
+        # Reaches into archived years only when the range covers them (partitions.py)
+        submissions = partitions.source(conn, start_date.date(), now.date())
 
         # Build supply filter condition
         supply_condition = ""
@@ -1801,7 +1689,7 @@ def get_chart_data():
                     DATE(s.submission_date) as date,
                     AVG(s.chlorine_total) as avg_chlorine,
                     ws.name as supply_name
-                FROM inspection_submissions s
+                FROM {submissions} s
                 JOIN water_supplies ws ON s.supply_id = ws.id
                 WHERE s.submission_date >= ?{supply_condition}
                 GROUP BY DATE(s.submission_date), s.supply_id
@@ -1815,7 +1703,7 @@ def get_chart_data():
                     DATE(s.submission_date) as date,
                     SUM(s.bacteriological_positive + s.bacteriological_negative + s.bacteriological_pending) as total_tests,
                     ws.name as supply_name
-                FROM inspection_submissions s
+                FROM {submissions} s
                 JOIN water_supplies ws ON s.supply_id = ws.id
                 WHERE s.submission_date >= ?{supply_condition}
                 GROUP BY DATE(s.submission_date), s.supply_id
@@ -1829,7 +1717,7 @@ def get_chart_data():
                     DATE(s.submission_date) as date,
                     SUM(s.visits) as total_visits,
                     ws.name as supply_name
-                FROM inspection_submissions s
+                FROM {submissions} s
                 JOIN water_supplies ws ON s.supply_id = ws.id
                 WHERE s.submission_date >= ?{supply_condition}
                 GROUP BY DATE(s.submission_date), s.supply_id
@@ -1843,7 +1731,7 @@ def get_chart_data():
                     DATE(s.submission_date) as date,
                     COUNT(DISTINCT s.supply_id) as supply_count,
                     ws.name as supply_name
-                FROM inspection_submissions s
+                FROM {submissions} s
                 JOIN water_supplies ws ON s.supply_id = ws.id
                 WHERE s.submission_date >= ?{supply_condition}
                 GROUP BY DATE(s.submission_date)
@@ -1888,7 +1776,7 @@ def get_chart_data():
                         ELSE 'High (> 1.0 mg/L)'
                     END as range_category,
                     COUNT(*) as count
-                FROM inspection_submissions s
+                FROM {submissions} s
                 WHERE s.submission_date >= ?{supply_condition}
                 GROUP BY range_category
             ''', params).fetchall()
@@ -1906,7 +1794,7 @@ def get_chart_data():
                     SUM(s.bacteriological_positive) as positive,
                     SUM(s.bacteriological_negative) as negative,
                     SUM(s.bacteriological_pending) as pending
-                FROM inspection_submissions s
+                FROM {submissions} s
                 WHERE s.submission_date >= ?{supply_condition}
             ''', params).fetchone()
 
@@ -1926,7 +1814,7 @@ def get_chart_data():
                 SELECT ws.type, COUNT(DISTINCT ws.id) as count
                 FROM water_supplies ws
                 WHERE EXISTS (
-                    SELECT 1 FROM inspection_submissions s
+                    SELECT 1 FROM {submissions} s
                     WHERE s.supply_id = ws.id AND s.submission_date >= ?
                     {ws_supply_condition}
                 )
@@ -1952,6 +1840,7 @@ def get_chart_data():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/parish-comparison')
+@data_cache.cached(chart_range_scopes, daily=True)
 def get_parish_comparison():
     """Parish comparison data endpoint for multi-parish analytics"""
     if 'user_id' not in session:
@@ -1965,27 +1854,21 @@ def get_parish_comparison():
     try:
         # Calculate date range
         now = datetime.now()
-        if time_range == '3months':
-            start_date = now - timedelta(days=90)
-        elif time_range == '6months':
-            start_date = now - timedelta(days=180)
-        elif time_range == 'year':
-            start_date = now - timedelta(days=365)
-        else:
-            start_date = now - timedelta(days=730)  # 2 years for 'all'
+        start_date = chart_range_start(time_range, now)
+        submissions = partitions.source(conn, start_date.date(), now.date())
 
         parish_data = {}
-        parishes = ['Westmoreland', 'Trelawny', 'Hanover', 'St. James']  # Add more as needed
+        parishes = PARISH_NAMES
 
         for parish in parishes:
             if chart_type == 'chlorine':
                 # Get chlorine data for this parish
-                query = '''
+                query = f'''
                     SELECT
                         DATE(s.submission_date) as date,
                         AVG(s.chlorine_total) as avg_chlorine,
                         COUNT(*) as count
-                    FROM inspection_submissions s
+                    FROM {submissions} s
                     JOIN water_supplies ws ON s.supply_id = ws.id
                     WHERE s.submission_date >= ? AND ws.parish = ?
                     GROUP BY DATE(s.submission_date)
@@ -2011,12 +1894,12 @@ def get_parish_comparison():
 
             elif chart_type == 'visits':
                 # Get visits data for this parish
-                query = '''
+                query = f'''
                     SELECT
                         DATE(s.submission_date) as date,
                         SUM(s.visits) as total_visits,
                         COUNT(*) as count
-                    FROM inspection_submissions s
+                    FROM {submissions} s
                     JOIN water_supplies ws ON s.supply_id = ws.id
                     WHERE s.submission_date >= ? AND ws.parish = ?
                     GROUP BY DATE(s.submission_date)
@@ -2049,13 +1932,8 @@ def get_parish_comparison():
 
 def get_parish_color(parish):
     """Return consistent colors for each parish"""
-    colors = {
-        'Westmoreland': '#667eea',  # Blue
-        'Trelawny': '#28a745',      # Green
-        'Hanover': '#dc3545',       # Red
-        'St. James': '#fd7e14'      # Orange
-    }
-    return colors.get(parish, '#6c757d')  # Default gray
+    entry = get_parish(parish)
+    return entry['color'] if entry else '#6c757d'  # Default gray
 
 
 @app.route('/api/submit-inspection', methods=['POST'])
@@ -2185,8 +2063,27 @@ def submit_inspection():
                 WHERE s.id = ?
             ''', (submission_id,)).fetchone()
 
+        chlorine_total = submission_data['chlorine_total'] or 0
+        bacteriological_results = (submission_data['bacteriological_positive'] or 0) + \
+            (submission_data['bacteriological_negative'] or 0)
+        alerts = anomalies.record(conn, submission_id, submission_data['supply_id'],
+                                  submission_data['sampling_point_id'],
+                                  chlorine=(submission_data['chlorine_negative'] or 0, chlorine_total),
+                                  bacteriological=(submission_data['bacteriological_positive'] or 0,
+                                                   bacteriological_results))
+        priority_alert = priority_alerts.raise_alert(conn, submission_id, submission_data['bacteriological_positive'])
+        measurements.record(conn, submission_id)
+        edited_closed_month = record_submission_write(conn, submission_data['submission_date'], submission_id, 'create')
         conn.commit()
+        parish = supply_parish(conn, submission_data['supply_id'])
         conn.close()
+        # Positives go out first, ahead of everything else this request does
+        priority_alerts.send(priority_alert)
+
+        submissions_written.inc(parish, 'create')
+        if edited_closed_month:
+            refresh_closed_month(edited_closed_month)
+        anomalies.publish(alerts)
 
         # Emit real-time update to admin
         socketio.emit('new_submission', dict(submission_data), room='admin')
@@ -2201,27 +2098,97 @@ def submit_inspection():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# Columns of inspection_submissions that can be requested through ``fields=``
+SUBMISSION_COLUMNS = (
+    'id', 'supply_id', 'inspector_id', 'sampling_point_id', 'submission_date', 'visits',
+    'chlorine_total', 'chlorine_positive', 'chlorine_negative', 'chlorine_positive_range',
+    'chlorine_negative_range', 'bacteriological_total', 'bacteriological_positive',
+    'bacteriological_negative', 'bacteriological_pending', 'bacteriological_rejected',
+    'bacteriological_broken', 'bacteriological_rejected_reason', 'bacteriological_broken_reason',
+    'bacteriological_status', 'isolated_organism', 'ph_satisfactory', 'ph_non_satisfactory',
+    'ph_non_satisfactory_params', 'bacteriological_positive_status', 'bacteriological_negative_status',
+    'chemical_total', 'chemical_satisfactory', 'chemical_non_satisfactory',
+    'chemical_non_satisfactory_params', 'turbidity_satisfactory', 'turbidity_non_satisfactory',
+    'turbidity_non_satisfactory_range', 'temperature_satisfactory', 'temperature_non_satisfactory',
+    'temperature_non_satisfactory_range', 'remarks', 'facility_type', 'water_source_type', 'created_at'
+)
+
+# Whitelist of projectable fields mapped to the SQL expression that produces them
+SUBMISSION_FIELDS = {column: f's.{column}' for column in SUBMISSION_COLUMNS}
+SUBMISSION_FIELDS.update({
+    'supply_name': 'ws.name',
+    'type': 'ws.type',
+    'agency': 'ws.agency',
+    'parish': 'ws.parish',
+    'sampling_point_name': 'sp.name',
+    'sampling_point_location': 'sp.location',
+    'inspector_name': 'u.full_name',
+    'primary_inspector_name': 'u.full_name',
+})
+
+# Named projections usable as ``fields=<preset>``
+SUBMISSION_FIELD_PRESETS = {
+    'summary': (
+        'id', 'submission_date', 'supply_id', 'supply_name', 'type', 'sampling_point_name',
+        'bacteriological_status', 'bacteriological_positive', 'bacteriological_negative',
+        'bacteriological_pending', 'chlorine_positive', 'chlorine_negative', 'created_at'
+    ),
+}
+
+def submission_select_list(default, joined_fields):
+    """
+    Build the SELECT list for a submission query from the ``fields`` parameter.
+    Returns ``default`` when no projection is requested and raises ValueError
+    for fields outside the whitelist of the endpoint.
+    """
+    requested = request.args.get('fields', '').strip()
+    if not requested:
+        return default
+
+    allowed = set(SUBMISSION_COLUMNS) | set(joined_fields)
+    if requested in SUBMISSION_FIELD_PRESETS:
+        names = [name for name in SUBMISSION_FIELD_PRESETS[requested] if name in allowed]
+    else:
+        names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if not names:
+            raise ValueError('No fields requested')
+
+    return ', '.join(f'{SUBMISSION_FIELDS[name]} AS {name}' for name in names)
+
 @app.route('/api/my-submissions')
 def get_my_submissions():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
+    try:
+        select_list = submission_select_list(
+            '''s.*, ws.name as supply_name, ws.type, ws.agency, ws.parish,
+               sp.name as sampling_point_name, sp.location as sampling_point_location,
+               u.full_name as primary_inspector_name''',
+            ('supply_name', 'type', 'agency', 'parish', 'sampling_point_name',
+             'sampling_point_location', 'primary_inspector_name')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = get_db_connection()
     # Changed to show ALL submissions across all parishes, not just current inspector's
-    submissions = conn.execute('''
-        SELECT s.*, ws.name as supply_name, ws.type, ws.agency, ws.parish,
-               sp.name as sampling_point_name, sp.location as sampling_point_location,
-               u.full_name as primary_inspector_name
+    cursor = conn.execute(f'''
+        SELECT {select_list}
         FROM inspection_submissions s
         JOIN water_supplies ws ON s.supply_id = ws.id
         LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
         JOIN users u ON s.inspector_id = u.id
         ORDER BY s.created_at DESC
         LIMIT 50
-    ''').fetchall()
+    ''')
+    submissions = cursor.fetchall()
     conn.close()
 
-    return jsonify([dict(submission) for submission in submissions])
+    return jsonify(serialize_rows(cursor, submissions))
 
 @app.route('/api/submissions')
 def get_submissions():
@@ -2231,45 +2198,63 @@ def get_submissions():
     supply_id = request.args.get('supply_id')
     limit = request.args.get('limit', 10, type=int)
 
+    try:
+        select_list = submission_select_list(
+            '''s.*, ws.name as supply_name, ws.type, ws.agency,
+                   sp.name as sampling_point_name, sp.location as sampling_point_location''',
+            ('supply_name', 'type', 'agency', 'sampling_point_name', 'sampling_point_location')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = get_db_connection()
 
     if supply_id:
-        submissions = conn.execute('''
-            SELECT s.*, ws.name as supply_name, ws.type, ws.agency,
-                   sp.name as sampling_point_name, sp.location as sampling_point_location
+        cursor = conn.execute(f'''
+            SELECT {select_list}
             FROM inspection_submissions s
             JOIN water_supplies ws ON s.supply_id = ws.id
             LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
             WHERE s.supply_id = ?
             ORDER BY s.created_at DESC
             LIMIT ?
-        ''', (supply_id, limit)).fetchall()
+        ''', (supply_id, limit))
     else:
-        submissions = conn.execute('''
-            SELECT s.*, ws.name as supply_name, ws.type, ws.agency,
-                   sp.name as sampling_point_name, sp.location as sampling_point_location
+        cursor = conn.execute(f'''
+            SELECT {select_list}
             FROM inspection_submissions s
             JOIN water_supplies ws ON s.supply_id = ws.id
             LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
             ORDER BY s.created_at DESC
             LIMIT ?
-        ''', (limit,)).fetchall()
+        ''', (limit,))
+    submissions = cursor.fetchall()
 
     conn.close()
 
-    return jsonify([dict(submission) for submission in submissions])
+    return jsonify(serialize_rows(cursor, submissions))
 
 @app.route('/api/submission/<int:submission_id>')
 def get_submission_details(submission_id):
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
-    conn = get_db_connection()
-    submission = conn.execute('''
-        SELECT s.*, ws.name as supply_name, ws.type, ws.agency,
+    try:
+        select_list = submission_select_list(
+            '''s.*, ws.name as supply_name, ws.type, ws.agency,
                sp.name as sampling_point_name, sp.location as sampling_point_location,
-               u.full_name as inspector_name
-        FROM inspection_submissions s
+               u.full_name as inspector_name''',
+            ('supply_name', 'type', 'agency', 'sampling_point_name', 'sampling_point_location',
+             'inspector_name')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    # Archived years included: ids are never reused
+    submission = conn.execute(f'''
+        SELECT {select_list}
+        FROM {partitions.source(conn)} s
         JOIN water_supplies ws ON s.supply_id = ws.id
         LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
         JOIN users u ON s.inspector_id = u.id
@@ -2280,7 +2265,7 @@ def get_submission_details(submission_id):
     if not submission:
         return jsonify({'error': 'Submission not found'}), 404
 
-    return jsonify(dict(submission))
+    return jsonify(submission)
 
 @app.route('/api/submissions/<int:submission_id>')
 def get_submission_details_plural(submission_id):
@@ -2293,11 +2278,12 @@ def download_submission(submission_id):
         return jsonify({'error': 'Not authenticated'}), 401
 
     conn = get_db_connection()
-    submission = conn.execute('''
+    # Archived years included: ids are never reused
+    submission = conn.execute(f'''
         SELECT s.*, ws.name as supply_name, ws.type, ws.agency,
                sp.name as sampling_point_name, sp.location as sampling_point_location,
                u.full_name as inspector_name
-        FROM inspection_submissions s
+        FROM {partitions.source(conn)} s
         JOIN water_supplies ws ON s.supply_id = ws.id
         LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
         JOIN users u ON s.inspector_id = u.id
@@ -2308,8 +2294,7 @@ def download_submission(submission_id):
     if not submission:
         return jsonify({'error': 'Submission not found'}), 404
 
-    # Generate HTML content for the submission
-    html_content = generate_submission_html(dict(submission))
+    html_content = submission_documents.document(dict(submission))
 
     # For now, return the HTML as a file download
     from flask import make_response
@@ -2319,6 +2304,120 @@ def download_submission(submission_id):
 
     return response
 
+# Bulk download: submissions are read and rendered this many at a time
+SUBMISSION_BUNDLE_BATCH = 50
+
+@app.route('/api/submissions/download')
+def download_submissions_bundle():
+    """
+    ZIP of the submission documents matching ?parish=, ?month=YYYY-MM,
+    ?supply_id= and ?inspector_id= (inspectors only get their own). Rows are
+    read in keyset batches, rendered on the job process pool and the archive
+    is streamed as each document is written, so neither the result set nor
+    the archive is held in memory.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    conditions, values = [], []
+    start = end = None
+    parish = request.args.get('parish')
+    if parish:
+        if parish not in PARISH_NAMES:
+            return jsonify({'error': 'Unknown parish'}), 400
+        conditions.append('ws.parish = ?')
+        values.append(parish)
+    month = request.args.get('month')
+    if month:
+        try:
+            start = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            return jsonify({'error': 'month must be YYYY-MM'}), 400
+        end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+        conditions.append('s.submission_date >= ? AND s.submission_date < ?')
+        values += [start.isoformat(), end.isoformat()]
+    supply_id = request.args.get('supply_id', type=int)
+    if supply_id:
+        conditions.append('s.supply_id = ?')
+        values.append(supply_id)
+    inspector_id = request.args.get('inspector_id', type=int)
+    if session.get('role') != 'admin':
+        inspector_id = session['user_id']
+    if inspector_id:
+        conditions.append('s.inspector_id = ?')
+        values.append(inspector_id)
+
+    conn = get_db_connection()
+    # Archived years are included when the month (or, without one, the whole history) covers them
+    submissions = partitions.source(conn, start, end and end - timedelta(days=1))
+    sql = f'''
+        SELECT s.*, ws.name as supply_name, ws.type, ws.agency,
+               sp.name as sampling_point_name, sp.location as sampling_point_location,
+               u.full_name as inspector_name
+        FROM {submissions} s
+        JOIN water_supplies ws ON s.supply_id = ws.id
+        LEFT JOIN sampling_points sp ON s.sampling_point_id = sp.id
+        JOIN users u ON s.inspector_id = u.id
+        WHERE {' AND '.join(conditions + ['s.id > ?'])}
+        ORDER BY s.id
+        LIMIT {SUBMISSION_BUNDLE_BATCH}
+    '''
+    if USE_POSTGRESQL:
+        sql = sql.replace('?', '%s')
+
+    def fetch_batch(after_id):
+        # A short query per batch: no cursor (or SQLite read lock) stays open while the client downloads
+        cursor = conn.cursor()
+        cursor.execute(sql, values + [after_id])
+        return [dict(row) for row in cursor.fetchall()]
+
+    first = fetch_batch(0)
+    if not first:
+        conn.close()
+        return jsonify({'error': 'No submissions match the filter'}), 404
+
+    def batches():
+        batch = first
+        while batch:
+            yield batch
+            if len(batch) < SUBMISSION_BUNDLE_BATCH:
+                break
+            batch = fetch_batch(batch[-1]['id'])
+
+    try:
+        # Holds a slot of the process pool queue until the archive is written or the client goes away
+        rendered = jobs.imap(render_bundle_batch, batches())
+    except JobQueueFull:
+        conn.close()
+        response = jsonify({'error': 'Too many downloads in progress, try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    closed = False
+
+    def close():
+        # Called by the generator and by the response, which also closes when the client left before the first chunk
+        nonlocal closed
+        if not closed:
+            closed = True
+            rendered.close()
+            conn.close()
+
+    def generate():
+        try:
+            members = (member for batch in rendered for member in batch)
+            yield from stream_zip(members)
+        finally:
+            close()
+
+    name = '_'.join(part for part in ('submissions', secure_filename(parish or ''), month,
+                                      supply_id and f"supply{supply_id}",
+                                      inspector_id and f"inspector{inspector_id}") if part)
+    response = app.response_class(generate(), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    response.call_on_close(close)
+    return response
+
 @app.route('/api/update-sample/<int:submission_id>', methods=['POST'])
 def update_sample_results(submission_id):
     if 'user_id' not in session:
@@ -2335,14 +2434,16 @@ def update_sample_results(submission_id):
         if USE_POSTGRESQL:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT bacteriological_positive, bacteriological_negative, bacteriological_pending, inspector_id
+                SELECT bacteriological_positive, bacteriological_negative, bacteriological_pending, inspector_id,
+                       submission_date, supply_id, sampling_point_id
                 FROM inspection_submissions
                 WHERE id = %s
             ''', (submission_id,))
             result = cursor.fetchone()
         else:
             result = conn.execute('''
-                SELECT bacteriological_positive, bacteriological_negative, bacteriological_pending, inspector_id
+                SELECT bacteriological_positive, bacteriological_negative, bacteriological_pending, inspector_id,
+                       submission_date, supply_id, sampling_point_id
                 FROM inspection_submissions
                 WHERE id = ?
             ''', (submission_id,)).fetchone()
@@ -2355,6 +2456,9 @@ def update_sample_results(submission_id):
         current_negative = result[1] or 0
         current_pending = result[2] or 0
         inspector_id = result[3]
+        submission_date = result[4]
+        supply_id = result[5]
+        sampling_point_id = result[6]
 
         # Verify the user is the inspector who created this submission
         if inspector_id != session['user_id']:
@@ -2377,9 +2481,14 @@ def update_sample_results(submission_id):
                 UPDATE inspection_submissions
                 SET bacteriological_positive = %s,
                     bacteriological_negative = %s,
-                    bacteriological_pending = %s
+                    bacteriological_pending = %s,
+                    revision = revision + 1
                 WHERE id = %s
             ''', (new_positive, new_negative, new_pending, submission_id))
+            alerts = anomalies.record(conn, submission_id, supply_id, sampling_point_id,
+                                      bacteriological=(positive_add, positive_add + negative_add))
+            priority_alert = priority_alerts.raise_alert(conn, submission_id, positive_add)
+            edited_closed_month = record_submission_write(conn, submission_date, submission_id, 'update')
             conn.commit()
             cursor.close()
         else:
@@ -2387,12 +2496,23 @@ def update_sample_results(submission_id):
                 UPDATE inspection_submissions
                 SET bacteriological_positive = ?,
                     bacteriological_negative = ?,
-                    bacteriological_pending = ?
+                    bacteriological_pending = ?,
+                    revision = revision + 1
                 WHERE id = ?
             ''', (new_positive, new_negative, new_pending, submission_id))
+            alerts = anomalies.record(conn, submission_id, supply_id, sampling_point_id,
+                                      bacteriological=(positive_add, positive_add + negative_add))
+            priority_alert = priority_alerts.raise_alert(conn, submission_id, positive_add)
+            edited_closed_month = record_submission_write(conn, submission_date, submission_id, 'update')
             conn.commit()
 
+        parish = supply_parish(conn, supply_id)
         conn.close()
+        priority_alerts.send(priority_alert)
+        submissions_written.inc(parish, 'update')
+        if edited_closed_month:
+            refresh_closed_month(edited_closed_month)
+        anomalies.publish(alerts)
 
         return jsonify({
             'success': True,
@@ -2432,14 +2552,16 @@ def update_bacteriological():
         if USE_POSTGRESQL:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT inspector_id
+                SELECT inspector_id, submission_date, bacteriological_positive, bacteriological_negative, supply_id,
+                       sampling_point_id
                 FROM inspection_submissions
                 WHERE id = %s
             ''', (submission_id,))
             result = cursor.fetchone()
         else:
             result = conn.execute('''
-                SELECT inspector_id
+                SELECT inspector_id, submission_date, bacteriological_positive, bacteriological_negative, supply_id,
+                       sampling_point_id
                 FROM inspection_submissions
                 WHERE id = ?
             ''', (submission_id,)).fetchone()
@@ -2449,6 +2571,13 @@ def update_bacteriological():
             return jsonify({'error': 'Submission not found'}), 404
 
         inspector_id = result[0]
+        submission_date = result[1]
+        supply_id = result[4]
+        sampling_point_id = result[5]
+        # Only results added by this edit are new observations; corrections that lower the counts are not
+        positive_added = new_positive - (result[2] or 0)
+        negative_added = new_negative - (result[3] or 0)
+        added = (positive_added, positive_added + negative_added) if min(positive_added, negative_added) >= 0 else None
 
         # Verify the user is the inspector who created this submission
         if inspector_id != session['user_id']:
@@ -2463,9 +2592,13 @@ def update_bacteriological():
                     bacteriological_negative = %s,
                     bacteriological_pending = %s,
                     isolated_organism = %s,
-                    bacteriological_status = %s
+                    bacteriological_status = %s,
+                    revision = revision + 1
                 WHERE id = %s
             ''', (new_positive, new_negative, new_pending, organism, bacteriological_status, submission_id))
+            alerts = anomalies.record(conn, submission_id, supply_id, sampling_point_id, bacteriological=added)
+            priority_alert = priority_alerts.raise_alert(conn, submission_id, positive_added, organism)
+            edited_closed_month = record_submission_write(conn, submission_date, submission_id, 'update')
             conn.commit()
             cursor.close()
         else:
@@ -2475,12 +2608,22 @@ def update_bacteriological():
                     bacteriological_negative = ?,
                     bacteriological_pending = ?,
                     isolated_organism = ?,
-                    bacteriological_status = ?
+                    bacteriological_status = ?,
+                    revision = revision + 1
                 WHERE id = ?
             ''', (new_positive, new_negative, new_pending, organism, bacteriological_status, submission_id))
+            alerts = anomalies.record(conn, submission_id, supply_id, sampling_point_id, bacteriological=added)
+            priority_alert = priority_alerts.raise_alert(conn, submission_id, positive_added, organism)
+            edited_closed_month = record_submission_write(conn, submission_date, submission_id, 'update')
             conn.commit()
 
+        parish = supply_parish(conn, supply_id)
         conn.close()
+        priority_alerts.send(priority_alert)
+        submissions_written.inc(parish, 'update')
+        if edited_closed_month:
+            refresh_closed_month(edited_closed_month)
+        anomalies.publish(alerts)
 
         return jsonify({
             'success': True,
@@ -2498,290 +2641,6 @@ def update_bacteriological():
         print(f"Error updating bacteriological results: {e}")
         return jsonify({'error': f'Failed to update bacteriological results: {str(e)}'}), 500
 
-def generate_submission_html(submission):
-    # Format the submission date nicely
-    from datetime import datetime
-    created_date = datetime.strptime(submission['created_at'], '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y at %I:%M %p')
-
-    return f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Water Quality Inspection - {submission['supply_name']} - {submission['submission_date']}</title>
-    <style>
-        @media print {{
-            body {{ margin: 0; }}
-            .no-print {{ display: none; }}
-        }}
-
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background: #f5f5f5;
-            line-height: 1.6;
-        }}
-
-        .form-container {{
-            background: white;
-            padding: 2rem;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0, 0, 0, 0.1);
-        }}
-
-        .header {{
-            text-align: center;
-            margin-bottom: 2rem;
-            padding-bottom: 1rem;
-            border-bottom: 3px solid #667eea;
-        }}
-
-        .header h1 {{
-            color: #333;
-            margin: 0 0 10px 0;
-            font-size: 28px;
-        }}
-
-        .header p {{
-            color: #666;
-            margin: 5px 0;
-            font-size: 16px;
-        }}
-
-        .selected-supply {{
-            background: linear-gradient(135deg, #e3f2fd 0%, #f3e5f5 100%);
-            padding: 1.5rem;
-            border-radius: 8px;
-            margin-bottom: 2rem;
-            border-left: 5px solid #667eea;
-        }}
-
-        .selected-supply h3 {{
-            margin: 0 0 8px 0;
-            color: #333;
-            font-size: 22px;
-        }}
-
-        .selected-supply p {{
-            margin: 4px 0;
-            color: #666;
-        }}
-
-        .form-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 1.5rem;
-            margin-bottom: 2rem;
-        }}
-
-        .form-group {{
-            margin-bottom: 1rem;
-        }}
-
-        .form-group label {{
-            display: block;
-            margin-bottom: 8px;
-            color: #333;
-            font-weight: 600;
-            font-size: 14px;
-        }}
-
-        .form-value {{
-            padding: 12px;
-            border: 2px solid #ddd;
-            border-radius: 6px;
-            background: white;
-            min-height: 20px;
-            font-size: 16px;
-        }}
-
-        .test-section {{
-            background: #f8f9fa;
-            padding: 1.5rem;
-            border-radius: 8px;
-            margin-bottom: 1.5rem;
-            border: 1px solid #e9ecef;
-        }}
-
-        .test-section h3 {{
-            color: #333;
-            margin-bottom: 1.5rem;
-            font-size: 18px;
-            border-bottom: 2px solid #dee2e6;
-            padding-bottom: 8px;
-        }}
-
-        .test-inputs {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
-            gap: 1.5rem;
-        }}
-
-        .positive-field {{
-            background: #d4edda !important;
-            border-color: #28a745 !important;
-            color: #155724;
-        }}
-
-        .negative-field {{
-            background: #f8d7da !important;
-            border-color: #dc3545 !important;
-            color: #721c24;
-        }}
-
-        .pending-field {{
-            background: #fff3cd !important;
-            border-color: #ffc107 !important;
-            color: #856404;
-        }}
-
-        .range-info {{
-            color: #666;
-            font-size: 13px;
-            font-weight: bold;
-            margin-top: 8px;
-            padding: 4px 8px;
-            background: rgba(0,0,0,0.05);
-            border-radius: 4px;
-        }}
-
-        .footer {{
-            text-align: center;
-            margin-top: 3rem;
-            padding-top: 2rem;
-            border-top: 2px solid #eee;
-            color: #666;
-        }}
-
-        .footer p {{
-            margin: 8px 0;
-        }}
-
-        .print-button {{
-            background: #667eea;
-            color: white;
-            border: none;
-            padding: 12px 24px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 16px;
-            margin: 20px 0;
-        }}
-
-        .print-button:hover {{
-            background: #5a6fd8;
-        }}
-
-        .submission-id {{
-            position: absolute;
-            top: 20px;
-            right: 20px;
-            background: #667eea;
-            color: white;
-            padding: 8px 12px;
-            border-radius: 4px;
-            font-size: 12px;
-            font-weight: bold;
-        }}
-    </style>
-</head>
-<body>
-    <div class="submission-id">ID: {submission['id']}</div>
-
-    <div class="form-container">
-        <div class="header">
-            <h1>Water Quality Inspection Report</h1>
-            <p><strong>Inspector:</strong> {submission['inspector_name']}</p>
-            <p><strong>Submission ID:</strong> #{submission['id']}</p>
-        </div>
-
-        <button onclick="window.print()" class="print-button no-print">🖨️ Print This Report</button>
-
-        <div class="selected-supply">
-            <h3>{submission['supply_name']}</h3>
-            <p><strong>Agency:</strong> {submission['agency']} • <strong>Type:</strong> {submission['type'].title()} Supply</p>
-            {f"<p><strong>Sampling Point:</strong> {submission['sampling_point_name']}" + (f" ({submission['sampling_point_location']})" if submission['sampling_point_location'] else "") + "</p>" if submission['sampling_point_name'] else ""}
-        </div>
-
-        <div class="form-grid">
-            <div class="form-group">
-                <label>Submission Date</label>
-                <div class="form-value">{submission['submission_date']}</div>
-            </div>
-            <div class="form-group">
-                <label>Number of Visits</label>
-                <div class="form-value">{submission['visits']}</div>
-            </div>
-        </div>
-
-        {f'''
-        <div class="test-section">
-            <h3>Chlorine Residual Tests (Treated Supply)</h3>
-            <div class="test-inputs">
-                <div class="form-group">
-                    <label>Total Tests</label>
-                    <div class="form-value" style="background: #f8f9fa; border-color: #6c757d;">{submission['chlorine_total']}</div>
-                </div>
-                <div class="form-group">
-                    <label>Positive Results</label>
-                    <div class="form-value positive-field">{submission['chlorine_positive']}</div>
-                    {f'<div class="range-info">Range: {submission["chlorine_positive_range"]}</div>' if submission['chlorine_positive_range'] else ''}
-                </div>
-                <div class="form-group">
-                    <label>Negative Results</label>
-                    <div class="form-value negative-field">{submission['chlorine_negative']}</div>
-                    {f'<div class="range-info">Range: {submission["chlorine_negative_range"]}</div>' if submission['chlorine_negative_range'] else ''}
-                </div>
-            </div>
-        </div>
-        ''' if submission['type'] == 'treated' else ''}
-
-        <div class="test-section">
-            <h3>Bacteriological Tests</h3>
-            <div class="test-inputs">
-                <div class="form-group">
-                    <label>Positive Results</label>
-                    <div class="form-value positive-field">{submission['bacteriological_positive']}</div>
-                    {f'<div class="range-info">Isolated Organism: {submission["isolated_organism"]}</div>' if submission['isolated_organism'] else ''}
-                </div>
-                <div class="form-group">
-                    <label>Negative Results</label>
-                    <div class="form-value negative-field">{submission['bacteriological_negative']}</div>
-                </div>
-                <div class="form-group">
-                    <label>Result Pending</label>
-                    <div class="form-value pending-field">{submission['bacteriological_pending']}</div>
-                </div>
-            </div>
-        </div>
-
-        {f'''
-        <div class="test-section">
-            <h3>Inspector Remarks</h3>
-            <div class="form-group">
-                <div class="form-value" style="min-height: 80px; white-space: pre-wrap;">{submission['remarks']}</div>
-            </div>
-        </div>
-        ''' if submission['remarks'] else ''}
-
-        <div class="footer">
-            <p><strong>Report Generated:</strong> {created_date}</p>
-            <p><strong>Water Quality Monitoring System</strong></p>
-            <p>This is an official inspection record.</p>
-        </div>
-    </div>
-
-    <script>
-        // Auto-focus for better user experience
-        document.addEventListener('DOMContentLoaded', function() {{
-            console.log('Water Quality Inspection Report loaded successfully');
-        }});
-    </script>
-</body>
-</html>'''
-
 @app.route('/api/update-supply-data', methods=['POST'])
 def update_supply_data():
     if 'user_id' not in session:
@@ -2835,14 +2694,36 @@ def update_supply_data():
 def get_monthly_report(year, month):
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
+    if not 1 <= month <= 12:
+        return jsonify({'error': 'Invalid month'}), 400
 
+    # Closed months are served from their frozen snapshot, ahead of the response cache of the live report
+    snapshot = report_snapshots.load(year, month)
+    if snapshot is not None:
+        return report_snapshots.response(snapshot, columnar=wants_columnar())
+    return live_monthly_report(year=year, month=month)
+
+@data_cache.cached(lambda year, month: [month_scope((year, month))])
+def live_monthly_report(year, month):
     conn = get_db_connection()
+    (supplies_cursor, supplies), (cursor, monthly_data) = query_monthly_report(conn, year, month)
+    conn.close()
+
+    return jsonify({
+        'supplies': serialize_rows(supplies_cursor, supplies),
+        'monthly_data': serialize_rows(cursor, monthly_data)
+    })
 
+def query_monthly_report(conn, year, month):
+    """Supplies and per-supply totals of one month, each as (cursor, rows)"""
     # Get all supplies
-    supplies = conn.execute('SELECT * FROM water_supplies ORDER BY type, agency, name').fetchall()
+    supplies_cursor = conn.execute('SELECT * FROM water_supplies ORDER BY type, agency, name')
+    supplies = supplies_cursor.fetchall()
 
     # Get cumulative data from individual submissions for the specified month/year
-    monthly_data = conn.execute('''
+    first = date(year, month, 1)
+    submissions = partitions.source(conn, first, first)
+    cursor = conn.execute(f'''
         SELECT
             ws.id as supply_id,
             ws.name as supply_name,
@@ -2858,19 +2739,92 @@ def get_monthly_report(year, month):
             GROUP_CONCAT(sub.remarks, '; ') as remarks,
             MAX(sub.created_at) as last_updated
         FROM water_supplies ws
-        LEFT JOIN inspection_submissions sub ON ws.id = sub.supply_id
+        LEFT JOIN {submissions} sub ON ws.id = sub.supply_id
             AND strftime('%m', sub.submission_date) = ?
             AND strftime('%Y', sub.submission_date) = ?
         GROUP BY ws.id, ws.name, ws.type, ws.agency
         ORDER BY ws.type, ws.agency, ws.name
-    ''', (f"{month:02d}", str(year))).fetchall()
+    ''', (f"{month:02d}", str(year)))
+    monthly_data = cursor.fetchall()
+    return (supplies_cursor, supplies), (cursor, monthly_data)
+
+def report_snapshot_data(conn, year, month):
+    """The monthly report in the columnar form stored by report_snapshots"""
+    (supplies_cursor, supplies), (cursor, monthly_data) = query_monthly_report(conn, year, month)
+    return {
+        'supplies': columnar_rows(supplies_cursor, supplies),
+        'monthly_data': columnar_rows(cursor, monthly_data)
+    }
 
-    conn.close()
+report_snapshots.init_app(app, get_db_connection, build=report_snapshot_data, stamp=data_cache.stamp,
+                          postgres=USE_POSTGRESQL)
+search_index.init_app(app, get_db_connection, USE_POSTGRESQL)
+typeahead.init_app(app, get_db_connection)
+anomalies.init_app(app, get_db_connection, socketio, USE_POSTGRESQL)
+priority_alerts.init_app(app, get_db_connection, socketio, USE_POSTGRESQL)
+compliance.init_app(app, get_db_connection, USE_POSTGRESQL)
+measurements.init_app(app, get_db_connection, USE_POSTGRESQL)
+partitions.init_app(app, get_db_connection, USE_POSTGRESQL)
+
+# Print-ready report (see report_render.py)
+REPORT_RENDER_FORMATS = {'html': 'text/html; charset=utf-8', 'pdf': 'application/pdf'}
+
+def report_render_key(year, month, parish, fmt):
+    return f"report-render:v{RENDER_VERSION}:{year}-{month:02d}:{parish or 'all'}:{fmt}"
+
+def report_render_filename(year, month, parish, fmt):
+    suffix = f"-{parish.lower().replace(' ', '-').replace('.', '')}" if parish else ''
+    return f"water-quality-report-{year}-{month:02d}{suffix}.{fmt}"
+
+def load_report_for_render(year, month):
+    """(columnar report, data version stamp) - from the month's snapshot when it is current"""
+    snapshot = report_snapshots.load(year, month)
+    if snapshot is not None:
+        return app.json.loads(gzip.decompress(bytes(snapshot['body']))), snapshot['stamp']
+    conn = get_db_connection()
+    try:
+        stamp = data_cache.stamp(conn, report_snapshots.scopes(year, month))
+        return report_snapshot_data(conn, year, month), stamp
+    finally:
+        conn.close()
 
-    return jsonify({
-        'supplies': [dict(supply) for supply in supplies],
-        'monthly_data': [dict(data) for data in monthly_data]
-    })
+@app.route('/api/report/<int:year>/<int:month>/render')
+def render_monthly_report(year, month):
+    """
+    The monthly report as a print-ready HTML page or PDF (?format=html|pdf,
+    optional ?parish=). Served from the cache when the month's data has not
+    changed since the last render; otherwise rendered on the job pool and
+    answered with 202 and the job to poll.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    fmt = request.args.get('format', 'html').lower()
+    if fmt not in REPORT_RENDER_FORMATS:
+        return jsonify({'error': 'format must be html or pdf'}), 400
+    if not 1 <= month <= 12:
+        return jsonify({'error': 'Invalid month'}), 400
+    parish = request.args.get('parish') or None
+    if parish and parish not in PARISH_NAMES:
+        return jsonify({'error': 'Unknown parish'}), 400
+
+    body, _ = data_cache.lookup(report_render_key(year, month, parish, fmt), report_snapshots.scopes(year, month))
+    record_cache('report-render', body is not None)
+    if body is not None:
+        response = app.response_class(body, mimetype=REPORT_RENDER_FORMATS[fmt])
+        if fmt == 'pdf':
+            filename = report_render_filename(year, month, parish, fmt)
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    try:
+        # Shared: callers asking for the same render while it runs all poll one job
+        job = jobs.submit('report-render', {'year': year, 'month': month, 'parish': parish, 'format': fmt},
+                          {field: session.get(field) for field in USER_FIELDS}, shared=True)
+    except JobQueueFull:
+        response = jsonify({'error': 'Too many background jobs queued, try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify(job.to_dict()), 202
 
 # Task Management API Routes
 @app.route('/api/admin/tasks', methods=['GET'])
@@ -2893,7 +2847,7 @@ def get_admin_tasks():
     ''').fetchall()
     conn.close()
 
-    return jsonify([dict(task) for task in tasks])
+    return jsonify(tasks)
 
 @app.route('/api/admin/tasks', methods=['POST'])
 def create_admin_task():
@@ -2932,7 +2886,7 @@ def create_admin_task():
             FROM inspector_tasks t
             JOIN users u_assigned ON t.assigned_to_id = u_assigned.id
             JOIN users u_created ON t.created_by_id = u_created.id
-            LEFT JOIN wasamoter_supplies ws ON t.supply_id = ws.id
+            LEFT JOIN water_supplies ws ON t.supply_id = ws.id
             WHERE t.id = ?
         ''', (task_id,)).fetchone()
 
@@ -2968,7 +2922,7 @@ def get_inspector_tasks():
     ''', (session['user_id'],)).fetchall()
     conn.close()
 
-    return jsonify([dict(task) for task in tasks])
+    return jsonify(tasks)
 
 @app.route('/api/my-tasks', methods=['GET'])
 def get_my_tasks():
@@ -2990,7 +2944,7 @@ def get_my_tasks():
     ''', (session['user_id'],)).fetchall()
     conn.close()
 
-    return jsonify([dict(task) for task in tasks])
+    return jsonify(tasks)
 
 @app.route('/api/inspector/tasks/<int:task_id>/accept', methods=['POST'])
 def accept_task(task_id):
@@ -3107,7 +3061,7 @@ def get_inspectors():
     ''').fetchall()
     conn.close()
 
-    return jsonify([dict(user) for user in users])
+    return jsonify(users)
 
 @app.route('/api/current-user', methods=['GET'])
 def get_current_user():
@@ -3126,7 +3080,7 @@ def get_current_user():
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    return jsonify(dict(user))
+    return jsonify(user)
 
 @app.route('/api/users', methods=['GET'])
 def get_all_users():
@@ -3142,7 +3096,7 @@ def get_all_users():
     ''').fetchall()
     conn.close()
 
-    return jsonify([dict(user) for user in users])
+    return jsonify(users)
 
 @app.route('/api/admin/users', methods=['POST'])
 def create_user():
@@ -3166,8 +3120,7 @@ def create_user():
         return jsonify({'error': 'Invalid role'}), 400
 
     # Validate parish
-    valid_parishes = ['Westmoreland', 'Trelawny', 'Hanover', 'St. James']
-    if parish not in valid_parishes:
+    if parish not in PARISH_NAMES:
         return jsonify({'error': 'Invalid parish'}), 400
 
     # Hash password
@@ -3267,7 +3220,7 @@ def get_documents():
         ''').fetchall()
         conn.close()
 
-        return jsonify([dict(doc) for doc in documents])
+        return jsonify(documents)
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -3335,14 +3288,164 @@ def delete_document(doc_id):
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/debug/perf', methods=['GET', 'DELETE'])
+def debug_perf():
+    """Route latency, SQL counts and slow queries since startup (DELETE resets)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    if request.method == 'DELETE':
+        perf_stats.reset()
+        return jsonify({'success': True})
+
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(perf_stats.snapshot(limit))
+
 @app.route('/upload')
 def upload_page():
     """Temporary upload page for documents"""
     if 'user_id' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
-    return render_template('upload.html')
+    return shells.response('upload.html')
+
+# Background job types (see jobs.py)
+@jobs.job_type('report', required=('year', 'month'))
+def report_job(params, user):
+    """Same data as /api/report/<year>/<month>"""
+    return run_view(f"/api/report/{int(params['year'])}/{int(params['month'])}", user)
+
+@jobs.job_type('chart-data')
+def chart_data_job(params, user):
+    """Same data as /api/chart-data; params are its query arguments (type, range, supply)"""
+    return run_view('/api/chart-data', user, query_string=params)
+
+@jobs.job_type('parish-comparison')
+def parish_comparison_job(params, user):
+    """Same data as /api/parish-comparison; params are its query arguments (type, range)"""
+    return run_view('/api/parish-comparison', user, query_string=params)
+
+def parse_date_param(value):
+    """A YYYY-MM-DD parameter as a date; None when missing or malformed (an open end)"""
+    try:
+        return date.fromisoformat(value[:10]) if value else None
+    except ValueError:
+        return None
+
+def load_submissions_export(params, user):
+    """Submission rows for the CSV export; params: start_date, end_date (YYYY-MM-DD), parish"""
+    ph = '%s' if USE_POSTGRESQL else '?'
+    conditions, values = [], []
+    if params.get('start_date'):
+        conditions.append(f'sub.submission_date >= {ph}')
+        values.append(params['start_date'])
+    if params.get('end_date'):
+        conditions.append(f'sub.submission_date <= {ph}')
+        values.append(params['end_date'])
+    if params.get('parish'):
+        conditions.append(f'ws.parish = {ph}')
+        values.append(params['parish'])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = get_db_connection()
+    try:
+        submissions = partitions.source(conn, parse_date_param(params.get('start_date')),
+                                        parse_date_param(params.get('end_date')))
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT sub.*, ws.name as supply_name, ws.parish as supply_parish, u.full_name as inspector_name
+            FROM {submissions} sub
+            JOIN water_supplies ws ON sub.supply_id = ws.id
+            JOIN users u ON sub.inspector_id = u.id
+            {where}
+            ORDER BY sub.submission_date, sub.id
+        ''', values)
+        columns = [description[0] for description in cursor.description]
+        rows = [list(row.values()) if USE_POSTGRESQL else tuple(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    filename = f"submissions-{params.get('start_date') or 'all'}-{params.get('end_date') or 'latest'}.csv"
+    return filename, columns, rows
+
+jobs.job_type('submissions-export', pool='process', prepare=load_submissions_export, admin_only=True)(csv_file)
+
+@jobs.job_type('report-render', required=('year', 'month'))
+def report_render_job(params, user):
+    """
+    Render a month's report as HTML and PDF and cache both; params: year,
+    month, parish (optional), format (html or pdf, the one returned)
+    """
+    year, month, parish = int(params['year']), int(params['month']), params.get('parish') or None
+    fmt = params.get('format') or 'pdf'
+    if fmt not in REPORT_RENDER_FORMATS:
+        raise JobError('format must be html or pdf')
+    report, stamp = load_report_for_render(year, month)
+    context = build_context(report, year, month, parish)
+    rendered = {'html': render_html(context).encode('utf-8'), 'pdf': render_pdf(context)}
+    for name, body in rendered.items():
+        data_cache.store(report_render_key(year, month, parish, name), stamp, body)
+    return JobFile(report_render_filename(year, month, parish, fmt), rendered[fmt], REPORT_RENDER_FORMATS[fmt])
+
+@jobs.job_type('report-snapshot', admin_only=True, required=('year', 'month'))
+def report_snapshot_job(params, user):
+    """Freeze (or re-freeze) a closed month's report"""
+    return report_snapshots.freeze(int(params['year']), int(params['month']), user['user_id'])
+
+# Scheduled cache warming (see scheduler.py); builds run through the cached endpoints
+SCHEDULER_USER = {'user_id': 0, 'username': 'scheduler', 'role': 'admin', 'full_name': 'Scheduler', 'parish': None}
+
+# Chart settings the admin dashboard opens with
+DEFAULT_CHART_TYPES = ('chlorine', 'bacteriological', 'visits', 'distribution')
+DEFAULT_CHART_RANGE = '3months'
+
+@scheduler.task('warm-dashboard', every=600)
+def warm_dashboard():
+    """Current month's dashboard aggregate; re-checked every 10 minutes, rebuilt only when invalidated"""
+    run_view('/api/dashboard-data', SCHEDULER_USER)
+    run_view('/api/monthly-data', SCHEDULER_USER)
+
+@scheduler.task('warm-previous-report')
+def warm_previous_report():
+    """Report of the month that just closed"""
+    today = date.today()
+    year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    run_view(f'/api/report/{year}/{month}', SCHEDULER_USER)
+
+@scheduler.task('warm-charts', every=3600)
+def warm_charts():
+    """Default chart ranges; chart entries are keyed by day, so they are rebuilt after midnight"""
+    for chart_type in DEFAULT_CHART_TYPES:
+        run_view('/api/chart-data', SCHEDULER_USER,
+                 query_string={'type': chart_type, 'range': DEFAULT_CHART_RANGE, 'supply': 'all'})
+    run_view('/api/parish-comparison', SCHEDULER_USER, query_string={'type': 'chlorine', 'range': DEFAULT_CHART_RANGE})
+
+@scheduler.task('refresh-snapshots', every=3600, monthly=False)
+def refresh_snapshots():
+    """Re-freeze closed months whose snapshot went stale (catches edits whose refresh job was rejected)"""
+    for year, month in report_snapshots.outdated():
+        report_snapshots.freeze(year, month)
+
+@scheduler.task('maintain-partitions')
+def maintain_partitions():
+    """Create the coming months' partitions (PostgreSQL) or archive years that closed (SQLite)"""
+    partitions.maintain()
 
 # WebSocket Events
+@socketio.on('connect')
+def on_connect():
+    # Personal room for notifications such as finished background jobs
+    if 'user_id' in session:
+        join_room(f"user_{session['user_id']}")
+        # Parish admins get their parish's anomaly alerts (anomalies.py)
+        if session.get('role') == 'admin' and session.get('parish'):
+            join_room(parish_admin_room(session['parish']))
+            # Positive results nobody has acknowledged yet
+            priority_alerts.send_open(session['parish'], to=f"user_{session['user_id']}")
+
 @socketio.on('join')
 def on_join(data):
     room = data['room']
@@ -3475,6 +3578,11 @@ if __name__ == '__main__':
     # Add sample data for testing
     add_sample_data()
 
+    # Warm caches after this deploy and at month boundaries
+    scheduler.start()
+    # Re-send priority alerts until they are acknowledged
+    priority_alerts.start()
+
     if debug:
         # Development mode
         socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True)
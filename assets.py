@@ -0,0 +1,116 @@
+"""
+Fingerprinted static assets
+
+build_assets.py copies static files to static/dist/ under content-hashed
+names and records them in static/dist/manifest.json. Templates reference
+assets through asset_url(), which resolves to the hashed copy when the
+manifest has one, so those URLs can be cached by browsers forever.
+
+Third-party bundles are pinned by name, URL and SHA-384 (vendor.lock.json,
+written by build_assets.py --pin). vendor_script() renders the script tag
+of one: the self-hosted fingerprinted copy when it was downloaded, the CDN
+otherwise, with the pinned hash as its integrity attribute either way.
+"""
+import json
+import os
+
+from flask import abort, request, send_from_directory, url_for
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+from compression import precompressed_response
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Fingerprinted and version-pinned files never change under the same URL
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMMUTABLE_MAX_AGE = 31536000
+
+# Pinned third-party bundles self-hosted under static/vendor/: name -> download URL
+VENDOR_BUNDLES = {
+    'socket.io-4.7.2.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.7.2/socket.io.min.js',
+    'lightweight-charts-4.2.3.standalone.production.js':
+        'https://unpkg.com/lightweight-charts@4.2.3/dist/lightweight-charts.standalone.production.js',
+    'chart.js-4.4.1.umd.min.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+    'chartjs-adapter-date-fns-3.0.0.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns@3.0.0/dist/chartjs-adapter-date-fns.bundle.min.js',
+}
+
+VENDOR_LOCK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor.lock.json')
+
+_manifest = {'files': {}}
+_vendor_integrity = {}
+_static_folder = None
+
+
+def load_vendor_lock():
+    """{bundle name: "sha384-..."} pinned in vendor.lock.json; empty when nothing is pinned yet"""
+    try:
+        with open(VENDOR_LOCK, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_manifest(static_folder):
+    """(Re)load the asset manifest written by build_assets.py and the vendor pins"""
+    global _manifest, _vendor_integrity, _static_folder
+    _static_folder = static_folder
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {'files': {}}
+    _vendor_integrity = load_vendor_lock()
+    return _manifest
+
+
+def asset_url(filename):
+    """URL for a static file, preferring its fingerprinted copy"""
+    hashed = _manifest['files'].get(filename)
+    if hashed:
+        return url_for('assets', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+def vendor_script(filename):
+    """<script> tag of a pinned vendor bundle: self-hosted when downloaded, from its CDN otherwise"""
+    relpath = f'vendor/{filename}'
+    if relpath in _manifest['files'] or os.path.exists(os.path.join(_static_folder, relpath)):
+        src = asset_url(relpath)
+    else:
+        src = VENDOR_BUNDLES[filename]
+    integrity = _vendor_integrity.get(filename)
+    attributes = f' integrity="{escape(integrity)}" crossorigin="anonymous"' if integrity else ''
+    return Markup(f'<script src="{escape(src)}"{attributes}></script>')
+
+
+def init_assets(app):
+    """Register the /assets route, template helpers and vendor caching"""
+    load_manifest(app.static_folder)
+    app.jinja_env.globals.update(asset_url=asset_url, vendor_script=vendor_script)
+    dist_folder = os.path.join(app.static_folder, DIST_DIR)
+
+    @app.route('/assets/<path:filename>')
+    def assets(filename):
+        path = safe_join(dist_folder, filename)
+        if path is None or filename == MANIFEST_NAME:
+            abort(404)
+        response = precompressed_response(path)
+        if response is None:
+            # conditional=True also answers Range requests (video seeking) with 206
+            response = send_from_directory(dist_folder, filename, conditional=True,
+                                           max_age=IMMUTABLE_MAX_AGE)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+        return response
+
+    @app.after_request
+    def cache_vendor_bundles(response):
+        if request.endpoint != 'static' or response.status_code not in (200, 206, 304):
+            return response
+        if (request.view_args or {}).get('filename', '').startswith('vendor/'):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
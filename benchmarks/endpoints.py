@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Endpoint benchmark suite with regression thresholds.
+
+Builds SQLite databases of several sizes with generate_dataset.py, then times
+every hot endpoint through the Flask test client: p50/p95/p99 latency, the
+peak memory allocated while serving one request and the number of blocks
+that request left allocated (tracemalloc). tracemalloc only sees live
+allocations, so it cannot count the ones already freed; peak bytes stand in
+for the request's total allocation. Results are compared with a saved JSON
+baseline and the run fails (exit status 1) when an endpoint's p95 or peak
+allocation grows past the threshold; retained blocks are reported only.
+
+Usage: python benchmarks/endpoints.py [--sizes 10000,100000] [--iterations 30]
+                                      [--baseline benchmarks/baseline.json]
+                                      [--save-baseline] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as water_app
+import generate_dataset
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+CHART_TYPES = ('chlorine', 'bacteriological', 'visits', 'distribution')
+COMPARISON_TYPES = ('chlorine', 'visits')
+RANGES = ('3months', '6months', 'year', 'all')
+
+def build_cases(today):
+    """(name, user, method, path, json body) for every benchmarked request"""
+    last_month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    cases = [
+        ('dashboard-data', 'admin', 'GET', '/api/dashboard-data', None),
+        ('monthly-data', 'admin', 'GET', '/api/monthly-data', None),
+        ('report-current', 'admin', 'GET', f'/api/report/{today.year}/{today.month}', None),
+        ('report-previous', 'admin', 'GET', f'/api/report/{last_month[0]}/{last_month[1]}', None),
+        ('submissions', 'admin', 'GET', '/api/submissions', None),
+        ('submissions-summary', 'admin', 'GET', '/api/submissions?fields=summary', None),
+        ('my-submissions', 'inspector', 'GET', '/api/my-submissions', None),
+    ]
+    for chart_type in CHART_TYPES:
+        for time_range in RANGES:
+            cases.append((f'chart-data:{chart_type}:{time_range}', 'admin', 'GET',
+                          f'/api/chart-data?type={chart_type}&range={time_range}', None))
+    for chart_type in COMPARISON_TYPES:
+        for time_range in RANGES:
+            cases.append((f'parish-comparison:{chart_type}:{time_range}', 'admin', 'GET',
+                          f'/api/parish-comparison?type={chart_type}&range={time_range}', None))
+    cases.append(('submit-inspection', 'inspector', 'POST', '/api/submit-inspection', {
+        'supply_id': 1, 'visits': 1, 'chlorine_total': 3, 'chlorine_positive': 3,
+        'bacteriological_total': 2, 'bacteriological_negative': 2, 'remarks': 'Benchmark submission',
+    }))
+    return cases
+
+USERS = {'admin': ('admin', 'admin123'), 'inspector': ('inspector', 'inspector123')}
+
+def build_database(directory, size, seed):
+    path = os.path.join(directory, f'bench-{size}.db')
+    water_app.DATABASE = path
+    water_app.init_db()
+    conn = water_app.get_db_connection()
+    try:
+        generate_dataset.generate(conn, False, size, years=3, seed=seed, end_date=date.today(), progress=False)
+    finally:
+        conn.close()
+    return path
+
+def logged_in_clients():
+    clients = {}
+    for role, (username, password) in USERS.items():
+        client = water_app.app.test_client()
+        response = client.post('/login', json={'username': username, 'password': password})
+        if response.status_code != 200:
+            raise RuntimeError(f'Could not log in as {username}: {response.status_code}')
+        clients[role] = client
+    return clients
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_case(client, method, path, body, iterations, warmup):
+    def call():
+        response = client.open(path, method=method, json=body)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} returned {response.status_code}')
+        response.get_data()
+
+    for _ in range(warmup):
+        call()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Measured separately: tracing slows the request down
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    retained = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'peak_alloc_kb': round(peak / 1024, 1),
+        'retained_blocks': retained,
+    }
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Regressions of p95 latency or peak allocation beyond ``threshold``"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        p95_delta = current['p95_ms'] - previous['p95_ms']
+        if p95_delta > min_delta_ms and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current['peak_alloc_kb'] > previous['peak_alloc_kb'] * (1 + threshold) + 64:
+            regressions.append(f"{key}: peak alloc {previous['peak_alloc_kb']:.0f} -> "
+                               f"{current['peak_alloc_kb']:.0f} KiB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated dataset sizes')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', default='', help='run only cases whose name contains this text')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCH_THRESHOLD', 0.25)),
+                        help='allowed relative growth of p95 and peak allocation (default 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore p95 growth smaller than this many milliseconds')
+    args = parser.parse_args()
+
+    if water_app.USE_POSTGRESQL:
+        print('Benchmarks build their own SQLite databases; unset DATABASE_URL')
+        sys.exit(2)
+
+    water_app.app.config['PROFILE_SAMPLE_RATE'] = 0
+    # Time the aggregation itself: cached responses would be hits (and, across sizes, another database's data)
+    water_app.app.config['DATA_CACHE_ENABLED'] = False
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    cases = [case for case in build_cases(date.today()) if args.only in case[0]]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            started = time.perf_counter()
+            build_database(directory, size, args.seed)
+            print(f"\nDataset {size:,} submissions (built in {time.perf_counter() - started:.1f}s)")
+            print(f"{'endpoint':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'peak KiB':>10} {'blocks':>8}")
+            clients = logged_in_clients()
+            for name, role, method, path, body in cases:
+                result = run_case(clients[role], method, path, body, args.iterations, args.warmup)
+                results[f'{size}:{name}'] = result
+                print(f"{name:<40} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {result['peak_alloc_kb']:>10,.0f} {result['retained_blocks']:>8,}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n✓ Saved baseline with {len(results)} results to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n○ No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\n✓ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
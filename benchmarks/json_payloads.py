@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark payload size and encode time of row-dict vs columnar JSON responses.
+
+Usage: python benchmarks/json_payloads.py [--rows 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+
+# Same shape as a /api/submissions row: inspection_submissions columns plus joined names
+COLUMNS = [
+    ('id', 'int'), ('supply_id', 'int'), ('inspector_id', 'int'), ('sampling_point_id', 'int'),
+    ('submission_date', 'date'), ('visits', 'int'), ('chlorine_total', 'int'),
+    ('chlorine_positive', 'int'), ('chlorine_negative', 'int'), ('chlorine_positive_range', 'str'),
+    ('chlorine_negative_range', 'str'), ('bacteriological_total', 'int'),
+    ('bacteriological_positive', 'int'), ('bacteriological_negative', 'int'),
+    ('bacteriological_pending', 'int'), ('bacteriological_rejected', 'int'),
+    ('bacteriological_broken', 'int'), ('bacteriological_rejected_reason', 'str'),
+    ('bacteriological_broken_reason', 'str'), ('bacteriological_status', 'status'),
+    ('isolated_organism', 'str'), ('ph_satisfactory', 'int'), ('ph_non_satisfactory', 'int'),
+    ('ph_non_satisfactory_params', 'json'), ('bacteriological_positive_status', 'str'),
+    ('bacteriological_negative_status', 'str'), ('chemical_total', 'int'),
+    ('chemical_satisfactory', 'int'), ('chemical_non_satisfactory', 'int'),
+    ('chemical_non_satisfactory_params', 'json'), ('turbidity_satisfactory', 'int'),
+    ('turbidity_non_satisfactory', 'int'), ('turbidity_non_satisfactory_range', 'str'),
+    ('temperature_satisfactory', 'int'), ('temperature_non_satisfactory', 'int'),
+    ('temperature_non_satisfactory_range', 'str'), ('remarks', 'remarks'), ('facility_type', 'str'),
+    ('water_source_type', 'str'), ('created_at', 'timestamp'), ('supply_name', 'name'),
+    ('type', 'status'), ('agency', 'str'), ('sampling_point_name', 'name'),
+    ('sampling_point_location', 'str'),
+]
+
+def make_value(kind, rng, i):
+    if kind == 'int':
+        return rng.choice((0, 0, 0, 1, 2, 5))
+    if kind == 'date':
+        return f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+    if kind == 'timestamp':
+        return f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:{rng.randint(0, 59):02d}:00'
+    if kind == 'status':
+        return rng.choice(('pending', 'complete'))
+    if kind == 'json':
+        return '[]'
+    if kind == 'remarks':
+        return rng.choice(('', 'Routine visit', 'Standpipe leaking near school'))
+    if kind == 'name':
+        return f'Supply {i % 150}'
+    return ''
+
+def build_rows(count):
+    """Create ``count`` rows in an in-memory SQLite table and return (cursor, rows)"""
+    rng = random.Random(42)
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"CREATE TABLE rows ({', '.join(name for name, _ in COLUMNS)})")
+    conn.executemany(
+        f"INSERT INTO rows VALUES ({', '.join('?' for _ in COLUMNS)})",
+        ([make_value(kind, rng, i) for _, kind in COLUMNS] for i in range(count))
+    )
+    cursor = conn.execute('SELECT * FROM rows')
+    return cursor, cursor.fetchall()
+
+def encode_dicts(cursor, rows):
+    return json.dumps([dict(row) for row in rows])
+
+def encode_columnar(cursor, rows):
+    columns = [description[0] for description in cursor.description]
+    return json.dumps({'columns': columns, 'rows': [tuple(row) for row in rows]})
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload.encode())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'mode':>9} {'bytes':>12} {'encode ms':>10} {'size':>6} {'time':>6}")
+    for count in args.rows:
+        cursor, rows = build_rows(count)
+        dict_time, dict_size = best_of(lambda: encode_dicts(cursor, rows), args.repeat)
+        col_time, col_size = best_of(lambda: encode_columnar(cursor, rows), args.repeat)
+        print(f"{count:>8} {'dicts':>9} {dict_size:>12,} {dict_time * 1000:>10.2f} {'':>6} {'':>6}")
+        print(f"{count:>8} {'columnar':>9} {col_size:>12,} {col_time * 1000:>10.2f} "
+              f"{col_size / dict_size:>6.0%} {col_time / dict_time:>6.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the JSON provider on large row responses.
+
+Compares Flask's default provider fed ``[dict(r) for r in rows]`` against
+FastJSONProvider encoding the rows directly, with and without orjson.
+
+Usage: python benchmarks/json_provider.py [--rows 10000] [--repeat 7]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_payloads import build_rows
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    flask_app = Flask(__name__)
+    default_provider = DefaultJSONProvider(flask_app)
+    fast_provider = json_provider.FastJSONProvider(flask_app)
+    _, rows = build_rows(args.rows)
+
+    cases = [
+        ('flask default, dict per row',
+         lambda: default_provider.dumps([dict(row) for row in rows], separators=(',', ':')).encode()),
+    ]
+    if json_provider.orjson is not None:
+        cases.append(('fast provider, orjson', lambda: fast_provider.dumps_bytes(rows)))
+    else:
+        print('orjson not installed - only the stdlib fallback is measured')
+
+    def stdlib_fallback():
+        accelerated, json_provider.orjson = json_provider.orjson, None
+        try:
+            return fast_provider.dumps_bytes(rows)
+        finally:
+            json_provider.orjson = accelerated
+    cases.append(('fast provider, stdlib fallback', stdlib_fallback))
+
+    baseline = None
+    print(f"{args.rows:,} rows, best of {args.repeat}")
+    for label, fn in cases:
+        seconds, size = best_of(fn, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {label:<32} {seconds * 1000:>9.2f} ms {size:>12,} bytes {baseline / seconds:>6.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Mixed-workload load generator simulating month-end traffic.
+
+Runs concurrent inspector sessions (login, dashboard bootstrap, submit
+inspections, update bacteriological results) and admin sessions (dashboard,
+charts, parish comparison, reports, task pushes) while listening for
+Socket.IO events. Reports throughput and latency percentiles per operation,
+database lock errors, and the delivery lag of new_submission events from the
+start of the submit request to their arrival at each admin listener.
+
+In-process (default) the app is driven through the Flask and Flask-SocketIO
+test clients against a temporary SQLite database filled by
+generate_dataset.py. With --url it drives a running server over HTTP; admin
+listeners then need the python-socketio client extras (requests,
+websocket-client) and are skipped without them.
+
+Usage: python benchmarks/load_test.py [--inspectors 30] [--admins 5] [--duration 60]
+                                      [--think-ms 300] [--dataset 10000] [--url http://localhost:5004]
+                                      [--json results.json]
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSPECTOR_ACCOUNTS = ['inspector', 'inspector1', 'inspector2', 'inspector3', 'inspector4', 'inspector5',
+                      'trelawny1', 'trelawny2', 'trelawny3', 'hanover1', 'hanover2', 'hanover3',
+                      'stjames1', 'stjames2', 'stjames3']
+ADMIN_ACCOUNTS = ['admin', 'admin2', 'trelawny_admin', 'hanover_admin', 'stjames_admin']
+INSPECTOR_PASSWORD = 'inspector123'
+ADMIN_PASSWORD = 'admin123'
+
+CHART_TYPES = ('chlorine', 'bacteriological', 'visits', 'distribution')
+RANGES = ('3months', '6months', 'year', 'all')
+LOCK_MARKERS = ('database is locked', 'deadlock detected', 'could not obtain lock', 'lock timeout')
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class Recorder:
+    """Latencies and errors per operation, shared by all session threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = 0
+        self.submitted = {}
+        self.event_lags = []
+        self.events_received = 0
+
+    def record(self, operation, elapsed_ms, status, body):
+        is_lock_error = status >= 500 and any(marker in body for marker in LOCK_MARKERS)
+        with self.lock:
+            self.latencies[operation].append(elapsed_ms)
+            if status >= 400:
+                self.errors[operation] += 1
+            if is_lock_error:
+                self.lock_errors += 1
+
+    def submission_started(self, submission_id, started):
+        with self.lock:
+            self.submitted[submission_id] = started
+
+    def event_received(self, submission_id, received):
+        with self.lock:
+            self.events_received += 1
+            started = self.submitted.get(submission_id)
+            if started is not None:
+                self.event_lags.append((received - started) * 1000)
+
+    def summary(self, elapsed, admin_listeners):
+        operations = {}
+        total = 0
+        for operation, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            total += len(values)
+            operations[operation] = {
+                'count': len(values),
+                'errors': self.errors[operation],
+                'per_second': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 0.50), 2),
+                'p95_ms': round(percentile(values, 0.95), 2),
+                'p99_ms': round(percentile(values, 0.99), 2),
+                'max_ms': round(values[-1], 2),
+            }
+        lags = sorted(self.event_lags)
+        return {
+            'duration_s': round(elapsed, 1),
+            'requests': total,
+            'requests_per_second': round(total / elapsed, 2),
+            'lock_errors': self.lock_errors,
+            'operations': operations,
+            'events': {
+                'listeners': admin_listeners,
+                'expected': len(self.submitted) * admin_listeners,
+                'received': self.events_received,
+                'lag_p50_ms': round(percentile(lags, 0.50), 2),
+                'lag_p95_ms': round(percentile(lags, 0.95), 2),
+                'lag_max_ms': round(lags[-1], 2) if lags else 0.0,
+                'lag_mean_ms': round(statistics.fmean(lags), 2) if lags else 0.0,
+            },
+        }
+
+class InProcessTransport:
+    """Requests through the Flask test client of the imported app"""
+
+    def __init__(self, water_app):
+        self.water_app = water_app
+        self.client = water_app.app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data(as_text=True)
+
+    def listener(self, recorder, stop):
+        sio = self.water_app.socketio.test_client(self.water_app.app, flask_test_client=self.client)
+        sio.emit('join', {'room': 'admin'})
+
+        def drain():
+            for packet in sio.get_received():
+                if packet['name'] == 'new_submission':
+                    recorder.event_received(packet['args'][0].get('id'), time.perf_counter())
+
+        def poll():
+            # Keep polling briefly after stop for requests still in flight
+            deadline = None
+            while deadline is None or time.perf_counter() < deadline:
+                drain()
+                if deadline is None and stop.wait(0.002):
+                    deadline = time.perf_counter() + 0.5
+                elif deadline is not None:
+                    time.sleep(0.002)
+            sio.disconnect()
+        return poll
+
+class HTTPTransport:
+    """Requests over HTTP to a running server, one cookie jar per session"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+    def listener(self, recorder, stop):
+        try:
+            import socketio
+            client = socketio.Client()
+        except Exception:
+            return None
+        cookies = '; '.join(f'{cookie.name}={cookie.value}' for cookie in self.cookies)
+
+        @client.on('new_submission')
+        def on_submission(data):
+            recorder.event_received(data.get('id'), time.perf_counter())
+
+        def listen():
+            try:
+                client.connect(self.base_url, headers={'Cookie': cookies} if cookies else None)
+                client.emit('join', {'room': 'admin'})
+                stop.wait()
+                client.disconnect()
+            except Exception as e:
+                print(f"[LOAD] Socket.IO listener failed: {e}")
+        return listen
+
+class Session:
+    def __init__(self, transport, recorder, rng, think_ms):
+        self.transport = transport
+        self.recorder = recorder
+        self.rng = rng
+        self.think_ms = think_ms
+
+    def call(self, operation, method, path, body=None):
+        started = time.perf_counter()
+        status, text = self.transport.request(method, path, body)
+        self.recorder.record(operation, (time.perf_counter() - started) * 1000, status, text)
+        try:
+            return status, json.loads(text) if text else None
+        except ValueError:
+            return status, None
+
+    def think(self, stop):
+        stop.wait(self.rng.expovariate(1000.0 / self.think_ms) if self.think_ms else 0)
+
+    def login(self, username, password):
+        status, _ = self.call('login', 'POST', '/login', {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'login failed for {username}: {status}')
+
+def inspector_session(session, username, stop):
+    session.login(username, INSPECTOR_PASSWORD)
+    session.call('bootstrap', 'GET', '/api/current-user')
+    # Already filtered to the inspector's parish
+    _, supplies = session.call('bootstrap', 'GET', '/api/supplies')
+    session.call('bootstrap', 'GET', '/api/my-submissions')
+    pending = []
+
+    while not stop.is_set():
+        if not supplies:
+            # Parishes without seeded supplies only read
+            session.call('my-submissions', 'GET', '/api/my-submissions')
+            session.think(stop)
+            continue
+        supply = session.rng.choice(supplies)
+        session.call('bootstrap', 'GET', f"/api/sampling-points/{supply['id']}")
+        started = time.perf_counter()
+        status, result = session.call('submit', 'POST', '/api/submit-inspection', {
+            'supply_id': supply['id'], 'visits': 1,
+            'chlorine_total': 4, 'chlorine_positive': 3, 'chlorine_negative': 1,
+            'bacteriological_total': 2, 'bacteriological_pending': 2,
+            'remarks': 'Load test submission',
+        })
+        if status == 200 and result:
+            submission_id = result['submission']['id']
+            session.recorder.submission_started(submission_id, started)
+            pending.append(submission_id)
+        session.think(stop)
+
+        if pending and session.rng.random() < 0.5:
+            positive = 1 if session.rng.random() < 0.1 else 0
+            session.call('update-results', 'POST', '/api/update-bacteriological', {
+                'id': pending.pop(0), 'bacteriological_positive': positive,
+                'bacteriological_negative': 2 - positive, 'bacteriological_pending': 0,
+                'isolated_organism': 'E. coli' if positive else None,
+            })
+            session.think(stop)
+        if session.rng.random() < 0.2:
+            session.call('my-submissions', 'GET', '/api/my-submissions')
+
+def admin_session(session, username, stop, inspector_ids):
+    session.login(username, ADMIN_PASSWORD)
+    session.call('dashboard', 'GET', '/api/dashboard-data')
+    today = date.today()
+    while not stop.is_set():
+        roll = session.rng.random()
+        if roll < 0.35:
+            session.call('dashboard', 'GET', '/api/dashboard-data')
+        elif roll < 0.65:
+            chart_type, time_range = session.rng.choice(CHART_TYPES), session.rng.choice(RANGES)
+            session.call('chart', 'GET', f'/api/chart-data?type={chart_type}&range={time_range}')
+        elif roll < 0.75:
+            session.call('parish-comparison', 'GET',
+                         f"/api/parish-comparison?type=chlorine&range={session.rng.choice(RANGES)}")
+        elif roll < 0.85:
+            session.call('report', 'GET', f'/api/report/{today.year}/{today.month}')
+        elif roll < 0.95:
+            session.call('submissions', 'GET', '/api/submissions')
+        elif inspector_ids:
+            session.call('push-task', 'POST', '/api/admin/tasks', {
+                'title': 'Resample after positive result', 'inspector_id': session.rng.choice(inspector_ids),
+                'priority': 'High', 'due_date': (today + timedelta(days=3)).isoformat(),
+            })
+        session.think(stop)
+
+def prepare_in_process(dataset, seed):
+    import app as water_app
+    import generate_dataset
+
+    if water_app.USE_POSTGRESQL:
+        print('In-process runs use a temporary SQLite database; unset DATABASE_URL')
+        sys.exit(2)
+    directory = tempfile.mkdtemp(prefix='water-load-')
+    water_app.DATABASE = os.path.join(directory, 'load.db')
+    water_app.init_db()
+    water_app.app.config['PROFILE_SAMPLE_RATE'] = 0
+    # The in-memory cache validates entries by version counters, which every fresh database starts from
+    water_app.data_cache.clear()
+    if dataset:
+        conn = water_app.get_db_connection()
+        try:
+            generate_dataset.generate(conn, False, dataset, seed=seed, end_date=date.today(), progress=False)
+        finally:
+            conn.close()
+    return water_app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--inspectors', type=int, default=30)
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load')
+    parser.add_argument('--think-ms', type=float, default=300, help='mean pause between actions')
+    parser.add_argument('--dataset', type=int, default=10000, help='generated submissions (in-process only)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help='drive a running server instead of the in-process app')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    if args.url:
+        def make_transport():
+            return HTTPTransport(args.url)
+    else:
+        water_app = prepare_in_process(args.dataset, args.seed)
+
+        def make_transport():
+            return InProcessTransport(water_app)
+
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = []
+    listeners = 0
+
+    # Task targets: look up inspector ids once through an admin session
+    probe = Session(make_transport(), Recorder(), random.Random(args.seed), 0)
+    probe.login(ADMIN_ACCOUNTS[0], ADMIN_PASSWORD)
+    _, users = probe.call('users', 'GET', '/api/users')
+    inspector_ids = [user['id'] for user in (users or []) if isinstance(user, dict) and user.get('role') == 'inspector']
+
+    def run(target, *target_args):
+        try:
+            target(*target_args)
+        except Exception as e:
+            print(f"[LOAD] Session stopped: {e}")
+
+    for index in range(args.admins):
+        session = Session(make_transport(), recorder, random.Random(args.seed * 1000 + index), args.think_ms)
+        threads.append(threading.Thread(target=run, args=(admin_session, session, ADMIN_ACCOUNTS[index % len(ADMIN_ACCOUNTS)],
+                                                          stop, inspector_ids), daemon=True))
+        listen = session.transport.listener(recorder, stop)
+        if listen is not None:
+            # The listener shares the admin's cookies; it needs a logged-in session first
+            session.login(ADMIN_ACCOUNTS[index % len(ADMIN_ACCOUNTS)], ADMIN_PASSWORD)
+            threads.append(threading.Thread(target=listen, daemon=True))
+            listeners += 1
+    for index in range(args.inspectors):
+        session = Session(make_transport(), recorder, random.Random(args.seed * 2000 + index), args.think_ms)
+        threads.append(threading.Thread(target=run, args=(inspector_session, session,
+                                                          INSPECTOR_ACCOUNTS[index % len(INSPECTOR_ACCOUNTS)], stop),
+                                        daemon=True))
+
+    print(f"Running {args.inspectors} inspector and {args.admins} admin sessions for {args.duration:g}s "
+          f"({'server ' + args.url if args.url else 'in-process'})...")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=30)
+    summary = recorder.summary(time.perf_counter() - started, listeners)
+
+    print(f"\n{'operation':<20} {'count':>7} {'errors':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for operation, stats in summary['operations'].items():
+        print(f"{operation:<20} {stats['count']:>7} {stats['errors']:>7} {stats['per_second']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    events = summary['events']
+    print(f"\nThroughput: {summary['requests_per_second']:.1f} req/s over {summary['duration_s']}s")
+    print(f"Lock errors: {summary['lock_errors']}")
+    print(f"Events: {events['received']}/{events['expected']} new_submission deliveries, lag p50 "
+          f"{events['lag_p50_ms']:.1f} ms, p95 {events['lag_p95_ms']:.1f} ms, max {events['lag_max_ms']:.1f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == '__main__':
+    main()
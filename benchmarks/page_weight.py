@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Measure bytes on the wire per page with and without compression.
+
+Fetches every page and the main JSON APIs through the Flask test client with
+Accept-Encoding set to identity, gzip and br, and prints the transferred size.
+Pages are served from the prerendered shells and their in-memory variants.
+
+Usage: python benchmarks/page_weight.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+
+# (login, password, paths fetched in that session)
+SESSIONS = [
+    (None, None, ['/login']),
+    ('admin', 'admin123', ['/admin', '/report', '/upload', '/api/dashboard-data', '/api/submissions?limit=50',
+                           '/api/supplies']),
+    ('inspector', 'inspector123', ['/westmoreland']),
+    ('hanover1', 'inspector123', ['/hanover']),
+    ('trelawny1', 'inspector123', ['/trelawny']),
+    ('stjames1', 'inspector123', ['/st_james']),
+]
+
+ENCODINGS = ('identity', 'gzip', 'br')
+
+def main():
+    print(f"{'path':<28} " + ' '.join(f'{encoding:>10}' for encoding in ENCODINGS) + f" {'saved':>7}")
+    for username, password, paths in SESSIONS:
+        client = app.test_client()
+        if username:
+            client.post('/login', json={'username': username, 'password': password})
+        for path in paths:
+            sizes = []
+            for encoding in ENCODINGS:
+                response = client.get(path, headers={'Accept-Encoding': encoding})
+                served = response.headers.get('Content-Encoding', 'identity')
+                size = len(response.get_data())
+                sizes.append(f"{size:>10,}" if served == encoding else f"{'n/a':>10}")
+                if encoding == 'identity':
+                    identity_size = best_size = size
+                elif served == encoding:
+                    best_size = min(best_size, size)
+            saved = 1 - best_size / identity_size if identity_size else 0
+            print(f"{path:<28} {' '.join(sizes)} {saved:>7.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Build-time static asset pipeline
+
+- Downloads the pinned vendor JS bundles into static/vendor/ (self-hosting)
+  and checks each against its SHA-384 in vendor.lock.json
+- Copies static files to static/dist/ under content-hashed names
+- Records them in static/dist/manifest.json for assets.asset_url()
+
+Run before precompress_assets.py so the hashed copies get .gz/.br variants.
+
+A bundle without a pin is not downloaded (pages load it from its CDN). After
+reviewing a new or upgraded bundle, record its hash with --pin; commit
+vendor.lock.json so every build and page checks the same bytes.
+
+Usage: python build_assets.py [--skip-vendor] [--pin]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import sys
+import urllib.request
+
+from assets import DIST_DIR, MANIFEST_NAME, VENDOR_BUNDLES, VENDOR_LOCK, load_vendor_lock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_PATH = os.path.join(STATIC_DIR, DIST_DIR)
+
+# Uploaded Tool Kit documents are user content, not build assets
+SKIP_DIRS = {DIST_DIR, 'documents'}
+SKIP_SUFFIXES = ('.gz', '.br', '.md')
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def hashed_name(relpath, digest, suffix=''):
+    stem, ext = os.path.splitext(relpath)
+    return f"{stem}.{digest}{suffix}{ext}"
+
+def integrity(path):
+    """Subresource Integrity value ("sha384-<base64>") of a file"""
+    digest = hashlib.sha384()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return 'sha384-' + base64.b64encode(digest.digest()).decode('ascii')
+
+def vendor_bundles(pin=False):
+    """Download and verify the vendor bundles; returns False when one does not match its pin"""
+    vendor_dir = os.path.join(STATIC_DIR, 'vendor')
+    os.makedirs(vendor_dir, exist_ok=True)
+    pins = load_vendor_lock()
+    ok = True
+    for filename, url in VENDOR_BUNDLES.items():
+        target = os.path.join(vendor_dir, filename)
+        if filename not in pins and not pin:
+            print(f"○ {filename} has no pin in {os.path.basename(VENDOR_LOCK)} - not self-hosted "
+                  "(review it, then run with --pin)")
+            continue
+        if not os.path.exists(target):
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response, open(target + '.tmp', 'wb') as f:
+                    shutil.copyfileobj(response, f)
+                os.replace(target + '.tmp', target)
+                print(f"✓ Downloaded {filename}")
+            except OSError as e:
+                print(f"✗ Could not download {filename}: {e} (pages fall back to the CDN)")
+                continue
+        actual = integrity(target)
+        if filename not in pins:
+            pins[filename] = actual
+            print(f"✓ Pinned {filename} {actual}")
+        elif actual != pins[filename]:
+            os.remove(target)
+            print(f"✗ {filename} does not match its pin ({actual} != {pins[filename]}); removed it")
+            ok = False
+        else:
+            print(f"✓ Verified {filename}")
+    if pin:
+        with open(VENDOR_LOCK, 'w', encoding='utf-8') as f:
+            json.dump(pins, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return ok
+
+def iter_static_files():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if root == STATIC_DIR:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in sorted(files):
+            if not name.endswith(SKIP_SUFFIXES):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+def build():
+    if os.path.isdir(DIST_PATH):
+        shutil.rmtree(DIST_PATH)
+    manifest = {'files': {}}
+
+    for relpath, path in iter_static_files():
+        digest = content_hash(path)
+        target_rel = hashed_name(relpath, digest)
+        target = os.path.join(DIST_PATH, target_rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(path, target)
+        manifest['files'][relpath] = target_rel
+        print(f"✓ {relpath} -> {DIST_DIR}/{target_rel}")
+
+    with open(os.path.join(DIST_PATH, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"\nWrote manifest with {len(manifest['files'])} files")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fingerprint static assets and vendor JS bundles')
+    parser.add_argument('--skip-vendor', action='store_true', help='do not download vendor bundles')
+    parser.add_argument('--pin', action='store_true',
+                        help='record the SHA-384 of bundles without a pin in vendor.lock.json')
+    args = parser.parse_args()
+    if not args.skip_vendor and not vendor_bundles(pin=args.pin):
+        sys.exit(1)
+    build()
@@ -0,0 +1,249 @@
+"""
+Compliance scoring
+
+Turns the raw test counts of inspection_submissions into compliance rates:
+the share of tests of each parameter that met the drinking-water standard.
+
+    chlorine         residual present (chlorine_positive) vs absent
+    bacteriological  negative vs positive samples (pending ones not counted)
+    ph, chemical, turbidity, temperature
+                     satisfactory vs non-satisfactory
+
+plus an overall rate over all tests. Rates are computed per supply, per
+agency and per parish for a window of days, with the change in percentage
+points from the window before it (the same number of days, or the previous
+month for monthly reports).
+
+The submissions of both windows are read once into a NumPy matrix and
+summed per (supply, window) with np.bincount; agency and parish figures
+are sums of the supply rows, so any window is scored in one pass without
+per-row Python. Responses are cached by data_cache and invalidated by
+writes to the months they cover.
+"""
+from datetime import date, timedelta
+from itertools import chain
+
+import numpy as np
+from flask import jsonify, request, session
+
+from data_cache import data_cache, months_between
+from partitions import partitions
+
+# (name, column counting compliant tests, column counting failed tests)
+PARAMETERS = (
+    ('chlorine', 'chlorine_positive', 'chlorine_negative'),
+    ('bacteriological', 'bacteriological_negative', 'bacteriological_positive'),
+    ('ph', 'ph_satisfactory', 'ph_non_satisfactory'),
+    ('chemical', 'chemical_satisfactory', 'chemical_non_satisfactory'),
+    ('turbidity', 'turbidity_satisfactory', 'turbidity_non_satisfactory'),
+    ('temperature', 'temperature_satisfactory', 'temperature_non_satisfactory'),
+)
+PARAMETER_NAMES = tuple(name for name, _, _ in PARAMETERS)
+LEVELS = ('supply', 'agency', 'parish')
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 3 * 366
+
+PREVIOUS, CURRENT = 0, 1
+
+
+class Window:
+    """Days ``start`` to ``end`` inclusive, compared with ``previous_start`` up to the day before ``start``"""
+
+    def __init__(self, start, end, previous_start=None):
+        self.start = start
+        self.end = end
+        self.previous_start = previous_start or start - (end - start) - timedelta(days=1)
+
+    @classmethod
+    def month(cls, year, month):
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        return cls(start, end, (start - timedelta(days=1)).replace(day=1))
+
+    @classmethod
+    def from_args(cls, args, today=None):
+        """?start= and ?end= (YYYY-MM-DD, inclusive); defaults to the last DEFAULT_WINDOW_DAYS days"""
+        end = date.fromisoformat(args['end']) if args.get('end') else (today or date.today())
+        start = (date.fromisoformat(args['start']) if args.get('start')
+                 else end - timedelta(days=DEFAULT_WINDOW_DAYS - 1))
+        if start > end:
+            raise ValueError('start is after end')
+        if (end - start).days >= MAX_WINDOW_DAYS:
+            raise ValueError(f"Windows are limited to {MAX_WINDOW_DAYS} days")
+        return cls(start, end)
+
+    @property
+    def scopes(self):
+        return months_between(self.previous_start, self.end)
+
+    def to_dict(self):
+        return {'start': self.start.isoformat(), 'end': self.end.isoformat(),
+                'previous_start': self.previous_start.isoformat(),
+                'previous_end': (self.start - timedelta(days=1)).isoformat()}
+
+
+def _matrix(rows, width):
+    """Float matrix of query rows (tuples, sqlite3.Row or dict rows)"""
+    values = chain.from_iterable(row.values() if isinstance(row, dict) else row for row in rows)
+    return np.fromiter(values, dtype=np.float64, count=len(rows) * width).reshape(len(rows), width)
+
+
+def _rates(totals):
+    """
+    Compliance figures from summed counts shaped (groups, 2 windows,
+    2 * parameters), compliant and failed counts interleaved. Returns
+    (tests, rates) shaped (groups, 2, parameters + 1), the last column
+    being all parameters together; rates are NaN where nothing was tested.
+    """
+    compliant = totals[:, :, 0::2]
+    tests = compliant + totals[:, :, 1::2]
+    compliant = np.concatenate([compliant, compliant.sum(axis=2, keepdims=True)], axis=2)
+    tests = np.concatenate([tests, tests.sum(axis=2, keepdims=True)], axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = np.where(tests > 0, compliant * 100.0 / tests, np.nan)
+    return tests, rates
+
+
+def _number(value, digits=1):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def score(supplies, rows):
+    """
+    Compliance per supply, agency and parish. ``supplies`` are water_supplies
+    rows (id, name, agency, parish, type); ``rows`` are (supply_id, window,
+    compliant, failed, ... per PARAMETERS) with window 0 for the previous
+    window and 1 for the current one. Returns {level: [result, ...]}.
+    """
+    supply_ids = np.array([supply['id'] for supply in supplies], dtype=np.int64)
+    count = len(supplies)
+    width = 2 + 2 * len(PARAMETERS)
+    data = _matrix(rows, width)
+
+    # Row -> supply position; submissions of supplies not being scored drop out
+    position = np.full(int(max(supply_ids.max(initial=0), data[:, 0].max(initial=0))) + 1, -1, dtype=np.int64)
+    position[supply_ids] = np.arange(count)
+    index = position[data[:, 0].astype(np.int64)]
+    keep = index >= 0
+    key = index[keep] * 2 + data[keep, 1].astype(np.int64)
+
+    totals = np.empty((count, 2, width - 2))
+    for column in range(width - 2):
+        totals[:, :, column] = np.bincount(key, weights=data[keep, column + 2], minlength=count * 2).reshape(count, 2)
+    submissions = np.bincount(key, minlength=count * 2).reshape(count, 2)
+
+    results = {}
+    for level in LEVELS:
+        if level == 'supply':
+            groups, level_totals, level_submissions = list(range(count)), totals, submissions
+            labels = [{'supply_id': supply['id'], 'name': supply['name'], 'agency': supply['agency'],
+                       'parish': supply['parish'], 'type': supply['type']} for supply in supplies]
+        else:
+            names, inverse = np.unique(np.array([supply[level] or '' for supply in supplies], dtype=object),
+                                       return_inverse=True)
+            level_totals = np.zeros((len(names), 2, width - 2))
+            np.add.at(level_totals, inverse, totals)
+            level_submissions = np.zeros((len(names), 2), dtype=np.int64)
+            np.add.at(level_submissions, inverse, submissions)
+            groups = list(range(len(names)))
+            labels = [{'name': name, 'supplies': int((inverse == group).sum())} for group, name in enumerate(names)]
+        tests, rates = _rates(level_totals)
+        deltas = rates[:, CURRENT] - rates[:, PREVIOUS]
+        level_results = []
+        for group in groups:
+            result = dict(labels[group])
+            result['submissions'] = int(level_submissions[group, CURRENT])
+            result['previous_submissions'] = int(level_submissions[group, PREVIOUS])
+            for column, name in enumerate(PARAMETER_NAMES + ('overall',)):
+                result[name] = {
+                    'tests': int(tests[group, CURRENT, column]),
+                    'rate': _number(rates[group, CURRENT, column]),
+                    'previous_rate': _number(rates[group, PREVIOUS, column]),
+                    'delta': _number(deltas[group, column]),
+                }
+            level_results.append(result)
+        results[level] = level_results
+    return results
+
+
+class ComplianceEngine:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+
+    def init_app(self, app, connect, postgres=False):
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+        self._register_routes(app)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def compute(self, window, parish=None):
+        """{level: [result, ...]} for a Window, optionally limited to one parish"""
+        columns = ', '.join(f"COALESCE({column}, 0)" for _, compliant, failed in PARAMETERS
+                            for column in (compliant, failed))
+        conn = self.connect()
+        try:
+            if parish:
+                supplies = self._execute(conn, '''
+                    SELECT id, name, agency, parish, type FROM water_supplies WHERE parish = ? ORDER BY name
+                ''', (parish,)).fetchall()
+            else:
+                supplies = self._execute(conn, '''
+                    SELECT id, name, agency, parish, type FROM water_supplies ORDER BY parish, name
+                ''').fetchall()
+            submissions = partitions.source(conn, window.previous_start, window.end)
+            rows = self._execute(conn, f'''
+                SELECT supply_id, CASE WHEN submission_date >= ? THEN 1 ELSE 0 END, {columns}
+                FROM {submissions} s
+                WHERE submission_date >= ? AND submission_date <= ?
+            ''', (window.start.isoformat(), window.previous_start.isoformat(), window.end.isoformat())).fetchall()
+        finally:
+            conn.close()
+        return score([dict(supply) for supply in supplies], rows)
+
+    def _register_routes(self, app):
+        def window_scopes():
+            try:
+                return Window.from_args(request.args).scopes
+            except ValueError:
+                return []
+
+        @app.route('/api/compliance')
+        @data_cache.cached(window_scopes, daily=True)
+        def get_compliance():
+            """
+            Compliance rates and trend deltas for dashboards: ?level=supply|agency|parish
+            (default parish), ?start=, ?end= (default the last 30 days), ?parish=
+            """
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            level = request.args.get('level', 'parish')
+            if level not in LEVELS:
+                return jsonify({'error': f"level must be one of {', '.join(LEVELS)}"}), 400
+            try:
+                window = Window.from_args(request.args)
+            except ValueError as e:
+                return jsonify({'error': f"Invalid window: {e}"}), 400
+            results = self.compute(window, request.args.get('parish') or None)
+            return jsonify({'window': window.to_dict(), 'level': level, 'parameters': PARAMETER_NAMES,
+                            'results': results[level]})
+
+        @app.route('/api/report/<int:year>/<int:month>/compliance')
+        @data_cache.cached(lambda year, month: Window.month(year, month).scopes)
+        def get_report_compliance(year, month):
+            """A month's compliance per supply, agency and parish, with changes from the month before; ?parish="""
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            window = Window.month(year, month)
+            results = self.compute(window, request.args.get('parish') or None)
+            return jsonify(dict(results, window=window.to_dict(), parameters=PARAMETER_NAMES))
+
+
+compliance = ComplianceEngine()
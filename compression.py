@@ -0,0 +1,136 @@
+"""
+Response compression for the Flask app
+
+Dynamic responses (HTML pages, JSON APIs) are compressed on the fly when
+they are large enough and of a compressible type. Static files that were
+precompressed at build time by precompress_assets.py are served from their
+.br/.gz variants instead, picked by the client's Accept-Encoding. Page shells
+carry their own variants in memory (see page_shells.py).
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_file
+from werkzeug.security import safe_join
+
+from metrics import record_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_CONFIG = {
+    'COMPRESS_ENABLED': True,
+    'COMPRESS_MIN_SIZE': 1024,
+    'COMPRESS_GZIP_LEVEL': 6,
+    'COMPRESS_BR_QUALITY': 4,
+    'COMPRESS_MIMETYPES': (
+        'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+        'application/json', 'image/svg+xml',
+    ),
+}
+
+# Precompressed variants, best first: (encoding, file suffix)
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+# File types worth precompressing; images, video and PDFs are already compressed
+PRECOMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt', '.md')
+
+
+def accepts(encoding):
+    """True when the current request accepts ``encoding``"""
+    return request.accept_encodings[encoding] > 0
+
+
+def choose_encoding():
+    """Pick the encoding for an on-the-fly compressed response"""
+    if brotli is not None and accepts('br'):
+        return 'br'
+    if accepts('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def precompressed_response(path, mimetype=None):
+    """
+    Serve a .br/.gz sibling of ``path`` when the client accepts it and the
+    variant is at least as new as the source file. Returns None otherwise.
+    """
+    try:
+        source_mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        variant = path + suffix
+        if not accepts(encoding):
+            continue
+        try:
+            stat = os.stat(variant)
+        except OSError:
+            continue
+        if stat.st_mtime < source_mtime:
+            continue
+
+        if mimetype is None:
+            mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        # The validator must differ from the identity representation's ETag
+        etag = f"{stat.st_mtime}-{stat.st_size}-{encoding}"
+        response = send_file(variant, mimetype=mimetype, conditional=True, etag=etag)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        record_cache('precompressed', True)
+        return response
+
+    if path.endswith(PRECOMPRESSIBLE_EXTENSIONS) and any(accepts(encoding) for encoding, _ in PRECOMPRESSED_VARIANTS):
+        record_cache('precompressed', False)
+    return None
+
+
+def init_compression(app):
+    """Register the compression middleware and precompressed static serving"""
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+
+    static_view = app.view_functions.get('static')
+    if static_view is not None:
+        def serve_static(filename):
+            path = safe_join(app.static_folder, filename)
+            if app.config['COMPRESS_ENABLED'] and path is not None:
+                response = precompressed_response(path)
+                if response is not None:
+                    return response
+            return static_view(filename=filename)
+        app.view_functions['static'] = serve_static
+
+    @app.after_request
+    def compress_response(response):
+        config = app.config
+        if not config['COMPRESS_ENABLED']:
+            return response
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers):
+            return response
+        if response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.set_data(compress_bytes(data, encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        return response
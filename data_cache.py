@@ -0,0 +1,222 @@
+"""
+Shared cache for aggregate JSON responses
+
+Dashboard, monthly report and chart responses are stored in the
+response_cache table, so every worker process shares them and they survive
+restarts and deploys. Each entry is stamped with the versions of the data
+scopes it was built from: one scope per month of submissions ("2025-06")
+plus "*" for everything else. Writes bump the version of the months they
+touch (data_versions) in the same transaction, which invalidates exactly
+the entries built from those months: last month's report stays cached while
+inspectors keep submitting for this month.
+
+Recently used bodies are also kept in process memory; they are still
+validated against data_versions on every hit, so a lookup costs one small
+indexed query.
+
+Keys start with DATA_CACHE_VERSION, by default a hash of the application's
+Python sources, so entries stored by an older deploy (whose responses may
+have another shape) are never served by a newer one.
+"""
+import functools
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import date, datetime
+
+from flask import request, session
+
+from metrics import record_cache
+
+DEFAULT_CONFIG = {
+    'DATA_CACHE_ENABLED': True,
+    'DATA_CACHE_LOCAL_ENTRIES': 256,
+    'DATA_CACHE_MAX_AGE': 7 * 24 * 3600,
+    # None: derived from the application's sources (code_version())
+    'DATA_CACHE_VERSION': None,
+}
+
+# Scope covering reference data (supplies, users) and bulk loads
+GLOBAL_SCOPE = '*'
+
+# Stored entries older than DATA_CACHE_MAX_AGE are deleted every this many stores
+PRUNE_EVERY = 200
+
+
+def month_scope(value):
+    """Scope of one month of submissions: "YYYY-MM" from a date, datetime, "YYYY-MM-DD..." string or (year, month)"""
+    if isinstance(value, tuple):
+        return f"{value[0]:04d}-{value[1]:02d}"
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m')
+    return str(value)[:7]
+
+
+def months_between(start, end):
+    """Month scopes from ``start`` to ``end`` inclusive"""
+    year, month = start.year, start.month
+    scopes = []
+    while (year, month) <= (end.year, end.month):
+        scopes.append(month_scope((year, month)))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return scopes
+
+
+def code_version():
+    """Short hash of the Python sources next to this module"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:12]
+
+
+class DataCache:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.stores = 0
+        self.version = None
+
+    def init_app(self, app, connect, postgres=False):
+        """``connect`` opens a database connection (the app's get_db_connection)"""
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+        self.version = app.config['DATA_CACHE_VERSION'] or code_version()
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def stamp(self, conn, scopes):
+        """Current versions of ``scopes`` as a canonical string"""
+        scopes = sorted(set(scopes))
+        marks = ', '.join('?' * len(scopes))
+        rows = self._execute(conn, f'SELECT scope, version FROM data_versions WHERE scope IN ({marks})',
+                             scopes).fetchall()
+        found = {row['scope']: row['version'] for row in rows}
+        return json.dumps([[scope, found.get(scope, 0)] for scope in scopes], separators=(',', ':'))
+
+    def bump(self, conn, *scopes):
+        """
+        Invalidate entries built from ``scopes``. Call with the connection of
+        the write, before its commit, so both land together.
+        """
+        for scope in set(scopes):
+            self._execute(conn, '''
+                INSERT INTO data_versions (scope, version) VALUES (?, 1)
+                ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1
+            ''', (scope,))
+
+    def cached(self, scopes, daily=False):
+        """
+        Cache a JSON view. ``scopes(**view_args)`` lists the month scopes the
+        response is built from; ``daily`` adds today's date to the key for
+        views whose window is relative to now (chart ranges).
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if 'user_id' not in session or not self.app.config['DATA_CACHE_ENABLED']:
+                    return view(*args, **kwargs)
+                key = self.key(daily)
+                try:
+                    conn = self.connect()
+                    try:
+                        # Stamped before building, so a write racing the build only causes a miss later
+                        stamp = self.stamp(conn, list(scopes(**kwargs)) + [GLOBAL_SCOPE])
+                        body = self._get(conn, key, stamp)
+                    finally:
+                        conn.close()
+                except Exception as e:
+                    print(f"[CACHE] Lookup failed for {key}: {e}")
+                    return view(*args, **kwargs)
+
+                record_cache('data', body is not None)
+                if body is not None:
+                    return self.app.response_class(body, mimetype='application/json')
+                response = self.app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and response.mimetype == 'application/json':
+                    self._put(key, stamp, response.get_data())
+                return response
+            return wrapper
+        return decorator
+
+    def lookup(self, key, scopes):
+        """(body or None, stamp) of an entry stored with store(); for results that are not views"""
+        conn = self.connect()
+        try:
+            stamp = self.stamp(conn, list(scopes) + [GLOBAL_SCOPE])
+            return self._get(conn, key, stamp), stamp
+        finally:
+            conn.close()
+
+    def store(self, key, stamp, body):
+        self._put(key, stamp, body)
+
+    def key(self, daily=False):
+        query = urllib.parse.urlencode(sorted(request.args.items(multi=True)))
+        key = f"{request.path}?{query}"
+        return f"{key}@{date.today().isoformat()}" if daily else key
+
+    def _get(self, conn, key, stamp):
+        key = f"{self.version}:{key}"
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.local.move_to_end(key)
+                return entry[1]
+        row = self._execute(conn, 'SELECT stamp, body FROM response_cache WHERE cache_key = ?', (key,)).fetchone()
+        if row is None or row['stamp'] != stamp:
+            return None
+        body = bytes(row['body'])
+        self._remember(key, stamp, body)
+        return body
+
+    def _put(self, key, stamp, body):
+        key = f"{self.version}:{key}"
+        self._remember(key, stamp, body)
+        try:
+            conn = self.connect()
+            try:
+                now = time.time()
+                self._execute(conn, '''
+                    INSERT INTO response_cache (cache_key, stamp, body, created) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (cache_key) DO UPDATE
+                    SET stamp = excluded.stamp, body = excluded.body, created = excluded.created
+                ''', (key, stamp, body, now))
+                self.stores += 1
+                if self.stores % PRUNE_EVERY == 0:
+                    self._execute(conn, 'DELETE FROM response_cache WHERE created < ?',
+                                  (now - self.app.config['DATA_CACHE_MAX_AGE'],))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"[CACHE] Could not store {key}: {e}")
+
+    def _remember(self, key, stamp, body):
+        with self.lock:
+            self.local[key] = (stamp, body)
+            self.local.move_to_end(key)
+            while len(self.local) > self.app.config['DATA_CACHE_LOCAL_ENTRIES']:
+                self.local.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+
+data_cache = DataCache()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic dataset generator for performance testing
+
+Builds a multi-year history of inspection submissions across every water
+supply and sampling point seeded by init_db() (water_supplies_data.py and the
+sampling point dictionaries in app.py). Inspectors are drawn from the
+supply's parish. The same seed, size and end date always produce the same
+rows.
+
+Rows follow the shape of real submissions: weekday-heavy schedules with
+growth over time, treated supplies that mostly pass chlorine tests,
+untreated ones with more bacteriological positives, worse results in the
+rainy seasons (May-June, September-November) and results still pending for
+the last two weeks.
+
+Rows are written through the fastest bulk path of each backend: batched
+executemany in one transaction on SQLite, COPY on PostgreSQL.
+
+Usage: python generate_dataset.py [--submissions 100000] [--years 3] [--seed 42]
+                                  [--end-date YYYY-MM-DD] [--truncate] [--no-signatures]
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from measurements import backfill as backfill_measurements
+from partitions import ensure_partitions
+
+SUBMISSION_COLUMNS = (
+    'id', 'supply_id', 'inspector_id', 'sampling_point_id', 'submission_date', 'visits',
+    'chlorine_total', 'chlorine_positive', 'chlorine_negative', 'chlorine_positive_range', 'chlorine_negative_range',
+    'bacteriological_total', 'bacteriological_positive', 'bacteriological_negative', 'bacteriological_pending',
+    'bacteriological_rejected', 'bacteriological_broken', 'bacteriological_rejected_reason',
+    'bacteriological_broken_reason', 'bacteriological_status', 'bacteriological_positive_status',
+    'bacteriological_negative_status', 'isolated_organism', 'ph_satisfactory', 'ph_non_satisfactory',
+    'ph_non_satisfactory_params', 'chemical_total', 'chemical_satisfactory', 'chemical_non_satisfactory',
+    'chemical_non_satisfactory_params', 'turbidity_satisfactory', 'turbidity_non_satisfactory',
+    'turbidity_non_satisfactory_range', 'temperature_satisfactory', 'temperature_non_satisfactory',
+    'temperature_non_satisfactory_range', 'remarks', 'facility_type', 'water_source_type', 'created_at',
+)
+SIGNATURE_COLUMNS = ('submission_id', 'inspector_id', 'action_type', 'signature_date', 'notes')
+
+# Same choices the inspector dashboard offers
+PH_PARAMETERS = ('Cond', 'TDS', 'Alk', 'Har', 'PO3/4-R', 'NO3-N', 'cHLD', 'SO4', 'Turb', 'Sal')
+CHEMICAL_PARAMETERS = ('Nitrate', 'Nitrite', 'Iron', 'Manganese', 'Lead', 'Arsenic')
+ORGANISMS = (('E. coli', 45), ('Coliform', 35), ('Enterococcus', 10), ('Pseudomonas', 6), ('Salmonella', 1),
+             ('Other', 3))
+FACILITY_TYPES = ('Health Center', 'Hospital', 'Commercial Building')
+CHLORINE_RANGES = tuple(f"{tenths / 10:.1f}" for tenths in range(1, 31))
+REJECTED_REASONS = ('Sample received after holding time', 'Bottle not sterile', 'Insufficient sample volume',
+                    'Label missing or illegible')
+BROKEN_REASONS = ('Bottle cracked in transit', 'Cap loose on arrival', 'Cooler damaged')
+REMARKS = (
+    'Residual chlorine within range', 'Low chlorine residual at end of line', 'Standpipe leaking, reported to NWC',
+    'Tank cover missing', 'Heavy rainfall prior to sampling', 'Turbid water after rains',
+    'Resample requested after positive result', 'No flow at time of visit', 'Chlorinator not functioning',
+    'Algae observed in catchment', 'Community complaints of taste and odour', 'Pipe repairs in progress',
+    'Boil water advisory issued', 'Supply restored after outage',
+)
+RAINY_MONTHS = {5, 6, 9, 10, 11}
+PENDING_DAYS = 14
+
+# Relative daily workload by weekday (Monday first)
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.9, 0.25, 0.05)
+
+
+def day_weights(start, end):
+    """Workload weight of every day from start to end: weekday pattern plus 40% growth"""
+    days = (end - start).days + 1
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        growth = 0.7 + 0.3 * offset / max(days - 1, 1)
+        weights.append(WEEKDAY_WEIGHTS[day.weekday()] * growth)
+    return weights
+
+
+def daily_counts(total, weights, rng):
+    """Split ``total`` rows over days in proportion to weights (largest remainder)"""
+    weight_sum = sum(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    counts = [int(value) for value in exact]
+    remainder = total - sum(counts)
+    order = sorted(range(len(exact)), key=lambda index: (exact[index] - counts[index], rng.random()), reverse=True)
+    for index in order[:remainder]:
+        counts[index] += 1
+    return counts
+
+
+def source_type(point_name, supply_type):
+    name = (point_name or '').lower()
+    for keyword, value in (('standpipe', 'standpipe'), ('tap', 'tap'), ('well', 'well'), ('spring', 'spring'),
+                           ('river', 'river'), ('tank', 'tank'), ('reservoir', 'reservoir'),
+                           ('plant', 'plant'), ('catchment', 'catchment')):
+        if keyword in name:
+            return value
+    return 'plant' if supply_type == 'treated' else 'spring'
+
+
+def binomial(rng, trials, probability):
+    return sum(1 for _ in range(trials) if rng.random() < probability)
+
+
+class DatasetGenerator:
+    """Generates submission rows for the supplies, sampling points and inspectors in a database"""
+
+    def __init__(self, supplies, sampling_points, inspectors, seed=42):
+        self.rng = random.Random(seed)
+        self.inspectors_by_parish = {}
+        for inspector_id, parish in inspectors:
+            self.inspectors_by_parish.setdefault(parish, []).append(inspector_id)
+        all_inspectors = [inspector_id for inspector_id, _ in inspectors]
+        if not all_inspectors:
+            raise ValueError('No inspectors found; run the app once to seed users')
+
+        points_by_supply = {}
+        for point_id, supply_id, name in sampling_points:
+            points_by_supply.setdefault(supply_id, []).append((point_id, name))
+
+        # Each supply gets a fixed quality profile; busier supplies have more sampling points
+        self.supplies = []
+        for supply_id, supply_type, parish in supplies:
+            treated = supply_type == 'treated'
+            self.supplies.append({
+                'id': supply_id,
+                'treated': treated,
+                'type': supply_type,
+                'points': points_by_supply.get(supply_id, [(None, None)]),
+                'inspectors': self.inspectors_by_parish.get(parish) or all_inspectors,
+                'chlorine_pass': self.rng.uniform(0.85, 0.98) if treated else self.rng.uniform(0.1, 0.4),
+                'bacterio_positive': self.rng.uniform(0.01, 0.06) if treated else self.rng.uniform(0.12, 0.35),
+            })
+        if not self.supplies:
+            raise ValueError('No water supplies found; run the app once to seed supplies')
+        self.supply_cum_weights = []
+        total = 0
+        for supply in self.supplies:
+            total += 1 + len(supply['points'])
+            self.supply_cum_weights.append(total)
+        self.organisms = [name for name, _ in ORGANISMS]
+        self.organism_weights = [weight for _, weight in ORGANISMS]
+
+    def rows(self, total, start, end, first_id=1):
+        """Yield (submission, signature) tuples in date order"""
+        rng = self.rng
+        counts = daily_counts(total, day_weights(start, end), rng)
+        pending_from = end - timedelta(days=PENDING_DAYS)
+        submission_id = first_id
+        for offset, count in enumerate(counts):
+            if not count:
+                continue
+            day = start + timedelta(days=offset)
+            day_text = day.isoformat()
+            season = 1.6 if day.month in RAINY_MONTHS else 1.0
+            recent = day > pending_from
+            supplies = rng.choices(self.supplies, cum_weights=self.supply_cum_weights, k=count)
+            for supply in supplies:
+                created_at = f"{day_text} {rng.randint(7, 16):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+                inspector_id = rng.choice(supply['inspectors'])
+                row = self._submission(supply, submission_id, inspector_id, day_text, created_at, season, recent)
+                signature = (submission_id, inspector_id, 'Initial Submission', created_at, 'Created inspection report')
+                yield row, signature
+                submission_id += 1
+
+    def _submission(self, supply, submission_id, inspector_id, day_text, created_at, season, recent):
+        rng = self.rng
+        point_id, point_name = rng.choice(supply['points'])
+
+        chlorine_total = rng.randint(2, 8) if supply['treated'] else rng.randint(0, 3)
+        chlorine_positive = binomial(rng, chlorine_total, supply['chlorine_pass'] / (season ** 0.5))
+        chlorine_negative = chlorine_total - chlorine_positive
+        if supply['treated']:
+            positive_range = CHLORINE_RANGES[min(max(int(rng.gauss(7, 3)), 0), 29)] if chlorine_positive else ''
+        else:
+            positive_range = rng.choice(CHLORINE_RANGES[:5]) if chlorine_positive else ''
+
+        bacterio_total = rng.randint(1, 4)
+        rejected = 1 if rng.random() < 0.01 else 0
+        broken = 1 if rng.random() < 0.005 else 0
+        tested = max(bacterio_total - rejected - broken, 0)
+        if recent and rng.random() < 0.7:
+            pending, positive, negative = tested, 0, 0
+        else:
+            pending = 0
+            positive = binomial(rng, tested, min(supply['bacterio_positive'] * season, 0.9))
+            negative = tested - positive
+        status = 'pending' if (pending > 0 or positive + negative == 0) else 'complete'
+        organism = rng.choices(self.organisms, weights=self.organism_weights)[0] if positive else ''
+
+        ph_non = 1 if rng.random() < 0.06 * season else 0
+        ph_params = rng.sample(PH_PARAMETERS, rng.randint(1, 2)) if ph_non else []
+        chemical_total = rng.randint(0, 2)
+        chemical_non = binomial(rng, chemical_total, 0.04)
+        chemical_params = rng.sample(CHEMICAL_PARAMETERS, rng.randint(1, 2)) if chemical_non else []
+        turbidity_non = 1 if rng.random() < (0.03 if supply['treated'] else 0.12) * season else 0
+        temperature_non = 1 if rng.random() < 0.02 else 0
+
+        remarks = rng.choice(REMARKS) if rng.random() < 0.25 else ''
+        if positive and rng.random() < 0.5:
+            remarks = 'Resample requested after positive result'
+
+        return (
+            submission_id, supply['id'], inspector_id, point_id, day_text, rng.choices((1, 2, 3), (70, 22, 8))[0],
+            chlorine_total, chlorine_positive, chlorine_negative, positive_range, '0' if chlorine_negative else '',
+            bacterio_total, positive, negative, pending, rejected, broken,
+            rng.choice(REJECTED_REASONS) if rejected else '', rng.choice(BROKEN_REASONS) if broken else '',
+            status, 'confirmed' if positive else '', 'confirmed' if negative else '', organism,
+            rng.randint(1, 3), ph_non, json.dumps(ph_params),
+            chemical_total, chemical_total - chemical_non, chemical_non, json.dumps(chemical_params),
+            rng.randint(1, 2), turbidity_non,
+            f"{rng.uniform(5, 9):.1f}-{rng.uniform(9, 25):.1f}" if turbidity_non else '',
+            rng.randint(1, 2), temperature_non, f"{rng.randint(30, 32)}-{rng.randint(33, 36)}" if temperature_non else '',
+            remarks, rng.choice(FACILITY_TYPES) if rng.random() < 0.15 else '',
+            source_type(point_name, supply['type']), created_at,
+        )
+
+
+def load_reference_data(cursor):
+    cursor.execute('SELECT id, type, parish FROM water_supplies ORDER BY id')
+    supplies = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+    cursor.execute('SELECT id, supply_id, name FROM sampling_points ORDER BY id')
+    points = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+    cursor.execute("SELECT id, parish FROM users WHERE role = 'inspector' ORDER BY id")
+    inspectors = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+    return supplies, points, inspectors
+
+
+def scalar(cursor, query):
+    cursor.execute(query)
+    row = cursor.fetchone()
+    return list(row.values())[0] if isinstance(row, dict) else row[0]
+
+
+def write_sqlite(conn, batches):
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute('PRAGMA temp_store = MEMORY')
+    cursor.execute('PRAGMA cache_size = -200000')
+    submission_sql = (f"INSERT INTO inspection_submissions ({', '.join(SUBMISSION_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(SUBMISSION_COLUMNS))})")
+    signature_sql = (f"INSERT INTO inspector_signatures ({', '.join(SIGNATURE_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(SIGNATURE_COLUMNS))})")
+    for submissions, signatures in batches:
+        cursor.executemany(submission_sql, submissions)
+        if signatures:
+            cursor.executemany(signature_sql, signatures)
+    conn.commit()
+    cursor.execute('PRAGMA synchronous = FULL')
+
+
+def _copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def write_postgresql(conn, batches):
+    cursor = conn.cursor()
+    for submissions, signatures in batches:
+        _copy(cursor, 'inspection_submissions', SUBMISSION_COLUMNS, submissions)
+        if signatures:
+            _copy(cursor, 'inspector_signatures', SIGNATURE_COLUMNS, signatures)
+    # Rows were written with explicit ids; move the sequence past them
+    cursor.execute("SELECT setval(pg_get_serial_sequence('inspection_submissions', 'id'), "
+                   "(SELECT COALESCE(MAX(id), 1) FROM inspection_submissions))")
+    conn.commit()
+
+
+def generate(conn, postgres, submissions, years=3, seed=42, end_date=None, truncate=False,
+             signatures=True, batch_size=5000, progress=True):
+    """Append ``submissions`` generated rows to the database behind ``conn``; returns the row count"""
+    cursor = conn.cursor()
+    if truncate:
+        if postgres:
+            # TRUNCATE skips the delete triggers, so the tables derived from submissions are listed too
+            cursor.execute('TRUNCATE inspector_signatures, inspection_submissions, submission_search, '
+                           'submission_measurements RESTART IDENTITY')
+        else:
+            cursor.execute('DELETE FROM inspector_signatures')
+            cursor.execute('DELETE FROM inspection_submissions')
+        conn.commit()
+
+    supplies, points, inspectors = load_reference_data(cursor)
+    generator = DatasetGenerator(supplies, points, inspectors, seed)
+    end = end_date or date.today()
+    start = end - timedelta(days=int(round(365.25 * years)) - 1)
+    first_id = (scalar(cursor, 'SELECT MAX(id) FROM inspection_submissions') or 0) + 1
+    if postgres:
+        # Route the history into its own partitions rather than the default one (partitions.py)
+        ensure_partitions(cursor, start, end)
+        conn.commit()
+
+    started = time.perf_counter()
+    state = {'written': 0}
+
+    def batches():
+        submission_batch, signature_batch = [], []
+        for submission, signature in generator.rows(submissions, start, end, first_id):
+            submission_batch.append(submission)
+            if signatures:
+                signature_batch.append(signature)
+            if len(submission_batch) >= batch_size:
+                yield submission_batch, signature_batch
+                state['written'] += len(submission_batch)
+                report()
+                submission_batch, signature_batch = [], []
+        if submission_batch:
+            yield submission_batch, signature_batch
+            state['written'] += len(submission_batch)
+            report()
+
+    def report():
+        if not progress:
+            return
+        elapsed = time.perf_counter() - started
+        print(f"\r  {state['written']:>12,} / {submissions:,} rows  {state['written'] / elapsed:>10,.0f} rows/s",
+              end='', flush=True)
+
+    (write_postgresql if postgres else write_sqlite)(conn, batches())
+    cursor = conn.cursor()
+    # Bulk writes bypass the app, so extract the new rows' measurements here (measurements.py)
+    backfill_measurements(cursor, postgres, after_id=first_id - 1)
+    # Invalidate every cached aggregate (data_cache.py)
+    cursor.execute("INSERT INTO data_versions (scope, version) VALUES ('*', 1) "
+                   "ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1")
+    cursor.execute('ANALYZE')
+    conn.commit()
+    if progress:
+        print()
+    return state['written']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic inspection history')
+    parser.add_argument('--submissions', type=int, default=100000, help='rows to generate (default 100000)')
+    parser.add_argument('--years', type=float, default=3, help='years of history ending at --end-date (default 3)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (default 42)')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                        help='last submission date, YYYY-MM-DD (default today; pin it for reproducible data)')
+    parser.add_argument('--truncate', action='store_true', help='delete existing submissions first')
+    parser.add_argument('--no-signatures', action='store_true', help='skip inspector_signatures rows')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per bulk write (default 5000)')
+    args = parser.parse_args()
+    if not 1 <= args.submissions <= 50_000_000:
+        parser.error('--submissions must be between 1 and 50,000,000')
+
+    # Importing the app creates and seeds the schema for the configured database
+    import app as water_app
+
+    conn = water_app.get_db_connection()
+    backend = 'PostgreSQL' if water_app.USE_POSTGRESQL else 'SQLite'
+    print(f"Generating {args.submissions:,} submissions over {args.years:g} years "
+          f"(seed {args.seed}) into {backend}...")
+    started = time.perf_counter()
+    try:
+        written = generate(conn, water_app.USE_POSTGRESQL, args.submissions, years=args.years, seed=args.seed,
+                           end_date=args.end_date, truncate=args.truncate, signatures=not args.no_signatures,
+                           batch_size=args.batch_size)
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Generation failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"✓ Wrote {written:,} submissions in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,429 @@
+"""
+Background jobs
+
+Long-running work (reports, chart aggregation over long ranges, exports) is
+submitted as a job instead of running inside the request handler. Each job
+type runs on one of two pools:
+
+    thread   I/O-bound work (mostly waiting on the database); runs inside an
+             application context on a thread pool
+    process  CPU-bound work; an optional prepare step loads the inputs on the
+             thread pool, then the compute function runs in a worker process.
+             Compute functions must be module-level so they can be pickled,
+             and live outside app.py (here or in submission_documents.py)
+             so workers do not import the app. Workers are forked from a
+             forkserver that preloads only those modules, never from the
+             server itself, whose Socket.IO, scheduler and alert threads may
+             hold locks at fork time.
+
+Each pool accepts a bounded number of queued plus running jobs
+(JOBS_THREAD_QUEUE, JOBS_PROCESS_QUEUE); further submissions are rejected
+with 503 rather than queued without limit. A streamed imap() holds one
+process slot until it is exhausted or closed. A shared job (one whose result
+does not depend on who asked) is visible to every user, and submitting it
+again while it is queued or running returns the same job. When a job finishes, a
+"job_complete" Socket.IO event is sent to the owner's personal room
+("user_<id>"). Jobs and their results are kept in memory for JOBS_RESULT_TTL
+seconds, so they do not survive a restart and are local to one worker.
+
+Endpoints:
+    POST /api/jobs               {"type": "report", "params": {...}} -> 202
+    GET  /api/jobs               the caller's jobs
+    GET  /api/jobs/<id>          status
+    GET  /api/jobs/<id>/result   JSON result or file download
+"""
+import csv
+import io
+import multiprocessing
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, jsonify, request, send_file, session
+
+from metrics import registry
+
+DEFAULT_CONFIG = {
+    'JOBS_THREAD_WORKERS': 4,
+    'JOBS_PROCESS_WORKERS': 2,
+    'JOBS_THREAD_QUEUE': 32,
+    'JOBS_PROCESS_QUEUE': 8,
+    'JOBS_RESULT_TTL': 3600,
+    'JOBS_KEEP': 500,
+}
+
+POOLS = ('thread', 'process')
+FINISHED = ('done', 'failed')
+
+# Modules the forkserver imports once, so workers start with the compute functions loaded
+WORKER_PRELOAD = ['jobs', 'submission_documents']
+
+# Session fields handed to job functions
+USER_FIELDS = ('user_id', 'username', 'role', 'full_name', 'parish')
+
+jobs_finished = registry.counter('jobs_finished_total', 'Background jobs finished, by type and status',
+                                 ('type', 'status'))
+jobs_rejected = registry.counter('jobs_rejected_total', 'Background jobs rejected because the pool queue was full',
+                                 ('type',))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobError(Exception):
+    """A job failed with a message that is safe to show to its owner"""
+
+
+class JobFile:
+    """A job result that is downloaded as a file rather than returned as JSON"""
+
+    def __init__(self, filename, data, mimetype='application/octet-stream'):
+        self.filename = filename
+        self.data = data
+        self.mimetype = mimetype
+
+
+class JobType:
+    def __init__(self, name, func, pool, prepare, admin_only, required):
+        self.name = name
+        self.func = func
+        self.pool = pool
+        self.prepare = prepare
+        self.admin_only = admin_only
+        self.required = required
+
+
+class Job:
+    def __init__(self, job_type, params, user, shared=False):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.user = user
+        self.shared = shared
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'type': self.type.name,
+            'pool': self.type.pool,
+            'params': self.params,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+        }
+        if self.status == 'done':
+            data['result_url'] = f"/api/jobs/{self.id}/result"
+            if isinstance(self.result, JobFile):
+                data['filename'] = self.result.filename
+        return data
+
+
+def run_view(path, user, query_string=None):
+    """
+    Call an existing GET endpoint as ``user`` and return its JSON body, so a
+    job produces exactly what the synchronous endpoint would. Request hooks
+    (metrics, compression) are skipped.
+    """
+    app = current_app._get_current_object()
+    with app.test_request_context(path, query_string=query_string):
+        session.update(user)
+        response = app.make_response(app.dispatch_request())
+    body = response.get_json(silent=True)
+    if response.status_code >= 400:
+        raise JobError((body or {}).get('error') or f"{path} returned {response.status_code}")
+    return body
+
+
+def rows_to_csv(columns, rows):
+    """CSV bytes (UTF-8 with BOM, so Excel detects the encoding); a process pool compute function"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def csv_file(filename, columns, rows):
+    """CSV download of ``rows``; a process pool compute function"""
+    return JobFile(filename, rows_to_csv(columns, rows), 'text/csv')
+
+
+class ProcessStream:
+    """Results of JobRunner.imap; holds a process queue slot until exhausted or closed"""
+
+    def __init__(self, runner, results):
+        self.runner = runner
+        self.results = results
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.results)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self.results.close()
+        if not self.closed:
+            self.closed = True
+            self.runner._release('process')
+
+
+class JobRunner:
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.types = {}
+        self.jobs = OrderedDict()
+        self.pending = dict.fromkeys(POOLS, 0)
+        self.lock = threading.Lock()
+        self._thread_pool = None
+        self._process_pool = None
+
+    def job_type(self, name, pool='thread', prepare=None, admin_only=False, required=()):
+        """Decorator registering a job function: func(params, user) or, on the process pool, func(*prepared)"""
+        if pool not in POOLS:
+            raise ValueError(f"pool must be one of {', '.join(POOLS)}")
+
+        def register(func):
+            self.types[name] = JobType(name, func, pool, prepare, admin_only, tuple(required))
+            return func
+        return register
+
+    @property
+    def thread_pool(self):
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.app.config['JOBS_THREAD_WORKERS'], thread_name_prefix='job')
+        return self._thread_pool
+
+    @property
+    def process_pool(self):
+        if self._process_pool is None:
+            # Created on first use, when the serving threads are already running, so never fork this
+            # process. The forkserver preloads the light modules instead of __main__ (the app); a child
+            # still imports the main script when it is app.py (the development server), not under gunicorn.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if context.get_start_method() == 'forkserver':
+                context.set_forkserver_preload(WORKER_PRELOAD)
+            self._process_pool = ProcessPoolExecutor(self.app.config['JOBS_PROCESS_WORKERS'], mp_context=context)
+        return self._process_pool
+
+    def submit(self, name, params, user, shared=False):
+        """
+        Queue a job; a ``shared`` one joins an identical shared job (same type
+        and params) that is still queued or running instead of adding another
+        """
+        job_type = self.types[name]
+        limit = self.app.config['JOBS_THREAD_QUEUE' if job_type.pool == 'thread' else 'JOBS_PROCESS_QUEUE']
+        with self.lock:
+            if shared:
+                for job in self.jobs.values():
+                    if job.shared and job.type is job_type and job.params == params and job.status not in FINISHED:
+                        return job
+            if self.pending[job_type.pool] >= limit:
+                jobs_rejected.inc(name)
+                raise JobQueueFull(job_type.pool)
+            self.pending[job_type.pool] += 1
+            self._prune()
+            job = Job(job_type, params, user, shared)
+            self.jobs[job.id] = job
+        # Process jobs also start on the thread pool: prepare runs there
+        self.thread_pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def jobs_for(self, user):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job for job in reversed(jobs) if job.user['user_id'] == user['user_id']]
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            with self.app.app_context():
+                if job.type.pool == 'thread':
+                    self._finish(job, result=job.type.func(job.params, job.user))
+                    return
+                args = job.type.prepare(job.params, job.user) if job.type.prepare else (job.params,)
+            future = self._submit_process(job.type.func, args)
+            future.add_done_callback(lambda done: self._process_done(job, done))
+        except JobError as e:
+            self._finish(job, error=str(e))
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, error=f"{type(e).__name__}: {e}")
+
+    def imap(self, func, iterable, window=None):
+        """
+        func(item) for every item on the process pool, yielded in input order.
+        At most ``window`` items (default: two per worker) are in flight, so
+        long inputs are consumed lazily; used by streaming responses. The
+        stream takes a slot of JOBS_PROCESS_QUEUE (JobQueueFull when none is
+        free) and gives it back when exhausted or closed.
+        """
+        with self.lock:
+            if self.pending['process'] >= self.app.config['JOBS_PROCESS_QUEUE']:
+                jobs_rejected.inc(func.__name__)
+                raise JobQueueFull('process')
+            self.pending['process'] += 1
+        return ProcessStream(self, self._imap(func, iterable, window or 2 * self.app.config['JOBS_PROCESS_WORKERS']))
+
+    def _imap(self, func, iterable, window):
+        pending = deque()
+        try:
+            for item in iterable:
+                pending.append(self._submit_process(func, (item,)))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for future in pending:
+                future.cancel()
+
+    def _release(self, pool):
+        with self.lock:
+            self.pending[pool] -= 1
+
+    def _submit_process(self, func, args):
+        try:
+            return self.process_pool.submit(func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool once
+            self._process_pool = None
+            return self.process_pool.submit(func, *args)
+
+    def _process_done(self, job, future):
+        try:
+            self._finish(job, result=future.result())
+        except Exception as e:
+            print(f"[JOBS] {job.type.name} job {job.id} failed in worker process: {e}")
+            self._finish(job, error=f"{type(e).__name__}: {e}")
+
+    def _finish(self, job, result=None, error=None):
+        job.result = result
+        job.error = error
+        job.status = 'failed' if error else 'done'
+        job.finished = time.time()
+        self._release(job.type.pool)
+        jobs_finished.inc(job.type.name, job.status)
+        print(f"[JOBS] {job.type.name} job {job.id} {job.status} in {job.finished - job.created:.2f}s")
+        if self.socketio is not None:
+            self.socketio.emit('job_complete', job.to_dict(), room=f"user_{job.user['user_id']}")
+
+    def _prune(self):
+        """Drop finished jobs past their TTL or beyond JOBS_KEEP; called with the lock held"""
+        cutoff = time.time() - self.app.config['JOBS_RESULT_TTL']
+        excess = len(self.jobs) - self.app.config['JOBS_KEEP']
+        for job_id, job in list(self.jobs.items()):
+            if job.status in FINISHED and (job.finished < cutoff or excess > 0):
+                del self.jobs[job_id]
+                excess -= 1
+
+    def shutdown(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+runner = JobRunner()
+
+
+def _current_user():
+    return {field: session.get(field) for field in USER_FIELDS}
+
+
+def _visible_job(job_id):
+    """The job when the caller may see it, otherwise None"""
+    job = runner.get(job_id)
+    if job is None:
+        return None
+    if job.user['user_id'] != session['user_id'] and session.get('role') != 'admin' and not job.shared:
+        return None
+    return job
+
+
+def init_jobs(app, socketio=None):
+    """Register the job endpoints; job types are added with runner.job_type"""
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    runner.app = app
+    runner.socketio = socketio
+    registry.gauge_callback('jobs_pending', 'Background jobs queued or running, by pool', ('pool',),
+                            lambda: {(pool,): count for pool, count in runner.pending.items()})
+
+    @app.route('/api/jobs', methods=['GET', 'POST'])
+    def jobs():
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if request.method == 'GET':
+            return jsonify([job.to_dict() for job in runner.jobs_for(_current_user())])
+
+        data = request.get_json(silent=True) or {}
+        job_type = runner.types.get(data.get('type'))
+        if job_type is None:
+            return jsonify({'error': f"Unknown job type. Available: {', '.join(sorted(runner.types))}"}), 400
+        if job_type.admin_only and session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        params = data.get('params') or {}
+        if not isinstance(params, dict):
+            return jsonify({'error': 'params must be an object'}), 400
+        missing = [name for name in job_type.required if params.get(name) in (None, '')]
+        if missing:
+            return jsonify({'error': f"Missing parameters: {', '.join(missing)}"}), 400
+        try:
+            job = runner.submit(job_type.name, params, _current_user())
+        except JobQueueFull:
+            response = jsonify({'error': 'Too many background jobs queued, try again shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        return jsonify(job.to_dict()), 202
+
+    @app.route('/api/jobs/<job_id>')
+    def job_status(job_id):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        job = _visible_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/api/jobs/<job_id>/result')
+    def job_result(job_id):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        job = _visible_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.status == 'failed':
+            return jsonify({'error': job.error}), 500
+        if job.status != 'done':
+            return jsonify({'error': 'Job not finished', 'status': job.status}), 409
+        if isinstance(job.result, JobFile):
+            return send_file(io.BytesIO(job.result.data), mimetype=job.result.mimetype,
+                             as_attachment=True, download_name=job.result.filename)
+        return jsonify(job.result)
+
+    return runner
@@ -0,0 +1,74 @@
+"""
+JSON provider used for all Flask responses
+
+Encodes database rows (sqlite3.Row and psycopg2 RealDictRow) directly, so
+routes can pass fetched rows straight to jsonify() without building a dict
+per row first. Dates are written as ISO 8601 strings and decimals as numbers
+on both backends. orjson is used when installed, otherwise the stdlib json
+module.
+"""
+import dataclasses
+import decimal
+import json
+import sqlite3
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_default(obj):
+    """Convert the types the encoders do not handle natively"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(zip(obj.keys(), obj))
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with a row-aware fast path"""
+
+    default = staticmethod(encode_default)
+
+    # Key order only matters for caching; sorting costs time on every response
+    sort_keys = False
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj, indent=False):
+        """Encode ``obj`` to UTF-8 bytes, the form responses are written in"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+        if indent:
+            return super().dumps(obj, indent=2).encode()
+        return super().dumps(obj, separators=(',', ':')).encode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,339 @@
+"""
+Normalised measurements
+
+inspection_submissions keeps parameter-level results in forms that can only
+be read row by row in Python: failed pH and chemical parameters as JSON
+lists (ph_non_satisfactory_params, chemical_non_satisfactory_params), and
+chlorine residuals and turbidity / temperature readings as free-form
+ranges ("0.7", "5.2-8.5", "30 - 33 °C"). submission_measurements holds the
+same facts one row per (submission, parameter):
+
+    category   chlorine, ph, chemical, turbidity or temperature
+    parameter  normalised name ("nitrate", "no3-n", "turbidity"); label
+               keeps the name as entered
+    flag       positive / negative (chlorine residual found or not) or
+               non_satisfactory
+    value_low, value_high
+               the parsed range (equal for a single reading), when there
+               is one; raw keeps the text
+
+Rows carry the submission's date and supply, and (parameter,
+submission_date) is indexed, so "which supplies failed nitrate last
+quarter" is an index range scan:
+
+    GET /api/measurements?parameter=nitrate&start=2025-04-01&end=2025-06-30
+
+Rows are written with their submission (record()), filled from existing
+submissions when the table is created, and after bulk loads by
+generate_dataset.py (backfill()). POST /api/admin/measurements/rebuild
+re-extracts everything.
+"""
+import json
+import re
+from datetime import date
+
+from flask import jsonify, request, session
+
+from partitions import partitions
+
+# Columns extract() reads
+SOURCE_COLUMNS = ('id', 'supply_id', 'submission_date', 'chlorine_positive_range', 'chlorine_negative_range',
+                  'ph_non_satisfactory_params', 'chemical_non_satisfactory_params',
+                  'turbidity_non_satisfactory_range', 'temperature_non_satisfactory_range')
+
+INSERT_COLUMNS = ('submission_id', 'supply_id', 'submission_date', 'category', 'parameter', 'label', 'flag',
+                  'value_low', 'value_high', 'raw')
+
+BACKFILL_BATCH = 5000
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+# "5.2-8.5", "5.2 - 8.5", "5.2–8.5", "5.2 to 8.5"
+_RANGE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:-|–|—|to)\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+_SEPARATORS = re.compile(r'[,;/]\s*|\s+and\s+', re.IGNORECASE)
+
+SQLITE_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS submission_measurements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        submission_id INTEGER NOT NULL,
+        supply_id INTEGER NOT NULL,
+        submission_date DATE NOT NULL,
+        category TEXT NOT NULL,
+        parameter TEXT NOT NULL,
+        label TEXT NOT NULL,
+        flag TEXT NOT NULL,
+        value_low REAL,
+        value_high REAL,
+        raw TEXT
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS submission_measurements_delete AFTER DELETE ON inspection_submissions BEGIN
+        DELETE FROM submission_measurements WHERE submission_id = OLD.id;
+    END
+    ''',
+)
+
+POSTGRES_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS submission_measurements (
+        id SERIAL PRIMARY KEY,
+        submission_id INTEGER NOT NULL,
+        supply_id INTEGER NOT NULL,
+        submission_date DATE NOT NULL,
+        category VARCHAR(20) NOT NULL,
+        parameter VARCHAR(100) NOT NULL,
+        label VARCHAR(100) NOT NULL,
+        flag VARCHAR(20) NOT NULL,
+        value_low DOUBLE PRECISION,
+        value_high DOUBLE PRECISION,
+        raw TEXT
+    )
+    ''',
+    # Stands in for ON DELETE CASCADE, which cannot point at the partitioned submissions table (partitions.py)
+    '''
+    CREATE OR REPLACE FUNCTION submission_measurements_delete() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM submission_measurements WHERE submission_id = OLD.id;
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS submission_measurements_delete ON inspection_submissions',
+    '''
+    CREATE TRIGGER submission_measurements_delete AFTER DELETE ON inspection_submissions
+    FOR EACH ROW EXECUTE FUNCTION submission_measurements_delete()
+    ''',
+)
+
+INDEXES = (
+    '''
+    CREATE INDEX IF NOT EXISTS idx_measurements_parameter_date
+    ON submission_measurements (parameter, submission_date)
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_measurements_submission ON submission_measurements (submission_id)',
+)
+
+
+def normalize_parameter(name):
+    """'NO₃-N ' -> 'no3-n'"""
+    return ' '.join(str(name).translate(str.maketrans('₀₁₂₃₄₅₆₇₈₉', '0123456789')).lower().split())
+
+
+def parse_range(text):
+    """(low, high) of a free-form reading or range; (None, None) when it holds no number"""
+    if text is None:
+        return None, None
+    text = str(text).strip()
+    match = _RANGE.search(text)
+    if match:
+        low, high = float(match.group(1)), float(match.group(2))
+        return min(low, high), max(low, high)
+    numbers = _NUMBER.findall(text)
+    if not numbers:
+        return None, None
+    value = float(numbers[0])
+    return value, value
+
+
+def parse_parameters(text):
+    """Parameter names from a JSON list, tolerating plain comma-separated text"""
+    if not text:
+        return []
+    try:
+        values = json.loads(text)
+    except (TypeError, ValueError):
+        values = _SEPARATORS.split(str(text))
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, list):
+        return []
+    return [str(value).strip() for value in values if str(value).strip()]
+
+
+def extract(submission):
+    """Measurement rows (INSERT_COLUMNS) of one submission row"""
+    base = (submission['id'], submission['supply_id'], submission['submission_date'])
+    rows = []
+
+    def reading(category, parameter, flag, text):
+        if text is None or not str(text).strip():
+            return
+        low, high = parse_range(text)
+        rows.append(base + (category, parameter, parameter.replace('_', ' ').title(), flag, low, high,
+                            str(text).strip()))
+
+    reading('chlorine', 'chlorine_residual', 'positive', submission['chlorine_positive_range'])
+    reading('chlorine', 'chlorine_residual', 'negative', submission['chlorine_negative_range'])
+    for category, column in (('ph', 'ph_non_satisfactory_params'), ('chemical', 'chemical_non_satisfactory_params')):
+        seen = set()
+        for label in parse_parameters(submission[column]):
+            parameter = normalize_parameter(label)
+            if parameter in seen:
+                continue
+            seen.add(parameter)
+            rows.append(base + (category, parameter, label, 'non_satisfactory', None, None, None))
+    reading('turbidity', 'turbidity', 'non_satisfactory', submission['turbidity_non_satisfactory_range'])
+    reading('temperature', 'temperature', 'non_satisfactory', submission['temperature_non_satisfactory_range'])
+    return rows
+
+
+def _sql(sql, postgres):
+    return sql.replace('?', '%s') if postgres else sql
+
+
+def _insert(cursor, rows, postgres):
+    if rows:
+        placeholders = ', '.join('?' for _ in INSERT_COLUMNS)
+        cursor.executemany(_sql(f"INSERT INTO submission_measurements ({', '.join(INSERT_COLUMNS)}) "
+                                f"VALUES ({placeholders})", postgres), rows)
+
+
+def backfill(cursor, postgres=False, after_id=0):
+    """
+    Extract the measurements of submissions with ids above ``after_id``, in
+    keyset batches; returns how many rows were written. The caller commits.
+    """
+    written = 0
+    while True:
+        cursor.execute(_sql(f'''
+            SELECT {', '.join(SOURCE_COLUMNS)} FROM inspection_submissions
+            WHERE id > ? ORDER BY id LIMIT {BACKFILL_BATCH}
+        ''', postgres), (after_id,))
+        submissions = cursor.fetchall()
+        if not submissions:
+            return written
+        rows = [row for submission in submissions for row in extract(submission)]
+        _insert(cursor, rows, postgres)
+        written += len(rows)
+        after_id = submissions[-1]['id']
+
+
+def create_schema(cursor, postgres=False):
+    """Create the table and its indexes (called from init_db); fills it from existing submissions when it is new"""
+    if postgres:
+        cursor.execute("SELECT to_regclass('submission_measurements') AS name")
+        row = cursor.fetchone()
+        exists = (row['name'] if isinstance(row, dict) else row[0]) is not None
+    else:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'submission_measurements'")
+        exists = cursor.fetchone() is not None
+    for statement in (POSTGRES_SCHEMA if postgres else SQLITE_SCHEMA) + INDEXES:
+        cursor.execute(statement)
+    if not exists:
+        written = backfill(cursor, postgres)
+        print(f"[MEASUREMENTS] Extracted {written} measurements from existing submissions")
+
+
+class Measurements:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+
+    def init_app(self, app, connect, postgres=False):
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+        self._register_routes(app)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(_sql(sql, self.postgres), params)
+        return cursor
+
+    def record(self, conn, submission_id):
+        """(Re)write the measurements of one submission; call with the write's connection before its commit"""
+        self._execute(conn, 'DELETE FROM submission_measurements WHERE submission_id = ?', (submission_id,))
+        submission = self._execute(conn, f'''
+            SELECT {', '.join(SOURCE_COLUMNS)} FROM inspection_submissions WHERE id = ?
+        ''', (submission_id,)).fetchone()
+        if submission is not None:
+            _insert(conn.cursor(), extract(submission), self.postgres)
+
+    def rebuild(self):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM submission_measurements')
+            written = backfill(cursor, self.postgres)
+            conn.commit()
+        finally:
+            conn.close()
+        return written
+
+    def failures(self, parameter, start, end, parish=None):
+        """Supplies with measurements of ``parameter`` between two dates, most occurrences first"""
+        conditions = ['m.parameter = ?', 'm.submission_date >= ?', 'm.submission_date <= ?']
+        values = [normalize_parameter(parameter), start.isoformat(), end.isoformat()]
+        if parish:
+            conditions.append('ws.parish = ?')
+            values.append(parish)
+        conn = self.connect()
+        try:
+            source = partitions.source(conn, start, end, 'submission_measurements')
+            rows = self._execute(conn, f'''
+                SELECT ws.id AS supply_id, ws.name AS supply_name, ws.parish, ws.agency,
+                       COUNT(*) AS occurrences, COUNT(DISTINCT m.submission_id) AS submissions,
+                       MIN(m.submission_date) AS first_date, MAX(m.submission_date) AS last_date,
+                       MIN(m.value_low) AS min_value, MAX(m.value_high) AS max_value
+                FROM {source} m
+                JOIN water_supplies ws ON ws.id = m.supply_id
+                WHERE {' AND '.join(conditions)}
+                GROUP BY ws.id, ws.name, ws.parish, ws.agency
+                ORDER BY occurrences DESC, ws.name
+            ''', values).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def _register_routes(self, app):
+        @app.route('/api/measurements')
+        def measurement_failures():
+            """
+            Supplies with results for one parameter: ?parameter= (e.g. nitrate,
+            turbidity, chlorine_residual), ?start=, ?end= (YYYY-MM-DD, default
+            this year so far), ?parish=
+            """
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            parameter = request.args.get('parameter', '').strip()
+            if not parameter:
+                return jsonify({'error': 'parameter is required'}), 400
+            try:
+                end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+                start = (date.fromisoformat(request.args['start']) if request.args.get('start')
+                         else end.replace(month=1, day=1))
+            except ValueError:
+                return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+            supplies = self.failures(parameter, start, end, request.args.get('parish') or None)
+            return jsonify({'parameter': normalize_parameter(parameter), 'start': start.isoformat(),
+                            'end': end.isoformat(), 'supplies': supplies})
+
+        @app.route('/api/measurements/parameters')
+        def measurement_parameters():
+            """Parameters that have measurements, with how many"""
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            conn = self.connect()
+            try:
+                rows = self._execute(conn, '''
+                    SELECT category, parameter, MIN(label) AS label, COUNT(*) AS measurements
+                    FROM submission_measurements
+                    GROUP BY category, parameter
+                    ORDER BY category, parameter
+                ''').fetchall()
+            finally:
+                conn.close()
+            return jsonify([dict(row) for row in rows])
+
+        @app.route('/api/admin/measurements/rebuild', methods=['POST'])
+        def rebuild_measurements():
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            return jsonify({'success': True, 'measurements': self.rebuild()})
+
+
+measurements = Measurements()
@@ -0,0 +1,297 @@
+"""
+Prometheus metrics without external dependencies
+
+Counters and histograms keep one value table per thread, so an update on the
+request path is a dict lookup and an add with no lock taken. The tables are
+summed when /metrics is scraped; tables of finished threads are folded into
+a retired total so nothing is lost when the server recycles threads. Gauges
+that describe current state (Socket.IO rooms, cache ratios) are computed at
+scrape time by callbacks.
+
+Exposed in the Prometheus text format (version 0.0.4) on /metrics. Set
+METRICS_TOKEN to require "Authorization: Bearer <token>" from the scraper.
+"""
+import hmac
+import re
+import threading
+import time
+
+from flask import g, request
+
+from water_supplies_data import PARISH_NAMES
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; request latency and DB connection open times
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONNECT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _label_key(item):
+    # Label values may be None (e.g. a user without a parish)
+    return tuple(str(value) for value in item[0])
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _ThreadShards:
+    """Per-thread value tables, merged when scraped"""
+
+    def __init__(self, new_value, merge):
+        self._new_value = new_value
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+
+    def table(self):
+        """The calling thread's table; only the first call per thread locks"""
+        try:
+            return self._local.table
+        except AttributeError:
+            table = self._local.table = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), table))
+            return table
+
+    def collect(self):
+        with self._lock:
+            live = []
+            for thread, table in self._shards:
+                if thread.is_alive():
+                    live.append(table)
+                else:
+                    self._fold(self._retired, table)
+            self._shards = [(thread, table) for thread, table in self._shards if thread.is_alive()]
+            totals = {}
+            self._fold(totals, self._retired)
+        for table in live:
+            # list() copies the items atomically under the GIL
+            self._fold(totals, table)
+        return totals
+
+    def _fold(self, into, table):
+        for key, value in list(table.items()):
+            if key in into:
+                into[key] = self._merge(into[key], value)
+            else:
+                into[key] = self._merge(self._new_value(), value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards(float, lambda total, value: total + value)
+
+    def inc(self, *labelvalues, amount=1.0):
+        table = self._shards.table()
+        table[labelvalues] = table.get(labelvalues, 0.0) + amount
+
+    def samples(self):
+        for labelvalues, value in sorted(self._shards.collect().items(), key=_label_key):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+    def values(self):
+        return self._shards.collect()
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        size = len(self.buckets) + 2  # per-bucket counts, then sum and count
+        self._shards = _ThreadShards(lambda: [0.0] * size,
+                                     lambda total, value: [a + b for a, b in zip(total, value)])
+
+    def observe(self, value, *labelvalues):
+        table = self._shards.table()
+        counts = table.get(labelvalues)
+        if counts is None:
+            counts = table[labelvalues] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self):
+        for labelvalues, counts in sorted(self._shards.collect().items(), key=_label_key):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames, labelvalues, [('le', _format_value(bound))]), cumulative)
+            yield f"{self.name}_bucket", _format_labels(self.labelnames, labelvalues, [('le', '+Inf')]), counts[-1]
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labelvalues), counts[-2]
+            yield f"{self.name}_count", _format_labels(self.labelnames, labelvalues), counts[-1]
+
+
+class CallbackGauge:
+    """Gauge whose ``{labelvalues: value}`` is produced by a function at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        for labelvalues, value in sorted(self.callback().items(), key=_label_key):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge_callback(self, *args, **kwargs):
+        return self.register(CallbackGauge(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+            except Exception as e:
+                print(f"[METRICS] Could not collect {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('method', 'route', 'status'))
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route'))
+db_connections = registry.counter(
+    'db_connections_opened_total', 'Database connections opened', ('backend',))
+db_connection_open_duration = registry.histogram(
+    'db_connection_open_seconds', 'Time to open (check out) a database connection', ('backend',),
+    buckets=CONNECT_BUCKETS)
+socketio_emits = registry.counter(
+    'socketio_emits_total', 'Socket.IO events emitted by the server', ('event', 'room'))
+submissions_written = registry.counter(
+    'submissions_written_total', 'Inspection submissions written, by parish and action', ('parish', 'action'))
+cache_requests = registry.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result'))
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (cache, result), value in cache_requests.values().items():
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (value if result == 'hit' else 0.0), lookups + value)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+registry.gauge_callback('cache_hit_ratio', 'Share of cache lookups that were hits since startup',
+                        ('cache',), _cache_hit_ratios)
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache, 'hit' if hit else 'miss')
+
+
+# Room label values: shared rooms keep their name, per-user rooms count as "user", anything else as "other"
+SHARED_ROOMS = frozenset(['admin', 'broadcast'] + [f"admin_{parish}" for parish in PARISH_NAMES])
+_USER_ROOM = re.compile(r'^user_\d+$')
+
+
+def room_label(room):
+    """Bounded label value of a Socket.IO room"""
+    if room in SHARED_ROOMS:
+        return room
+    return 'user' if _USER_ROOM.match(str(room)) else 'other'
+
+
+def instrument_socketio(socketio):
+    """Count server emits per event and expose connected clients per room"""
+    original_emit = socketio.emit
+
+    def emit(event, *args, **kwargs):
+        room = kwargs.get('room') or kwargs.get('to') or 'broadcast'
+        # Several rooms at once (each client still gets the event once)
+        rooms = room if isinstance(room, (list, tuple)) else [room]
+        socketio_emits.inc(event, ','.join(sorted({room_label(room) for room in rooms})))
+        return original_emit(event, *args, **kwargs)
+    socketio.emit = emit
+
+    def clients_per_room():
+        rooms = {}
+        manager = socketio.server.manager if socketio.server else None
+        for namespace, namespace_rooms in (manager.rooms.items() if manager else ()):
+            for room, members in list(namespace_rooms.items()):
+                # Every client also sits alone in a room named after its sid
+                if room is not None and room in members:
+                    continue
+                key = (namespace, room_label(room) if room is not None else '*')
+                rooms[key] = rooms.get(key, 0) + len(members)
+        return rooms
+
+    registry.gauge_callback('socketio_room_clients',
+                            'Connected Socket.IO clients per room ("*" is all connected clients, "user" the '
+                            'personal rooms together)',
+                            ('namespace', 'room'), clients_per_room)
+
+
+def init_metrics(app):
+    """Register request timing hooks and the /metrics endpoint"""
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            http_request_duration.observe(time.perf_counter() - start, request.method, route)
+            http_requests.inc(request.method, route, str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+        return app.response_class(registry.render(), content_type=CONTENT_TYPE)
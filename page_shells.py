@@ -0,0 +1,78 @@
+"""
+Prerendered page shells
+
+Pages whose HTML does not depend on the logged-in user - login, admin,
+report, upload and the inspector dashboard shared by every parish - are
+rendered once at startup and kept in memory together with maximum-compression
+gzip/Brotli variants and a content ETag. Requests then skip template
+rendering and compression entirely, and browsers revalidate their cached copy
+with a 304. All other templates are compiled at startup as well, so the first
+request after a deploy does not pay for parsing them.
+
+In debug mode shells are rendered per request so template edits show up.
+"""
+import gzip
+import hashlib
+
+from flask import render_template, request
+
+from compression import accepts, brotli
+from metrics import record_cache
+
+SHELL_TEMPLATES = ('login.html', 'admin.html', 'report.html', 'upload.html', 'inspector_dashboard.html')
+
+# Pages sit behind a session check, so shared caches must not store them;
+# browsers keep them but revalidate on every navigation
+SHELL_CACHE_CONTROL = 'private, no-cache'
+
+
+class PageShells:
+    """In-memory cache of rendered, precompressed page shells"""
+
+    def __init__(self):
+        self.app = None
+        self.context = {}
+        self._shells = {}
+
+    def init_app(self, app, **context):
+        """Compile every template and render the shells with ``context``"""
+        self.app = app
+        self.context = context
+        templates = app.jinja_env.list_templates(extensions=['html'])
+        for name in templates:
+            app.jinja_env.get_template(name)
+        if app.debug:
+            return
+        # url_for() in templates needs a request context; URLs come out relative
+        with app.test_request_context('/'):
+            for name in SHELL_TEMPLATES:
+                self._shells[name] = self._build(name)
+        print(f"[SHELLS] Compiled {len(templates)} templates, "
+              f"prerendered {len(self._shells)} page shells")
+
+    def _build(self, name):
+        data = render_template(name, **self.context).encode('utf-8')
+        etag = hashlib.sha256(data).hexdigest()[:16]
+        variants = {None: data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        return etag, variants
+
+    def response(self, name):
+        """Serve a shell, or render it normally when it is not prerendered"""
+        shell = self._shells.get(name)
+        record_cache('page_shells', shell is not None)
+        if shell is None:
+            return render_template(name, **self.context)
+
+        etag, variants = shell
+        encodings = ('br', 'gzip') if self.app.config['COMPRESS_ENABLED'] else ()
+        encoding = next((enc for enc in encodings if enc in variants and accepts(enc)), None)
+        response = self.app.response_class(variants[encoding], mimetype='text/html')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+            etag = f"{etag}-{encoding}"
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = SHELL_CACHE_CONTROL
+        return response.make_conditional(request)
@@ -0,0 +1,468 @@
+"""
+Time partitioning of submissions
+
+Almost every read of inspection_submissions is for the current or previous
+month, so history is kept out of their way:
+
+    PostgreSQL  inspection_submissions is partitioned by range of
+                submission_date, one partition per month (or per year, with
+                SUBMISSION_PARTITIONS=year; "off" keeps one table). init_db
+                converts an existing table in place, and partitions are
+                created from the first submission to PARTITIONS_AHEAD
+                intervals past today, on start and by the monthly scheduler
+                task. Rows outside every partition land in the default
+                partition and are moved out when theirs is created. The
+                planner prunes partitions a date range cannot touch.
+
+    SQLite      With SUBMISSION_ARCHIVE_ENABLED (off by default), closed
+                years (ending SUBMISSION_ARCHIVE_GRACE_DAYS ago) are moved - submissions, their signatures and measurements - into
+                one database file per year, gzip-compressed at rest under
+                SUBMISSION_ARCHIVE_DIR and listed in submission_archives. A
+                query for a date range uses source() as its table: the main
+                table while the range only covers live years, otherwise a
+                UNION ALL with the archives it overlaps, which are
+                decompressed once into SUBMISSION_ARCHIVE_CACHE_DIR and
+                attached to the connection.
+
+Archived submissions keep their ids (AUTOINCREMENT never reuses them), so
+they still open and download by id. They drop out of the search index and
+cannot be edited until POST /api/admin/archive/<year>/restore brings their
+year back.
+"""
+import gzip
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import jsonify, session
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TABLE = 'inspection_submissions'
+DEFAULT_PARTITION = 'inspection_submissions_default'
+INTERVALS = ('month', 'year')
+PARTITION_INTERVAL = os.environ.get('SUBMISSION_PARTITIONS', 'month')
+PARTITIONS_AHEAD = 3
+
+DEFAULT_CONFIG = {
+    'SUBMISSION_ARCHIVE_ENABLED': False,
+    'SUBMISSION_ARCHIVE_DIR': os.path.join(BASE_DIR, 'archive'),
+    'SUBMISSION_ARCHIVE_CACHE_DIR': os.path.join(tempfile.gettempdir(), 'water_monitoring_archive'),
+    'SUBMISSION_ARCHIVE_GRACE_DAYS': 90,
+}
+
+# Tables moved into a year's archive, with the condition selecting the year's rows (first and last day)
+ARCHIVED_TABLES = (
+    (TABLE, 'submission_date >= ? AND submission_date <= ?'),
+    ('inspector_signatures', f'submission_id IN (SELECT id FROM main.{TABLE} '
+                             'WHERE submission_date >= ? AND submission_date <= ?)'),
+    ('submission_measurements', 'submission_date >= ? AND submission_date <= ?'),
+)
+
+ARCHIVE_INDEXES = (
+    f'CREATE INDEX {{schema}}.idx_archive_submissions_date ON {TABLE} (submission_date)',
+    'CREATE INDEX {schema}.idx_archive_signatures_submission ON inspector_signatures (submission_id)',
+    '''
+    CREATE INDEX {schema}.idx_archive_measurements_parameter_date
+    ON submission_measurements (parameter, submission_date)
+    ''',
+)
+
+INDEXES = (
+    f'CREATE INDEX IF NOT EXISTS idx_submissions_date ON {TABLE} (submission_date)',
+    f'CREATE INDEX IF NOT EXISTS idx_submissions_supply_date ON {TABLE} (supply_id, submission_date)',
+)
+
+SQLITE_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS submission_archives (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        submissions INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        compressed_size INTEGER NOT NULL,
+        archived_at REAL NOT NULL
+    )
+    ''',
+)
+
+_PARTITION_NAME = re.compile(rf'^{TABLE}_(\d{{4}})(?:_(\d{{2}}))?$')
+
+
+def _value(row):
+    if row is None:
+        return None
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def _as_date(value):
+    return date.fromisoformat(str(value)[:10]) if value else None
+
+
+def bounds(day, interval):
+    """[lower, upper) of the partition holding ``day``"""
+    if interval == 'year':
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+    return day.replace(day=1), date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(lower, interval):
+    return f"{TABLE}_{lower.year}" if interval == 'year' else f"{TABLE}_{lower:%Y_%m}"
+
+
+def list_partitions(cursor):
+    """(name, bounds expression, estimated rows) of each partition, oldest first; empty when not partitioned"""
+    cursor.execute('''
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bounds, c.reltuples AS estimated_rows
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    ''', (TABLE,))
+    return [dict(row) if isinstance(row, dict) else dict(zip(('name', 'bounds', 'estimated_rows'), row))
+            for row in cursor.fetchall()]
+
+
+def partition_interval(cursor):
+    """'month' or 'year' as laid out by existing partitions, None when the table is not partitioned"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TABLE,))
+    if _value(cursor.fetchone()) != 'p':
+        return None
+    for partition in list_partitions(cursor):
+        match = _PARTITION_NAME.match(partition['name'])
+        if match:
+            return 'month' if match.group(2) else 'year'
+    return PARTITION_INTERVAL if PARTITION_INTERVAL in INTERVALS else 'month'
+
+
+def ensure_partitions(cursor, start, end):
+    """Create the missing partitions covering ``start`` to ``end`` (PostgreSQL); returns their names"""
+    interval = partition_interval(cursor)
+    if interval is None:
+        return []
+    created = []
+    day = start
+    while day <= end:
+        lower, upper = bounds(day, interval)
+        name = partition_name(lower, interval)
+        cursor.execute('SELECT to_regclass(%s)', (name,))
+        if _value(cursor.fetchone()) is None:
+            values = f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            cursor.execute(f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE submission_date >= %s AND submission_date < %s '
+                           'LIMIT 1', (lower, upper))
+            if cursor.fetchone() is None:
+                cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} {values}')
+            else:
+                # The range has rows in the default partition: move them into a new table and attach it. The
+                # triggers are disabled for the move so search and measurement rows of the moved submissions stay
+                cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                cursor.execute(f'ALTER TABLE {DEFAULT_PARTITION} DISABLE TRIGGER USER')
+                cursor.execute(f'''
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION} WHERE submission_date >= %s AND submission_date < %s
+                        RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved
+                ''', (lower, upper))
+                cursor.execute(f'ALTER TABLE {DEFAULT_PARTITION} ENABLE TRIGGER USER')
+                cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} {values}')
+            created.append(name)
+        day = upper
+    return created
+
+
+def _partition_table(cursor, interval):
+    """Turn the plain inspection_submissions table into a partitioned one, keeping its rows and id sequence"""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (TABLE,))
+    sequence = _value(cursor.fetchone())
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    # The partition key has to be part of the primary key
+    cursor.execute(f'''
+        CREATE TABLE {TABLE} (
+            LIKE {TABLE}_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (id, submission_date),
+            FOREIGN KEY (supply_id) REFERENCES water_supplies (id),
+            FOREIGN KEY (inspector_id) REFERENCES users (id),
+            FOREIGN KEY (sampling_point_id) REFERENCES sampling_points (id)
+        ) PARTITION BY RANGE (submission_date)
+    ''')
+    cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+    cursor.execute(f'SELECT MIN(submission_date) FROM {TABLE}_unpartitioned')
+    first = _as_date(_value(cursor.fetchone())) or date.today()
+    ensure_partitions(cursor, first, _ahead(date.today(), interval))
+    cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id')
+    # Also drops the constraints and triggers that pointed at the old table
+    cursor.execute(f'DROP TABLE {TABLE}_unpartitioned CASCADE')
+    print(f"[PARTITIONS] Partitioned {TABLE} by {interval}")
+
+
+def _ahead(today, interval):
+    day = today
+    for _ in range(PARTITIONS_AHEAD):
+        day = bounds(day, interval)[1]
+    return day - timedelta(days=1)
+
+
+def create_schema(cursor, postgres=False):
+    """
+    Partition inspection_submissions and create the partitions due
+    (PostgreSQL; once partitioned the table stays so even with
+    SUBMISSION_PARTITIONS=off), or create the archive catalogue (SQLite).
+    Called from init_db before the schemas derived from submissions.
+    """
+    if postgres:
+        interval = partition_interval(cursor)
+        if interval is None and PARTITION_INTERVAL in INTERVALS:
+            _partition_table(cursor, PARTITION_INTERVAL)
+            interval = PARTITION_INTERVAL
+        if interval is not None:
+            cursor.execute(f'SELECT MIN(submission_date) FROM {TABLE}')
+            first = _as_date(_value(cursor.fetchone())) or date.today()
+            ensure_partitions(cursor, first, _ahead(date.today(), interval))
+    else:
+        for statement in SQLITE_SCHEMA:
+            cursor.execute(statement)
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+
+class SubmissionPartitions:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+
+    def init_app(self, app, connect, postgres=False):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+        self._register_routes(app)
+
+    # Archives (SQLite)
+
+    def archive_path(self, year):
+        return os.path.join(self.app.config['SUBMISSION_ARCHIVE_DIR'], f'submissions_{year}.db.gz')
+
+    def is_closed(self, year, today=None):
+        grace = timedelta(days=self.app.config['SUBMISSION_ARCHIVE_GRACE_DAYS'])
+        return date(year + 1, 1, 1) + grace <= (today or date.today())
+
+    def archived_years(self, conn):
+        if self.postgres:
+            return []
+        return [row[0] for row in conn.execute('SELECT year FROM submission_archives ORDER BY year').fetchall()]
+
+    def materialize(self, year):
+        """Path of the decompressed archive of ``year``, decompressing it when the cached copy is missing or older"""
+        compressed = self.archive_path(year)
+        cache_dir = self.app.config['SUBMISSION_ARCHIVE_CACHE_DIR']
+        path = os.path.join(cache_dir, f'submissions_{year}.db')
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(compressed):
+            os.makedirs(cache_dir, exist_ok=True)
+            partial = f'{path}.{os.getpid()}.tmp'
+            with gzip.open(compressed, 'rb') as source, open(partial, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(partial, path)
+        return path
+
+    def attach(self, conn, year):
+        """Attach the archive of ``year`` to a connection (once); returns its schema name"""
+        schema = f'archive_{year}'
+        if schema not in {row[1] for row in conn.execute('PRAGMA database_list').fetchall()}:
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (self.materialize(year),))
+        return schema
+
+    def source(self, conn, start=None, end=None, table=TABLE):
+        """
+        Table expression of ``table`` for a query of ``start`` to ``end``
+        (dates, None for open ends): the table itself, or on SQLite a
+        subquery also reaching into the archives of the years in range.
+        """
+        years = [year for year in self.archived_years(conn)
+                 if (start is None or year >= start.year) and (end is None or year <= end.year)]
+        if not years:
+            return table
+        columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info({table})').fetchall()]
+        selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+        for year in years:
+            schema = self.attach(conn, year)
+            archived = {row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})').fetchall()}
+            # Columns added after the year was archived read as NULL
+            selects.append(f"SELECT {', '.join(c if c in archived else f'NULL AS {c}' for c in columns)} "
+                           f"FROM {schema}.{table}")
+        return f"({' UNION ALL '.join(selects)})"
+
+    def archive_year(self, year):
+        """Move a closed year into its compressed archive; returns the number of submissions moved"""
+        if self.postgres:
+            raise ValueError('Years are archived on SQLite only; PostgreSQL partitions prune them instead')
+        if not self.is_closed(year):
+            raise ValueError(f"{year} is not closed yet")
+        first, last = f'{year}-01-01', f'{year}-12-31'
+        compressed = self.archive_path(year)
+        staging = compressed[:-len('.gz')] + '.staging'
+        os.makedirs(os.path.dirname(compressed), exist_ok=True)
+        if os.path.exists(staging):
+            os.remove(staging)
+        conn = self.connect()
+        try:
+            if year in self.archived_years(conn):
+                raise ValueError(f"{year} is already archived")
+            conn.execute('ATTACH DATABASE ? AS staging', (staging,))
+            for table, condition in ARCHIVED_TABLES:
+                conn.execute(f'CREATE TABLE staging.{table} AS SELECT * FROM main.{table} WHERE {condition}',
+                             (first, last))
+            for statement in ARCHIVE_INDEXES:
+                conn.execute(statement.format(schema='staging'))
+            count = conn.execute(f'SELECT COUNT(*) FROM staging.{TABLE}').fetchone()[0]
+            conn.commit()
+            if count:
+                partial = f'{compressed}.tmp'
+                with open(staging, 'rb') as source, gzip.open(partial, 'wb', compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(partial, compressed)
+                # The delete triggers of the search index and measurements clean up after the submissions
+                for table, condition in reversed(ARCHIVED_TABLES):
+                    conn.execute(f'DELETE FROM main.{table} WHERE {condition}', (first, last))
+                conn.execute('''
+                    INSERT INTO submission_archives (year, path, submissions, size, compressed_size, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (year, compressed, count, os.path.getsize(staging), os.path.getsize(compressed), time.time()))
+                conn.commit()
+            conn.execute('DETACH DATABASE staging')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+            if os.path.exists(staging):
+                os.remove(staging)
+        if count:
+            print(f"[PARTITIONS] Archived {count} submissions of {year} to {compressed}")
+        return count
+
+    def restore_year(self, year):
+        """Move an archived year back into the main tables; returns the number of submissions restored"""
+        conn = self.connect()
+        try:
+            if year not in self.archived_years(conn):
+                raise ValueError(f"{year} is not archived")
+            schema = self.attach(conn, year)
+            count = conn.execute(f'SELECT COUNT(*) FROM {schema}.{TABLE}').fetchone()[0]
+            for table, _ in ARCHIVED_TABLES:
+                archived = {row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})').fetchall()}
+                columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})').fetchall()
+                                    if row[1] in archived)
+                conn.execute(f'INSERT OR IGNORE INTO main.{table} ({columns}) SELECT {columns} FROM {schema}.{table}')
+            conn.execute('DELETE FROM submission_archives WHERE year = ?', (year,))
+            conn.commit()
+            conn.execute(f'DETACH DATABASE {schema}')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        for path in (self.archive_path(year),
+                     os.path.join(self.app.config['SUBMISSION_ARCHIVE_CACHE_DIR'], f'submissions_{year}.db')):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"[PARTITIONS] Restored {count} submissions of {year}")
+        return count
+
+    def archive_closed_years(self):
+        """Archive every closed year still in the main tables; returns {year: submissions}"""
+        conn = self.connect()
+        try:
+            first = _as_date(conn.execute(f'SELECT MIN(submission_date) FROM {TABLE}').fetchone()[0])
+            archived = set(self.archived_years(conn))
+        finally:
+            conn.close()
+        if first is None:
+            return {}
+        moved = {}
+        for year in range(first.year, date.today().year):
+            if year not in archived and self.is_closed(year):
+                moved[year] = self.archive_year(year)
+        return moved
+
+    def maintain(self):
+        """Create upcoming partitions (PostgreSQL) or archive closed years (SQLite)"""
+        if self.postgres:
+            conn = self.connect()
+            try:
+                cursor = conn.cursor()
+                interval = partition_interval(cursor)
+                created = ensure_partitions(cursor, date.today(), _ahead(date.today(), interval)) if interval else []
+                conn.commit()
+            finally:
+                conn.close()
+            if created:
+                print(f"[PARTITIONS] Created {', '.join(created)}")
+        elif self.app.config['SUBMISSION_ARCHIVE_ENABLED']:
+            self.archive_closed_years()
+
+    def status(self):
+        conn = self.connect()
+        try:
+            if self.postgres:
+                cursor = conn.cursor()
+                return {'backend': 'postgresql', 'interval': partition_interval(cursor),
+                        'partitions': list_partitions(cursor)}
+            live = conn.execute(f'''
+                SELECT CAST(strftime('%Y', submission_date) AS INTEGER) AS year, COUNT(*) AS submissions
+                FROM {TABLE} GROUP BY 1 ORDER BY 1
+            ''').fetchall()
+            archives = conn.execute('SELECT * FROM submission_archives ORDER BY year').fetchall()
+        finally:
+            conn.close()
+        return {'backend': 'sqlite', 'live': [dict(row) for row in live],
+                'archives': [dict(row) for row in archives]}
+
+    def _register_routes(self, app):
+        def require_admin():
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            return None
+
+        @app.route('/api/admin/partitions')
+        def partition_status():
+            """Partitions with estimated rows (PostgreSQL), or live years and archives (SQLite)"""
+            denied = require_admin()
+            if denied:
+                return denied
+            return jsonify(self.status())
+
+        @app.route('/api/admin/archive/<int:year>', methods=['POST'])
+        def archive_year(year):
+            """Archive a closed year now instead of waiting for the monthly task (SQLite)"""
+            denied = require_admin()
+            if denied:
+                return denied
+            try:
+                count = self.archive_year(year)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 409
+            return jsonify({'year': year, 'submissions': count})
+
+        @app.route('/api/admin/archive/<int:year>/restore', methods=['POST'])
+        def restore_year(year):
+            """Move an archived year back into the main tables (SQLite)"""
+            denied = require_admin()
+            if denied:
+                return denied
+            try:
+                count = self.restore_year(year)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 409
+            return jsonify({'year': year, 'submissions': count})
+
+
+partitions = SubmissionPartitions()
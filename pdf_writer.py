@@ -0,0 +1,175 @@
+"""
+Minimal PDF writer
+
+Writes PDF 1.4 documents with text in the standard Helvetica and
+Helvetica-Bold fonts (every PDF viewer has them, so nothing is embedded),
+filled and stroked rectangles and lines. That is all the printed reports
+need, without a PDF library or an external rendering service. Coordinates
+are in points from the top-left corner of the page; page content streams
+are Flate-compressed.
+
+    doc = PDFDocument(width=842, height=595, title='Report')
+    page = doc.add_page()
+    page.text(36, 50, 'Hello', size=12, bold=True)
+    data = doc.output()
+"""
+import zlib
+from datetime import datetime
+
+A4_PORTRAIT = (595, 842)
+A4_LANDSCAPE = (842, 595)
+
+# Advance widths (1/1000 em) of ASCII 32-126 from the Adobe AFM files
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+# Used for characters outside ASCII
+_DEFAULT_WIDTH = 556
+
+FONTS = {False: ('F1', 'Helvetica', _HELVETICA_WIDTHS), True: ('F2', 'Helvetica-Bold', _HELVETICA_BOLD_WIDTHS)}
+
+
+def text_width(text, size, bold=False):
+    widths = FONTS[bold][2]
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code <= 126 else _DEFAULT_WIDTH
+    return total * size / 1000.0
+
+
+def fit_text(text, width, size, bold=False):
+    """``text`` shortened with "..." so it fits in ``width`` points"""
+    if text_width(text, size, bold) <= width:
+        return text
+    ellipsis = '...'
+    while text and text_width(text + ellipsis, size, bold) > width:
+        text = text[:-1]
+    return text.rstrip() + ellipsis if text else ''
+
+
+def hex_color(value):
+    """'#d4edda' -> (r, g, b) in 0..1"""
+    value = value.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+
+
+def _escape(text):
+    # WinAnsiEncoding covers Latin-1 plus typographic quotes and dashes
+    data = text.encode('cp1252', 'replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.') or '0'
+
+
+def _color(rgb):
+    return ' '.join(_number(component) for component in rgb)
+
+
+class Page:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._ops = []
+
+    def text(self, x, y, text, size=10, bold=False, color=(0, 0, 0)):
+        """Text with its baseline ``y`` points from the top"""
+        font = FONTS[bold][0]
+        self._ops.append(b'BT /%s %s Tf %s rg %s %s Td (%s) Tj ET' % (
+            font.encode(), _number(size).encode(), _color(color).encode(),
+            _number(x).encode(), _number(self.height - y).encode(), _escape(text)))
+
+    def text_right(self, x, y, text, size=10, bold=False, color=(0, 0, 0)):
+        self.text(x - text_width(text, size, bold), y, text, size, bold, color)
+
+    def text_center(self, x, y, text, size=10, bold=False, color=(0, 0, 0)):
+        self.text(x - text_width(text, size, bold) / 2, y, text, size, bold, color)
+
+    def rect(self, x, y, width, height, fill=None, stroke=None, line_width=0.5):
+        """Rectangle whose top-left corner is (x, y)"""
+        if fill is None and stroke is None:
+            return
+        parts = []
+        if fill is not None:
+            parts.append(f"{_color(fill)} rg")
+        if stroke is not None:
+            parts.append(f"{_color(stroke)} RG {_number(line_width)} w")
+        parts.append(f"{_number(x)} {_number(self.height - y - height)} {_number(width)} {_number(height)} re")
+        parts.append('B' if fill is not None and stroke is not None else ('f' if fill is not None else 'S'))
+        self._ops.append(' '.join(parts).encode())
+
+    def line(self, x1, y1, x2, y2, color=(0, 0, 0), line_width=0.5):
+        self._ops.append((f"{_color(color)} RG {_number(line_width)} w "
+                          f"{_number(x1)} {_number(self.height - y1)} m "
+                          f"{_number(x2)} {_number(self.height - y2)} l S").encode())
+
+    def content(self):
+        return b'\n'.join(self._ops)
+
+
+class PDFDocument:
+    def __init__(self, width=A4_PORTRAIT[0], height=A4_PORTRAIT[1], title='', author=''):
+        self.width = width
+        self.height = height
+        self.title = title
+        self.author = author
+        self.pages = []
+
+    def add_page(self):
+        page = Page(self.width, self.height)
+        self.pages.append(page)
+        return page
+
+    def output(self):
+        """The document as bytes"""
+        if not self.pages:
+            self.add_page()
+        # Objects: 1 catalog, 2 page tree, 3-4 fonts, 5 info, then a page and its content per page
+        objects = {}
+        page_ids = []
+        for index, page in enumerate(self.pages):
+            page_id, content_id = 6 + index * 2, 7 + index * 2
+            page_ids.append(page_id)
+            stream = zlib.compress(page.content(), 6)
+            objects[content_id] = (b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream)
+                                   + stream + b'\nendstream')
+            objects[page_id] = (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                                b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                                % (self.width, self.height, content_id))
+        objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objects[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids))
+        for object_id, bold in ((3, False), (4, True)):
+            objects[object_id] = (b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                                  % FONTS[bold][1].encode())
+        created = datetime.now().strftime('%Y%m%d%H%M%S')
+        objects[5] = b'<< /Title (%s) /Author (%s) /Producer (pdf_writer.py) /CreationDate (D:%s) >>' % (
+            _escape(self.title), _escape(self.author), created.encode())
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = {}
+        for object_id in sorted(objects):
+            offsets[object_id] = len(out)
+            out += b'%d 0 obj\n' % object_id + objects[object_id] + b'\nendobj\n'
+        xref = len(out)
+        count = max(objects) + 1
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % count
+        for object_id in range(1, count):
+            out += b'%010d 00000 n \n' % offsets[object_id]
+        out += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (count, xref)
+        return bytes(out)
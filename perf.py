@@ -0,0 +1,281 @@
+"""
+Request and SQL instrumentation
+
+Records wall time per route, the number of SQL statements each request ran
+and their cumulative time, and keeps a log of slow statements with their SQL
+normalized (literals replaced by ?) and the shape of their parameters. SQL is
+timed by the cursor classes that get_db_connection() hands out, on both
+SQLite and PostgreSQL. Everything is exposed to admins on /api/debug/perf.
+
+Configuration (app.config, defaults in DEFAULT_CONFIG):
+    PERF_ENABLED            route timing and per-request SQL counts
+    PERF_SQL_ENABLED        time SQL statements (needs a new connection)
+    PERF_SLOW_QUERY_MS      statements at least this slow are logged
+    PERF_SLOW_QUERY_LOG     number of slow statements kept
+    PERF_ROUTE_SAMPLES      latencies kept per route for percentiles
+"""
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import g, has_request_context, request, session
+
+DEFAULT_CONFIG = {
+    'PERF_ENABLED': True,
+    'PERF_SQL_ENABLED': True,
+    'PERF_SLOW_QUERY_MS': 100.0,
+    'PERF_SLOW_QUERY_LOG': 200,
+    'PERF_ROUTE_SAMPLES': 500,
+}
+
+# Distinct normalized statements tracked; later ones are counted as "other"
+MAX_TRACKED_STATEMENTS = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|(?<!:):\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals and placeholders with ?"""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _PLACEHOLDER_LIST.sub('(?, ...)', sql)
+
+
+def params_shape(params, many=False):
+    """Describe parameters by type only, e.g. '(int, str, NoneType)'"""
+    if many:
+        # Generators are already consumed by the time the statement is recorded
+        if not isinstance(params, (list, tuple)):
+            return 'many'
+        return f"{len(params)} x {params_shape(params[0]) if params else '()'}"
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {type(value).__name__}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class PerfStats:
+    """Process-wide counters, updated under one short lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.config = dict(DEFAULT_CONFIG)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.routes = {}
+            self.parishes = {}
+            self.statements = {}
+            self.slow_queries = deque(maxlen=self.config['PERF_SLOW_QUERY_LOG'])
+
+    def record_sql(self, sql, params, many, elapsed):
+        """Account one executed statement to the statement table and the current request"""
+        normalized = normalize_sql(sql)
+        elapsed_ms = elapsed * 1000
+        request_perf = g.get('perf') if has_request_context() else None
+        route = request_perf['route'] if request_perf else None
+        slow = elapsed_ms >= self.config['PERF_SLOW_QUERY_MS']
+        if slow:
+            entry = {
+                'sql': normalized,
+                'params_shape': params_shape(params, many),
+                'ms': round(elapsed_ms, 2),
+                'route': route,
+                'parish': request_perf['parish'] if request_perf else None,
+                'at': time.time(),
+            }
+
+        with self.lock:
+            if request_perf is not None:
+                request_perf['sql_count'] += 1
+                request_perf['sql_ms'] += elapsed_ms
+            key = normalized if (normalized in self.statements
+                                 or len(self.statements) < MAX_TRACKED_STATEMENTS) else 'other'
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            if elapsed_ms > stats['max_ms']:
+                stats['max_ms'] = elapsed_ms
+            if slow:
+                self.slow_queries.append(entry)
+
+        # Only statements of requests are printed; bulk loads and scripts would flood the output
+        if slow and request_perf is not None:
+            print(f"[SLOW-SQL] {elapsed_ms:.1f}ms {route} {normalized[:200]}")
+
+    def record_request(self, route, parish, status, elapsed_ms, sql_count, sql_ms):
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'sql_count': 0, 'sql_ms': 0.0,
+                    'samples': deque(maxlen=self.config['PERF_ROUTE_SAMPLES']),
+                }
+            stats['count'] += 1
+            stats['errors'] += status >= 500
+            stats['total_ms'] += elapsed_ms
+            if elapsed_ms > stats['max_ms']:
+                stats['max_ms'] = elapsed_ms
+            stats['sql_count'] += sql_count
+            stats['sql_ms'] += sql_ms
+            stats['samples'].append(elapsed_ms)
+
+            if parish:
+                by_parish = self.parishes.setdefault(parish, {'count': 0, 'total_ms': 0.0, 'sql_count': 0})
+                by_parish['count'] += 1
+                by_parish['total_ms'] += elapsed_ms
+                by_parish['sql_count'] += sql_count
+
+    def snapshot(self, limit=50):
+        """Summary for /api/debug/perf, slowest routes and statements first"""
+        with self.lock:
+            routes = [(route, dict(stats, samples=sorted(stats['samples'])))
+                      for route, stats in self.routes.items()]
+            parishes = {parish: dict(stats) for parish, stats in self.parishes.items()}
+            statements = [(sql, dict(stats)) for sql, stats in self.statements.items()]
+            slow_queries = list(self.slow_queries)
+
+        route_rows = []
+        for route, stats in routes:
+            count = stats['count']
+            samples = stats['samples']
+            route_rows.append({
+                'route': route,
+                'count': count,
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total_ms'] / count, 2),
+                'p50_ms': round(percentile(samples, 0.50), 2),
+                'p95_ms': round(percentile(samples, 0.95), 2),
+                'p99_ms': round(percentile(samples, 0.99), 2),
+                'max_ms': round(stats['max_ms'], 2),
+                'total_ms': round(stats['total_ms'], 2),
+                'sql_per_request': round(stats['sql_count'] / count, 2),
+                'sql_ms_per_request': round(stats['sql_ms'] / count, 2),
+            })
+        route_rows.sort(key=lambda row: row['total_ms'], reverse=True)
+
+        statement_rows = [{
+            'sql': sql,
+            'count': stats['count'],
+            'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+            'max_ms': round(stats['max_ms'], 2),
+            'total_ms': round(stats['total_ms'], 2),
+        } for sql, stats in statements]
+        statement_rows.sort(key=lambda row: row['total_ms'], reverse=True)
+
+        parish_rows = {parish: {
+            'count': stats['count'],
+            'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+            'sql_per_request': round(stats['sql_count'] / stats['count'], 2),
+        } for parish, stats in parishes.items()}
+
+        return {
+            'since': self.since,
+            'config': self.config,
+            'routes': route_rows[:limit],
+            'parishes': parish_rows,
+            'statements': statement_rows[:limit],
+            'slow_queries': slow_queries[::-1][:limit],
+        }
+
+
+stats = PerfStats()
+
+
+# Keyword names of the statement parameters: psycopg2 (vars, vars_list), DB-API (parameters, seq_of_parameters)
+PARAMETER_KEYWORDS = ('vars', 'vars_list', 'parameters', 'seq_of_parameters')
+
+
+def _timed(method):
+    def wrapper(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, sql, *args, **kwargs)
+        finally:
+            params = args[0] if args else next((kwargs[key] for key in PARAMETER_KEYWORDS if key in kwargs), None)
+            stats.record_sql(sql, params, method.__name__ == 'executemany', time.perf_counter() - start)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+def timed_cursor_class(base):
+    """Subclass of a DB-API cursor class whose execute/executemany are timed"""
+    return type(f"Timed{base.__name__}", (base,), {
+        'execute': _timed(base.execute),
+        'executemany': _timed(base.executemany),
+    })
+
+
+TimedSQLiteCursor = timed_cursor_class(sqlite3.Cursor)
+
+
+class TimedSQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection whose shortcut execute methods go through a timed cursor"""
+
+    def cursor(self, factory=TimedSQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args, **kwargs):
+        return self.cursor().execute(sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self.cursor().executemany(sql, *args, **kwargs)
+
+
+def init_perf(app):
+    """Register the request timing hooks"""
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    stats.config = {key: app.config[key] for key in DEFAULT_CONFIG}
+    stats.reset()
+
+    @app.before_request
+    def start_request_timer():
+        if not app.config['PERF_ENABLED']:
+            return
+        g.perf = {
+            'start': time.perf_counter(),
+            'route': f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}",
+            'parish': session.get('parish'),
+            'admin': session.get('role') == 'admin',
+            'sql_count': 0,
+            'sql_ms': 0.0,
+        }
+
+    @app.after_request
+    def record_request_time(response):
+        request_perf = g.pop('perf', None)
+        if request_perf is None:
+            return response
+        elapsed_ms = (time.perf_counter() - request_perf['start']) * 1000
+        stats.record_request(request_perf['route'], request_perf['parish'], response.status_code,
+                             elapsed_ms, request_perf['sql_count'], request_perf['sql_ms'])
+        # Timings describe the backend, so only admins get them
+        if request_perf['admin']:
+            response.headers.add('Server-Timing', f"app;dur={elapsed_ms:.1f}")
+            response.headers.add('Server-Timing',
+                                 f'sql;dur={request_perf["sql_ms"]:.1f};desc="{request_perf["sql_count"]} queries"')
+        return response
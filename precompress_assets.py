@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Build-time precompression of static files
+
+Writes .gz (and .br when the brotli package is installed) next to every
+compressible file so compression.py can serve them without compressing per
+request. Page templates are compressed in memory when the app prerenders
+them (see page_shells.py).
+
+Usage: python precompress_assets.py [--clean]
+"""
+import argparse
+import gzip
+import os
+
+from compression import PRECOMPRESSIBLE_EXTENSIONS, PRECOMPRESSED_VARIANTS, brotli
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_DIRS = ('static',)
+
+def iter_assets():
+    for asset_dir in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(BASE_DIR, asset_dir)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if name.endswith(PRECOMPRESSIBLE_EXTENSIONS):
+                    yield path
+
+def clean():
+    removed = 0
+    for asset_dir in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(BASE_DIR, asset_dir)):
+            for name in files:
+                if name.endswith(tuple(suffix for _, suffix in PRECOMPRESSED_VARIANTS)):
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+    print(f"Removed {removed} precompressed files")
+
+def precompress():
+    if brotli is None:
+        print("brotli not installed - only writing .gz variants (pip install brotli)")
+
+    total_raw = total_gz = total_br = 0
+    print(f"{'file':<45} {'raw':>10} {'gzip':>10} {'brotli':>10}")
+    for path in iter_assets():
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(path + '.gz', 'wb') as f:
+            f.write(gz_data)
+
+        br_size = None
+        if brotli is not None:
+            br_data = brotli.compress(data, quality=11)
+            with open(path + '.br', 'wb') as f:
+                f.write(br_data)
+            br_size = len(br_data)
+
+        total_raw += len(data)
+        total_gz += len(gz_data)
+        total_br += br_size or len(gz_data)
+        br_column = f"{br_size:>10,}" if br_size is not None else f"{'-':>10}"
+        print(f"{os.path.relpath(path, BASE_DIR):<45} {len(data):>10,} {len(gz_data):>10,} {br_column}")
+
+    if total_raw:
+        print(f"\nTotal: {total_raw:,} bytes -> gzip {total_gz:,} ({total_gz / total_raw:.0%}), "
+              f"best {total_br:,} ({total_br / total_raw:.0%})")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompress static files')
+    parser.add_argument('--clean', action='store_true', help='remove generated .gz/.br files')
+    args = parser.parse_args()
+    clean() if args.clean else precompress()
@@ -0,0 +1,301 @@
+"""
+Priority alerts for positive bacteriological results
+
+A positive bacteriological result is a public-health event, so it does not
+wait for the dashboard to pick it up from new_submission. The write that
+records positives (a submission, or results entered for pending samples)
+inserts a priority_alerts row in its own transaction and, as soon as it
+commits, emits "priority_alert" directly to the admins of the supply's
+parish (admin_<parish>) and to the national admin room ("admin").
+
+Alerts stay open until an admin acknowledges them, over the socket
+("priority_alert_ack") or POST /api/admin/priority-alerts/<id>/ack. Until
+then they are re-sent with exponential backoff, from
+PRIORITY_ALERT_RETRY_INTERVAL up to PRIORITY_ALERT_MAX_BACKOFF seconds, by
+a thread in every serving process; each retry is claimed with a
+conditional UPDATE so it goes out once however many processes run.
+Admins who connect while alerts are open get them straight away.
+
+Latency is measured end to end on the server's clock: a dashboard that has
+painted an alert answers "priority_alert_seen", and the time from the
+write to the first such answer is stored with the alert and observed in
+the priority_alert_latency_seconds histogram. It includes the answer's trip
+back, so it is an upper bound of write-to-screen time that needs no clock
+agreement with the browser.
+"""
+import threading
+import time
+
+from flask import jsonify, request, session
+
+from metrics import registry
+
+DEFAULT_CONFIG = {
+    'PRIORITY_ALERT_RETRY_INTERVAL': 5,
+    'PRIORITY_ALERT_MAX_BACKOFF': 300,
+}
+
+NATIONAL_ROOM = 'admin'
+
+# Write-to-screen times are expected in the tens of milliseconds; retries push them to seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+alert_latency = registry.histogram(
+    'priority_alert_latency_seconds', 'Time from writing a positive result to an admin screen showing its alert',
+    ('parish',), buckets=LATENCY_BUCKETS)
+alert_ack_duration = registry.histogram(
+    'priority_alert_ack_seconds', 'Time from writing a positive result to an admin acknowledging its alert',
+    ('parish',), buckets=LATENCY_BUCKETS + (900.0, 3600.0))
+alerts_sent = registry.counter(
+    'priority_alerts_sent_total', 'Priority alert deliveries by attempt (first, retry, or connect for open alerts)',
+    ('attempt',))
+
+
+class PriorityAlerts:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.socketio = None
+        self.postgres = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app, connect, socketio, postgres=False):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self.socketio = socketio
+        self.postgres = postgres
+        self._register_routes(app)
+        self._register_events(socketio)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def rooms(self, parish):
+        return [f"admin_{parish}", NATIONAL_ROOM]
+
+    def backoff(self, attempts):
+        config = self.app.config
+        return min(config['PRIORITY_ALERT_RETRY_INTERVAL'] * 2 ** (attempts - 1), config['PRIORITY_ALERT_MAX_BACKOFF'])
+
+    def raise_alert(self, conn, submission_id, positives, organism=None):
+        """
+        Record an alert for ``positives`` new positive samples of a
+        submission. Call with the write's connection before its commit, then
+        send() the returned alert once it has committed.
+        """
+        if not positives or positives <= 0:
+            return None
+        row = self._execute(conn, '''
+            SELECT s.supply_id, s.sampling_point_id, s.isolated_organism, ws.name AS supply_name, ws.parish,
+                   sp.name AS sampling_point_name, u.full_name AS inspector_name
+            FROM inspection_submissions s
+            JOIN water_supplies ws ON ws.id = s.supply_id
+            LEFT JOIN sampling_points sp ON sp.id = s.sampling_point_id
+            JOIN users u ON u.id = s.inspector_id
+            WHERE s.id = ?
+        ''', (submission_id,)).fetchone()
+        alert = dict(row)
+        alert['isolated_organism'] = organism or alert['isolated_organism'] or None
+        location = alert['supply_name']
+        if alert['sampling_point_name']:
+            location = f"{alert['sampling_point_name']} ({location})"
+        found = f" - {alert['isolated_organism']}" if alert['isolated_organism'] else ''
+        samples = 'sample' if positives == 1 else 'samples'
+        now = time.time()
+        alert.update(submission_id=submission_id, positives=positives, written_at=now, attempts=1,
+                     message=f"{positives} positive bacteriological {samples} at {location}{found}")
+        cursor = self._execute(conn, f'''
+            INSERT INTO priority_alerts
+            (submission_id, supply_id, sampling_point_id, parish, positives, isolated_organism, message, written_at,
+             attempts, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?){' RETURNING id' if self.postgres else ''}
+        ''', (submission_id, alert['supply_id'], alert['sampling_point_id'], alert['parish'], positives,
+              alert['isolated_organism'], alert['message'], now, 1, now + self.backoff(1)))
+        alert['id'] = cursor.fetchone()['id'] if self.postgres else cursor.lastrowid
+        return alert
+
+    def _payload(self, alert):
+        return {key: alert.get(key) for key in (
+            'id', 'submission_id', 'supply_id', 'supply_name', 'sampling_point_id', 'sampling_point_name', 'parish',
+            'positives', 'isolated_organism', 'inspector_name', 'message', 'written_at', 'attempts')}
+
+    def send(self, alert, to=None):
+        """Push an alert to its parish and national admin rooms (or to one client, ``to``)"""
+        if alert is None:
+            return
+        alerts_sent.inc('connect' if to else 'first' if alert['attempts'] == 1 else 'retry')
+        print(f"[PRIORITY] {alert['parish']}: {alert['message']} (attempt {alert['attempts']})")
+        self.socketio.emit('priority_alert', self._payload(alert), to=to or self.rooms(alert['parish']))
+
+    def _open_alerts(self, conn, where='', params=()):
+        return [dict(row) for row in self._execute(conn, f'''
+            SELECT pa.*, ws.name AS supply_name, sp.name AS sampling_point_name, u.full_name AS inspector_name
+            FROM priority_alerts pa
+            JOIN water_supplies ws ON ws.id = pa.supply_id
+            LEFT JOIN sampling_points sp ON sp.id = pa.sampling_point_id
+            LEFT JOIN inspection_submissions s ON s.id = pa.submission_id
+            LEFT JOIN users u ON u.id = s.inspector_id
+            WHERE pa.acknowledged_at IS NULL {where}
+            ORDER BY pa.written_at
+        ''', params).fetchall()]
+
+    def retry_due(self, now=None):
+        """Re-send open alerts whose next attempt is due; returns how many were sent"""
+        now = time.time() if now is None else now
+        sent = 0
+        conn = self.connect()
+        try:
+            for alert in self._open_alerts(conn, 'AND pa.next_attempt_at <= ?', (now,)):
+                attempts = alert['attempts'] + 1
+                # Claim the retry; another process that saw the same next_attempt_at loses
+                claimed = self._execute(conn, '''
+                    UPDATE priority_alerts SET attempts = ?, next_attempt_at = ?
+                    WHERE id = ? AND acknowledged_at IS NULL AND next_attempt_at = ?
+                ''', (attempts, now + self.backoff(attempts), alert['id'], alert['next_attempt_at'])).rowcount
+                conn.commit()
+                if claimed:
+                    alert['attempts'] = attempts
+                    self.send(alert)
+                    sent += 1
+        finally:
+            conn.close()
+        return sent
+
+    def send_open(self, parish, to):
+        """Send the open alerts an admin should see (their parish's) to one client, e.g. on connect"""
+        conn = self.connect()
+        try:
+            alerts = self._open_alerts(conn, 'AND pa.parish = ?', (parish,))
+        finally:
+            conn.close()
+        for alert in alerts:
+            self.send(alert, to=to)
+
+    def mark_seen(self, alert_id):
+        """Record the first time a screen showed an alert; returns the write-to-screen latency"""
+        now = time.time()
+        conn = self.connect()
+        try:
+            updated = self._execute(conn, '''
+                UPDATE priority_alerts SET displayed_at = ?, latency = ? - written_at
+                WHERE id = ? AND displayed_at IS NULL
+            ''', (now, now, alert_id)).rowcount
+            row = self._execute(conn, 'SELECT parish, latency FROM priority_alerts WHERE id = ?',
+                                (alert_id,)).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        if updated:
+            alert_latency.observe(row['latency'], row['parish'])
+        return row['latency']
+
+    def acknowledge(self, alert_id, user_id, name):
+        """Close an alert and tell every admin screen; False when it does not exist or was already closed"""
+        now = time.time()
+        conn = self.connect()
+        try:
+            updated = self._execute(conn, '''
+                UPDATE priority_alerts SET acknowledged_at = ?, acknowledged_by = ?
+                WHERE id = ? AND acknowledged_at IS NULL
+            ''', (now, user_id, alert_id)).rowcount
+            row = self._execute(conn, 'SELECT parish, written_at FROM priority_alerts WHERE id = ?',
+                                (alert_id,)).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if not updated:
+            return False
+        alert_ack_duration.observe(now - row['written_at'], row['parish'])
+        self.socketio.emit('priority_alert_acknowledged', {'id': alert_id, 'acknowledged_by': name,
+                                                           'acknowledged_at': now}, to=self.rooms(row['parish']))
+        return True
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start the retry thread (processes that serve Socket.IO clients)"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='priority-alerts', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.retry_due()
+            except Exception as e:
+                print(f"[PRIORITY] Retry failed: {e}")
+            self._stop_event.wait(self.app.config['PRIORITY_ALERT_RETRY_INTERVAL'])
+
+    def _register_events(self, socketio):
+        @socketio.on('priority_alert_seen')
+        def on_priority_alert_seen(data):
+            if session.get('role') == 'admin' and isinstance(data, dict) and data.get('id'):
+                self.mark_seen(int(data['id']))
+
+        @socketio.on('priority_alert_ack')
+        def on_priority_alert_ack(data):
+            if session.get('role') == 'admin' and isinstance(data, dict) and data.get('id'):
+                self.acknowledge(int(data['id']), session['user_id'], session.get('full_name'))
+
+    def _register_routes(self, app):
+        def require_admin():
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            return None
+
+        @app.route('/api/admin/priority-alerts')
+        def list_priority_alerts():
+            """?status=open (default) or all; ?parish=; ?limit= (default 50, at most 500)"""
+            denied = require_admin()
+            if denied:
+                return denied
+            conditions, values = [], []
+            if request.args.get('status', 'open') == 'open':
+                conditions.append('pa.acknowledged_at IS NULL')
+            if request.args.get('parish'):
+                conditions.append('pa.parish = ?')
+                values.append(request.args['parish'])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+            conn = self.connect()
+            try:
+                rows = self._execute(conn, f'''
+                    SELECT pa.*, ws.name AS supply_name, u.full_name AS acknowledged_by_name
+                    FROM priority_alerts pa
+                    JOIN water_supplies ws ON ws.id = pa.supply_id
+                    LEFT JOIN users u ON u.id = pa.acknowledged_by
+                    {where}
+                    ORDER BY pa.written_at DESC, pa.id DESC
+                    LIMIT ?
+                ''', values + [limit]).fetchall()
+            finally:
+                conn.close()
+            return jsonify([dict(row) for row in rows])
+
+        @app.route('/api/admin/priority-alerts/<int:alert_id>/ack', methods=['POST'])
+        def acknowledge_priority_alert(alert_id):
+            denied = require_admin()
+            if denied:
+                return denied
+            if not self.acknowledge(alert_id, session['user_id'], session.get('full_name')):
+                return jsonify({'error': 'Alert not found or already acknowledged'}), 409
+            return jsonify({'success': True})
+
+
+priority_alerts = PriorityAlerts()
@@ -0,0 +1,271 @@
+"""
+On-demand request profiling
+
+A request is profiled when an admin sends the X-Profile header ("cprofile"
+or "sample"), or when it is picked by the sampling rate (PROFILE_SAMPLE_RATE,
+0 disables). The profile is written to PROFILE_DIR in collapsed-stack format
+("outer;inner;leaf count", one stack per line), which flamegraph.pl,
+speedscope and inferno read directly. Admins list and download profiles on
+/api/debug/profiles.
+
+Modes:
+    cprofile  deterministic; cProfile's caller graph is unfolded into stacks
+              weighted by microseconds of inclusive time
+    sample    a helper thread records the request thread's stack every
+              PROFILE_SAMPLE_INTERVAL seconds; weights are sample counts
+
+When no header is sent and the rate is 0 the only cost per request is one
+header lookup.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import abort, g, jsonify, request, send_from_directory, session
+
+DEFAULT_CONFIG = {
+    'PROFILE_DIR': 'profiles',
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DEFAULT_MODE': 'cprofile',
+    'PROFILE_SAMPLE_INTERVAL': 0.001,
+    'PROFILE_KEEP': 100,
+}
+
+PROFILE_HEADER = 'X-Profile'
+MODES = ('cprofile', 'sample')
+PROFILE_SUFFIX = '.folded'
+
+# Deepest stack written; deeper frames are cut off at the root end
+MAX_STACK_DEPTH = 200
+
+_ADDRESS = re.compile(r' at 0x[0-9a-f]+')
+
+
+def frame_label(filename, lineno, name):
+    """Short frame name: module file, line and function"""
+    if filename == '~':
+        # Builtins, e.g. <method 'fetchall' of 'sqlite3.Cursor' objects>; drop
+        # object addresses so stacks from different runs line up
+        return _ADDRESS.sub('', name)
+    return f"{os.path.basename(filename)}:{lineno}:{name}"
+
+
+def collapse_pstats(stats):
+    """
+    Unfold cProfile's caller graph into collapsed stacks. Each function's
+    inclusive time is split between its callees in proportion to the time
+    recorded on each call edge; recursion is cut where a function reappears.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    folded = Counter()
+
+    def walk(func, path, inclusive):
+        label = frame_label(*func)
+        path = path + (label,)
+        total = stats[func][3] or 1e-12
+        child_time = 0.0
+        if len(path) < MAX_STACK_DEPTH:
+            for callee, edge_time in callees.get(func, ()):
+                if frame_label(*callee) in path:
+                    continue
+                share = inclusive * min(edge_time / total, 1.0)
+                if share <= 0:
+                    continue
+                child_time += share
+                walk(callee, path, share)
+        self_time = max(inclusive - child_time, 0.0)
+        weight = int(round(self_time * 1e6))
+        if weight:
+            folded[';'.join(path)] += weight
+
+    for root in roots:
+        walk(root, (), stats[root][3])
+    return folded
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='profile-sampler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                # First line, like cProfile, so one function is one frame
+                stack.append(frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+class Profiler:
+    def __init__(self):
+        self.app = None
+        self.lock = threading.Lock()
+
+    @property
+    def directory(self):
+        path = self.app.config['PROFILE_DIR']
+        if not os.path.isabs(path):
+            path = os.path.join(self.app.root_path, path)
+        return path
+
+    def requested_mode(self):
+        """Profiling mode for the current request, or None"""
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            if session.get('role') != 'admin':
+                return None
+            return header.lower() if header.lower() in MODES else self.app.config['PROFILE_DEFAULT_MODE']
+        rate = self.app.config['PROFILE_SAMPLE_RATE']
+        if rate and random.random() < rate:
+            return self.app.config['PROFILE_DEFAULT_MODE']
+        return None
+
+    def start(self, mode):
+        if mode == 'sample':
+            sampler = StackSampler(threading.get_ident(), self.app.config['PROFILE_SAMPLE_INTERVAL'])
+            sampler.start()
+            return mode, sampler
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, or a concurrent cProfile on 3.12+) is active
+            return None
+        return mode, profile
+
+    def finish(self, active, status):
+        mode, profiler = active
+        if mode == 'sample':
+            folded = profiler.stop()
+        else:
+            profiler.disable()
+            folded = collapse_pstats(pstats.Stats(profiler).stats)
+
+        route = request.url_rule.rule if request.url_rule else request.path
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        name = f"{stamp}-{request.method}-{slug}-{mode}{PROFILE_SUFFIX}"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(f"# {request.method} {request.full_path} status={status} mode={mode}\n")
+            for stack, weight in folded.most_common():
+                f.write(f"{stack} {weight}\n")
+        self.prune()
+        return name
+
+    def prune(self):
+        with self.lock:
+            files = sorted(name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX))
+            for name in files[:-self.app.config['PROFILE_KEEP']]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def list_profiles(self):
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(PROFILE_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                profiles.append({'name': name, 'size': stat.st_size, 'created': stat.st_mtime})
+        return profiles
+
+
+profiler = Profiler()
+
+
+def _require_admin():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    return None
+
+
+def init_profiling(app):
+    """Register the profiling hooks and the /api/debug/profiles endpoints"""
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    profiler.app = app
+
+    @app.before_request
+    def start_profile():
+        if PROFILE_HEADER not in request.headers and not app.config['PROFILE_SAMPLE_RATE']:
+            return
+        mode = profiler.requested_mode()
+        if mode is not None:
+            g.profile = profiler.start(mode)
+
+    @app.after_request
+    def finish_profile(response):
+        active = g.pop('profile', None)
+        if active is not None:
+            try:
+                response.headers['X-Profile-Id'] = profiler.finish(active, response.status_code)
+            except Exception as e:
+                print(f"[PROFILE] Could not write profile: {e}")
+        return response
+
+    @app.route('/api/debug/profiles', methods=['GET', 'POST'])
+    def list_profiles():
+        """List stored profiles; POST {"sample_rate": 0.01, "mode": "sample"} changes sampling"""
+        denied = _require_admin()
+        if denied:
+            return denied
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            if 'sample_rate' in data:
+                try:
+                    rate = float(data['sample_rate'])
+                except (TypeError, ValueError):
+                    return jsonify({'error': 'sample_rate must be a number'}), 400
+                if not 0 <= rate <= 1:
+                    return jsonify({'error': 'sample_rate must be between 0 and 1'}), 400
+                app.config['PROFILE_SAMPLE_RATE'] = rate
+            if 'mode' in data:
+                if data['mode'] not in MODES:
+                    return jsonify({'error': f"mode must be one of {', '.join(MODES)}"}), 400
+                app.config['PROFILE_DEFAULT_MODE'] = data['mode']
+        return jsonify({
+            'sample_rate': app.config['PROFILE_SAMPLE_RATE'],
+            'mode': app.config['PROFILE_DEFAULT_MODE'],
+            'profiles': profiler.list_profiles(),
+        })
+
+    @app.route('/api/debug/profiles/<name>')
+    def download_profile(name):
+        denied = _require_admin()
+        if denied:
+            return denied
+        if not name.endswith(PROFILE_SUFFIX):
+            abort(404)
+        return send_from_directory(profiler.directory, name, as_attachment=True, mimetype='text/plain')
@@ -0,0 +1,238 @@
+"""
+Server-side rendering of the printable monthly report
+
+Turns the data behind /api/report/<year>/<month> into the same treated /
+untreated tables and monthly summary that report.html builds in the
+browser, as a standalone HTML document (templates/report_print.html) and as
+a PDF drawn with pdf_writer.py. Both can be limited to one parish.
+"""
+from datetime import datetime
+
+from flask import render_template
+
+from pdf_writer import A4_LANDSCAPE, PDFDocument, fit_text, hex_color
+
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+               'October', 'November', 'December')
+
+# Bump when the layout changes so cached renders are rebuilt
+RENDER_VERSION = 1
+
+# Cell classes of report.html and their colours (background, text)
+CELL_STYLES = {
+    'positive-result': ('#d4edda', '#155724'),
+    'negative-result': ('#f8d7da', '#721c24'),
+    'pending-result': ('#fff3cd', '#856404'),
+    'no-data': ('#f8f9fa', '#6c757d'),
+}
+AGENCY_COLORS = {'nwc': '#e3f2fd', 'pc': '#f3e5f5', 'private': '#e8f5e8'}
+
+TREATED_COLUMNS = (
+    ('Water Supply', 'name', 150), ('Agency', 'agency', 55), ('Visits', 'visits', 38),
+    ('Chlorine Total', 'chlorine_total', 58), ('Chlorine +', 'chlorine_positive', 48),
+    ('Chlorine -', 'chlorine_negative', 48), ('Bacterio +', 'bacteriological_positive', 48),
+    ('Bacterio -', 'bacteriological_negative', 48), ('Pending', 'bacteriological_pending', 44),
+    ('Remarks', 'remarks', None),
+)
+UNTREATED_COLUMNS = (
+    ('Water Supply', 'name', 150), ('Agency', 'agency', 55), ('Visits', 'visits', 38),
+    ('Bacterio +', 'bacteriological_positive', 48), ('Bacterio -', 'bacteriological_negative', 48),
+    ('Pending', 'bacteriological_pending', 44), ('Remarks', 'remarks', None),
+)
+RESULT_TYPES = {
+    'chlorine_positive': 'positive', 'chlorine_negative': 'negative', 'bacteriological_positive': 'positive',
+    'bacteriological_negative': 'negative', 'bacteriological_pending': 'pending',
+}
+SUMMARY_FIELDS = (
+    ('Total Visits', 'visits', '#667eea'), ('Total Chlorine Tests', 'chlorine_total', '#667eea'),
+    ('Chlorine Positive', 'chlorine_positive', '#28a745'), ('Chlorine Negative', 'chlorine_negative', '#dc3545'),
+    ('Bacterio Positive', 'bacteriological_positive', '#28a745'),
+    ('Bacterio Negative', 'bacteriological_negative', '#dc3545'),
+    ('Bacterio Pending', 'bacteriological_pending', '#ffc107'),
+)
+
+
+def _rows(table):
+    return [dict(zip(table['columns'], values)) for values in table['rows']]
+
+
+def _result_class(value, kind='default'):
+    # Same rules as getResultClass() in report.html
+    if not value:
+        return 'no-data'
+    return {'positive': 'positive-result', 'negative': 'negative-result',
+            'pending': 'pending-result'}.get(kind, 'positive-result')
+
+
+def _cell(supply, data, key):
+    """(text, css class) of one table cell"""
+    if key == 'name':
+        return supply['name'], 'supply-name'
+    if key == 'agency':
+        return supply['agency'], ''
+    if key == 'remarks':
+        remarks = (data or {}).get('remarks') or ''
+        return (remarks.strip() or '-'), 'remarks-cell'
+    value = (data or {}).get(key) or 0
+    if key == 'visits':
+        return str(value), 'positive-result' if value else 'no-data'
+    return (str(value) if value else '-'), _result_class(value, RESULT_TYPES.get(key, 'default'))
+
+
+def build_context(report, year, month, parish=None):
+    """
+    Template context for one month; ``report`` is the columnar report
+    ({"supplies": {"columns", "rows"}, "monthly_data": {...}}).
+    """
+    supplies = _rows(report['supplies'])
+    if parish:
+        supplies = [supply for supply in supplies if supply.get('parish') == parish]
+    supply_ids = {supply['id'] for supply in supplies}
+    lookup = {data['supply_id']: data for data in _rows(report['monthly_data']) if data['supply_id'] in supply_ids}
+
+    def table(kind, columns):
+        rows = []
+        for supply in supplies:
+            if supply['type'] != kind:
+                continue
+            data = lookup.get(supply['id'])
+            agency = (supply['agency'] or '').lower().replace(' ', '-')
+            rows.append({'agency_class': f"agency-{agency}",
+                         'cells': [_cell(supply, data, key) for _, key, _ in columns]})
+        return {'headers': [label for label, _, _ in columns], 'widths': [width for _, _, width in columns],
+                'rows': rows}
+
+    totals = {key: sum((data.get(key) or 0) for data in lookup.values()) for _, key, _ in SUMMARY_FIELDS}
+    summary = [('Total Supplies', len(supplies), '#667eea'),
+               ('Supplies with Data', sum(1 for data in lookup.values() if data.get('visits')), '#667eea')]
+    summary += [(label, totals[key], color) for label, key, color in SUMMARY_FIELDS]
+
+    title = f"Water Quality Monitoring Report - {MONTH_NAMES[month - 1]} {year}"
+    return {
+        'title': title,
+        'parish': parish,
+        'year': year,
+        'month': month,
+        'generated': datetime.now().strftime('%B %d, %Y %H:%M'),
+        'treated': table('treated', TREATED_COLUMNS),
+        'untreated': table('untreated', UNTREATED_COLUMNS),
+        'summary': summary,
+        'cell_styles': CELL_STYLES,
+        'agency_colors': AGENCY_COLORS,
+    }
+
+
+def render_html(context):
+    return render_template('report_print.html', **context)
+
+
+class _PDFLayout:
+    margin = 32
+    row_height = 14
+    font_size = 7.5
+    header_size = 7.5
+
+    def __init__(self, context):
+        self.context = context
+        self.doc = PDFDocument(*A4_LANDSCAPE, title=context['title'], author='Water Quality Monitoring')
+        self.page = None
+        self.y = 0
+        self.bottom = self.doc.height - self.margin - 14
+
+    def new_page(self):
+        self.page = self.doc.add_page()
+        self.y = self.margin
+
+    def ensure(self, height):
+        if self.page is None or self.y + height > self.bottom:
+            self.new_page()
+            return True
+        return False
+
+    def header(self):
+        context = self.context
+        self.new_page()
+        self.page.text(self.margin, self.y + 16, context['title'], size=16, bold=True, color=hex_color('#333333'))
+        subtitle = f"Generated on {context['generated']}"
+        if context['parish']:
+            subtitle = f"{context['parish']} - {subtitle}"
+        self.page.text(self.margin, self.y + 30, subtitle, size=9, color=hex_color('#666666'))
+        self.y += 44
+
+    def table(self, title, table):
+        width = self.doc.width - 2 * self.margin
+        fixed = sum(column for column in table['widths'] if column)
+        widths = [column or (width - fixed) for column in table['widths']]
+
+        def column_headers():
+            x = self.margin
+            for label, column in zip(table['headers'], widths):
+                self.page.rect(x, self.y, column, self.row_height + 2, fill=hex_color('#f8f9fa'),
+                               stroke=hex_color('#dddddd'))
+                self.page.text(x + 3, self.y + 10.5, fit_text(label, column - 6, self.header_size, True),
+                               size=self.header_size, bold=True, color=hex_color('#333333'))
+                x += column
+            self.y += self.row_height + 2
+
+        self.ensure(40 + self.row_height * 2)
+        self.page.text(self.margin, self.y + 12, title, size=12, bold=True, color=hex_color('#333333'))
+        self.y += 18
+        column_headers()
+        if not table['rows']:
+            self.page.text(self.margin + 3, self.y + 10, 'No supplies', size=self.font_size,
+                           color=hex_color('#6c757d'))
+            self.y += self.row_height
+        for row in table['rows']:
+            if self.ensure(self.row_height):
+                self.page.text(self.margin, self.y + 12, f"{title} (continued)", size=10, bold=True,
+                               color=hex_color('#333333'))
+                self.y += 16
+                column_headers()
+            x = self.margin
+            agency_fill = self.context['agency_colors'].get(row['agency_class'][len('agency-'):])
+            for (text, css), column in zip(row['cells'], widths):
+                fill, color = self.context['cell_styles'].get(css, (agency_fill, '#333333'))
+                self.page.rect(x, self.y, column, self.row_height, fill=hex_color(fill) if fill else None,
+                               stroke=hex_color('#dddddd'))
+                bold = css in ('supply-name', 'positive-result', 'negative-result', 'pending-result')
+                self.page.text(x + 3, self.y + 9.8, fit_text(text, column - 6, self.font_size, bold),
+                               size=self.font_size, bold=bold, color=hex_color(color))
+                x += column
+            self.y += self.row_height
+        self.y += 16
+
+    def summary(self):
+        per_row, gap, card_height = 5, 8, 40
+        card_width = (self.doc.width - 2 * self.margin - gap * (per_row - 1)) / per_row
+        rows = (len(self.context['summary']) + per_row - 1) // per_row
+        self.ensure(24 + rows * (card_height + gap))
+        self.page.text(self.margin, self.y + 14, 'Monthly Summary', size=13, bold=True, color=hex_color('#333333'))
+        self.y += 24
+        for index, (label, value, color) in enumerate(self.context['summary']):
+            column, row = index % per_row, index // per_row
+            x = self.margin + column * (card_width + gap)
+            y = self.y + row * (card_height + gap)
+            self.page.rect(x, y, card_width, card_height, fill=hex_color('#f8f9fa'))
+            self.page.text_center(x + card_width / 2, y + 13, label, size=8, bold=True, color=hex_color('#333333'))
+            self.page.text_center(x + card_width / 2, y + 32, str(value), size=15, bold=True, color=hex_color(color))
+        self.y += rows * (card_height + gap)
+
+    def footer(self):
+        total = len(self.doc.pages)
+        for number, page in enumerate(self.doc.pages, 1):
+            page.text_right(self.doc.width - self.margin, self.doc.height - self.margin + 8,
+                            f"Page {number} of {total}", size=8, color=hex_color('#999999'))
+            page.text(self.margin, self.doc.height - self.margin + 8, self.context['title'], size=8,
+                      color=hex_color('#999999'))
+
+    def render(self):
+        self.header()
+        self.table('Treated Supplies', self.context['treated'])
+        self.table('Untreated Supplies', self.context['untreated'])
+        self.summary()
+        self.footer()
+        return self.doc.output()
+
+
+def render_pdf(context):
+    return _PDFLayout(context).render()
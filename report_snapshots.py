@@ -0,0 +1,234 @@
+"""
+Frozen snapshots of closed monthly reports
+
+Closing a month (POST /api/admin/reports/<year>/<month>/close) stores the
+report as it stands in report_snapshots: columnar JSON compressed with
+gzip, its SHA-256 and the data version stamp of the month (see
+data_cache.py). /api/report/<year>/<month> then serves the snapshot instead
+of aggregating the raw submissions, with the hash as ETag.
+
+A snapshot is only served while its stamp matches the month's current data
+version. Edits to submissions of a closed month are recorded in
+report_snapshot_edits and mark the snapshot stale; the app then rebuilds
+it on the background job pool (a new revision with a new hash), and reads
+fall back to the live report until that has finished.
+"""
+import gzip
+import hashlib
+import time
+from datetime import date
+
+from flask import jsonify, request, session
+
+from data_cache import GLOBAL_SCOPE, month_scope
+
+
+class ReportSnapshots:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+        self.stamp = None
+        self.build = None
+
+    def init_app(self, app, connect, build, stamp, postgres=False):
+        """
+        ``build(conn, year, month)`` returns the report as
+        {"supplies": {"columns", "rows"}, "monthly_data": {...}}; ``stamp(conn, scopes)``
+        is data_cache.stamp.
+        """
+        self.app = app
+        self.connect = connect
+        self.build = build
+        self.stamp = stamp
+        self.postgres = postgres
+        self._register_routes(app)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    @staticmethod
+    def scopes(year, month):
+        return [month_scope((year, month)), GLOBAL_SCOPE]
+
+    def freeze(self, year, month, user_id=None):
+        """Store (or replace) the snapshot of a month; returns its metadata"""
+        conn = self.connect()
+        try:
+            # Stamp first: a write racing the build leaves the snapshot stale, not wrong
+            stamp = self.stamp(conn, self.scopes(year, month))
+            data = self.build(conn, year, month)
+            raw = self.app.json.dumps(data).encode('utf-8')
+            body = gzip.compress(raw, 9)
+            digest = hashlib.sha256(raw).hexdigest()
+            now = time.time()
+            self._execute(conn, '''
+                INSERT INTO report_snapshots
+                (year, month, body, sha256, stamp, size, compressed_size, revision, closed_at, closed_by,
+                 refreshed_at, stale)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?, 0)
+                ON CONFLICT (year, month) DO UPDATE
+                SET body = excluded.body, sha256 = excluded.sha256, stamp = excluded.stamp,
+                    size = excluded.size, compressed_size = excluded.compressed_size,
+                    revision = report_snapshots.revision + 1, refreshed_at = excluded.refreshed_at, stale = 0
+            ''', (year, month, body, digest, stamp, len(raw), len(body), now, user_id, now))
+            conn.commit()
+            row = self._execute(conn, 'SELECT * FROM report_snapshots WHERE year = ? AND month = ?',
+                                (year, month)).fetchone()
+        finally:
+            conn.close()
+        print(f"[SNAPSHOT] Froze report {year}-{month:02d} revision {row['revision']} "
+              f"({len(raw):,} -> {len(body):,} bytes, sha256 {digest[:12]})")
+        return self._metadata(row, stamp)
+
+    def load(self, year, month):
+        """The current snapshot row of a month, or None when the month is open or its snapshot stale"""
+        conn = self.connect()
+        try:
+            row = self._execute(conn, 'SELECT * FROM report_snapshots WHERE year = ? AND month = ?',
+                                (year, month)).fetchone()
+            if row is None or row['stale']:
+                return None
+            if row['stamp'] != self.stamp(conn, self.scopes(year, month)):
+                return None
+            return row
+        finally:
+            conn.close()
+
+    def response(self, row, columnar=False):
+        data = self.app.json.loads(gzip.decompress(bytes(row['body'])))
+        if not columnar:
+            data = {name: [dict(zip(table['columns'], values)) for values in table['rows']]
+                    for name, table in data.items()}
+        response = jsonify(data)
+        response.set_etag(f"{row['sha256']}{'-columnar' if columnar else ''}")
+        response.headers['X-Report-Snapshot'] = f"{row['sha256']} rev {row['revision']}"
+        return response.make_conditional(request)
+
+    def flag_edit(self, conn, scope, submission_id, user_id, action):
+        """
+        Record a write to a month's submissions when that month is closed;
+        call with the write's connection before its commit. Returns True when
+        the month was closed, so the caller can rebuild the snapshot.
+        """
+        year, month = int(scope[:4]), int(scope[5:7])
+        cursor = self._execute(conn, 'UPDATE report_snapshots SET stale = 1 WHERE year = ? AND month = ?',
+                               (year, month))
+        if cursor.rowcount == 0:
+            return False
+        self._execute(conn, '''
+            INSERT INTO report_snapshot_edits (year, month, submission_id, user_id, action, edited_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (year, month, submission_id, user_id, action, time.time()))
+        print(f"[SNAPSHOT] Closed month {scope} edited ({action} submission {submission_id})")
+        return True
+
+    def outdated(self):
+        """(year, month) of snapshots that are stale or no longer match their month's data"""
+        conn = self.connect()
+        try:
+            rows = self._execute(conn, 'SELECT year, month, stamp, stale FROM report_snapshots').fetchall()
+            return [(row['year'], row['month']) for row in rows
+                    if row['stale'] or row['stamp'] != self.stamp(conn, self.scopes(row['year'], row['month']))]
+        finally:
+            conn.close()
+
+    def reopen(self, year, month):
+        conn = self.connect()
+        try:
+            cursor = self._execute(conn, 'DELETE FROM report_snapshots WHERE year = ? AND month = ?', (year, month))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def _metadata(self, row, current_stamp):
+        return {
+            'year': row['year'],
+            'month': row['month'],
+            'sha256': row['sha256'],
+            'size': row['size'],
+            'compressed_size': row['compressed_size'],
+            'revision': row['revision'],
+            'closed_at': row['closed_at'],
+            'closed_by': row['closed_by'],
+            'refreshed_at': row['refreshed_at'],
+            'current': not row['stale'] and row['stamp'] == current_stamp,
+        }
+
+    def list(self):
+        conn = self.connect()
+        try:
+            rows = self._execute(conn, '''
+                SELECT year, month, sha256, stamp, size, compressed_size, revision, closed_at, closed_by,
+                       refreshed_at, stale
+                FROM report_snapshots ORDER BY year DESC, month DESC
+            ''').fetchall()
+            edits = {(row['year'], row['month']): row['edits'] for row in self._execute(conn, '''
+                SELECT year, month, COUNT(*) AS edits FROM report_snapshot_edits GROUP BY year, month
+            ''').fetchall()}
+            snapshots = []
+            for row in rows:
+                metadata = self._metadata(row, self.stamp(conn, self.scopes(row['year'], row['month'])))
+                metadata['edits'] = edits.get((row['year'], row['month']), 0)
+                snapshots.append(metadata)
+            return snapshots
+        finally:
+            conn.close()
+
+    def edits(self, year, month):
+        conn = self.connect()
+        try:
+            return self._execute(conn, '''
+                SELECT e.*, u.full_name AS user_name
+                FROM report_snapshot_edits e
+                LEFT JOIN users u ON e.user_id = u.id
+                WHERE e.year = ? AND e.month = ?
+                ORDER BY e.edited_at DESC
+            ''', (year, month)).fetchall()
+        finally:
+            conn.close()
+
+    def _register_routes(self, app):
+        def require_admin():
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            return None
+
+        @app.route('/api/admin/reports/snapshots')
+        def list_report_snapshots():
+            denied = require_admin()
+            if denied:
+                return denied
+            return jsonify(self.list())
+
+        @app.route('/api/admin/reports/<int:year>/<int:month>/close', methods=['POST', 'DELETE'])
+        def close_report_month(year, month):
+            """POST freezes the month's report; DELETE reopens the month"""
+            denied = require_admin()
+            if denied:
+                return denied
+            if not 1 <= month <= 12:
+                return jsonify({'error': 'Invalid month'}), 400
+            if request.method == 'DELETE':
+                if not self.reopen(year, month):
+                    return jsonify({'error': 'Month is not closed'}), 404
+                return jsonify({'success': True})
+            today = date.today()
+            if (year, month) >= (today.year, today.month):
+                return jsonify({'error': 'Only months that have ended can be closed'}), 400
+            return jsonify(self.freeze(year, month, session['user_id']))
+
+        @app.route('/api/admin/reports/<int:year>/<int:month>/edits')
+        def closed_month_edits(year, month):
+            denied = require_admin()
+            if denied:
+                return denied
+            return jsonify(self.edits(year, month))
+
+
+report_snapshots = ReportSnapshots()
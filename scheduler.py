@@ -0,0 +1,202 @@
+"""
+In-process scheduler with leader election
+
+Every worker process runs one scheduler thread that wakes up every
+SCHEDULER_INTERVAL seconds. A task is due when:
+
+    - it has not run since this process started (i.e. after a deploy or
+      restart), when registered with on_start=True
+    - the calendar month changed since its last run (monthly=True)
+    - ``every`` seconds passed since its last run
+
+Task state lives in the scheduler_tasks table. Before running a due task a
+worker takes its lease with a conditional UPDATE that only succeeds while
+nobody else holds an unexpired lease and the recorded last run is still the
+one the worker saw, so across any number of workers or hosts sharing the
+database each run happens exactly once. A lease that is not released (the
+worker died) expires after SCHEDULER_LEASE seconds.
+
+Call scheduler.start() in processes that serve requests; scripts and tests
+importing the app do not start it.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from flask import jsonify, request, session
+
+DEFAULT_CONFIG = {
+    'SCHEDULER_ENABLED': True,
+    'SCHEDULER_INTERVAL': 60,
+    'SCHEDULER_LEASE': 600,
+}
+
+
+class Task:
+    def __init__(self, name, func, every, monthly, on_start):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.monthly = monthly
+        self.on_start = on_start
+
+
+def _month(timestamp):
+    moment = time.localtime(timestamp)
+    return moment.tm_year, moment.tm_mon
+
+
+class Scheduler:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+        self.tasks = {}
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.boot = time.time()
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app, connect, postgres=False):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+
+        @app.route('/api/admin/scheduler', methods=['GET', 'POST'])
+        def scheduler_status():
+            """Task state; POST {"task": name} runs a task now (still under its lease)"""
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            if request.method == 'POST':
+                name = (request.get_json(silent=True) or {}).get('task')
+                if name not in self.tasks:
+                    return jsonify({'error': f"Unknown task. Available: {', '.join(sorted(self.tasks))}"}), 400
+                state = self._state(name)
+                if not self._run(self.tasks[name], state):
+                    return jsonify({'error': 'Task is running in another worker'}), 409
+            return jsonify({'holder': self.holder, 'running': self.running, 'tasks': self.status()})
+
+    def task(self, name, every=None, monthly=True, on_start=True):
+        """Decorator registering a scheduled task; the function runs inside an app context"""
+        def register(func):
+            self.tasks[name] = Task(name, func, every, monthly, on_start)
+            return func
+        return register
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if not self.app.config['SCHEDULER_ENABLED'] or self.running:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self.thread.start()
+        print(f"[SCHEDULER] Started as {self.holder} with {len(self.tasks)} tasks")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"[SCHEDULER] Error: {e}")
+            self._stop_event.wait(self.app.config['SCHEDULER_INTERVAL'])
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def is_due(self, task, last_run, now=None):
+        now = time.time() if now is None else now
+        if not last_run:
+            return True
+        if task.on_start and last_run < self.boot:
+            return True
+        if task.monthly and _month(last_run) != _month(now):
+            return True
+        return bool(task.every) and now - last_run >= task.every
+
+    def run_pending(self):
+        for task in list(self.tasks.values()):
+            state = self._state(task.name)
+            if self.is_due(task, state['last_run']):
+                self._run(task, state)
+
+    def _state(self, name):
+        conn = self.connect()
+        try:
+            self._execute(conn, '''
+                INSERT INTO scheduler_tasks (name, lease_until) VALUES (?, 0)
+                ON CONFLICT (name) DO NOTHING
+            ''', (name,))
+            conn.commit()
+            row = self._execute(conn, 'SELECT * FROM scheduler_tasks WHERE name = ?', (name,)).fetchone()
+            return dict(row)
+        finally:
+            conn.close()
+
+    def _acquire(self, name, seen_last_run):
+        """Take the task's lease unless another worker holds it or ran the task since we looked"""
+        now = time.time()
+        conn = self.connect()
+        try:
+            cursor = self._execute(conn, '''
+                UPDATE scheduler_tasks SET holder = ?, lease_until = ?
+                WHERE name = ? AND (lease_until < ? OR holder = ?) AND COALESCE(last_run, 0) = ?
+            ''', (self.holder, now + self.app.config['SCHEDULER_LEASE'], name, now, self.holder,
+                  seen_last_run or 0))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def _release(self, name, started, status):
+        conn = self.connect()
+        try:
+            self._execute(conn, '''
+                UPDATE scheduler_tasks
+                SET holder = NULL, lease_until = 0, last_run = ?, last_status = ?, last_duration = ?
+                WHERE name = ? AND holder = ?
+            ''', (started, status, time.time() - started, name, self.holder))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run(self, task, state):
+        if not self._acquire(task.name, state['last_run']):
+            return False
+        started = time.time()
+        try:
+            with self.app.app_context():
+                task.func()
+            status = 'ok'
+        except Exception as e:
+            traceback.print_exc()
+            status = f"error: {e}"
+        self._release(task.name, started, status)
+        print(f"[SCHEDULER] {task.name} {status} in {time.time() - started:.2f}s")
+        return True
+
+    def status(self):
+        states = []
+        for name, task in sorted(self.tasks.items()):
+            state = self._state(name)
+            state.update(every=task.every, monthly=task.monthly, on_start=task.on_start,
+                         due=self.is_due(task, state['last_run']))
+            states.append(state)
+        return states
+
+
+scheduler = Scheduler()
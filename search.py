@@ -0,0 +1,329 @@
+"""
+Full-text search over submissions
+
+Indexes each submission's remarks, isolated organism, rejected/broken
+sample reasons and the names of its supply and sampling point:
+
+    SQLite      an FTS5 table (submission_search, rowid = submission id)
+                with diacritics folded, ranked with bm25()
+    PostgreSQL  a weighted tsvector per submission in submission_search
+                with a GIN index, ranked with ts_rank_cd()
+
+Triggers on inspection_submissions keep the index in sync with every
+insert, update and delete, including bulk loads (generate_dataset.py); the
+index is filled from existing rows when it is first created, and
+POST /api/admin/search/rebuild re-indexes everything (e.g. after supplies
+or sampling points are renamed).
+
+GET /api/search?q=e coli&parish=Hanover returns the best matches first.
+Pages are keyset-paginated: pass the returned next_cursor as ?cursor= to
+continue after the last result instead of using an offset. Each result's
+excerpt is HTML: the submission text escaped, the matched words in <mark>.
+"""
+import re
+
+from flask import jsonify, request, session
+from markupsafe import escape
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Relative importance of the indexed fields (SQLite bm25 column weights,
+# PostgreSQL setweight classes A-D in the same order)
+FIELD_WEIGHTS = (('isolated_organism', 4.0), ('names', 3.0), ('reasons', 2.0), ('remarks', 1.0))
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Highlight delimiters the database puts around matches; control characters, so they never
+# collide with the escaped text and become <mark> tags only after escaping
+MARK_START, MARK_END = '\x02', '\x03'
+
+SQLITE_DOCUMENT = '''
+    SELECT NEW.id, NEW.isolated_organism,
+           ws.name || ' ' || COALESCE(sp.name, ''),
+           COALESCE(NEW.bacteriological_rejected_reason, '') || ' ' || COALESCE(NEW.bacteriological_broken_reason, ''),
+           NEW.remarks
+    FROM water_supplies ws
+    LEFT JOIN sampling_points sp ON sp.id = NEW.sampling_point_id
+    WHERE ws.id = NEW.supply_id;
+'''
+
+SQLITE_SCHEMA = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS submission_search USING fts5(
+        isolated_organism, names, reasons, remarks,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS submission_search_insert AFTER INSERT ON inspection_submissions BEGIN
+        INSERT INTO submission_search (rowid, isolated_organism, names, reasons, remarks) {SQLITE_DOCUMENT}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS submission_search_update AFTER UPDATE ON inspection_submissions BEGIN
+        DELETE FROM submission_search WHERE rowid = OLD.id;
+        INSERT INTO submission_search (rowid, isolated_organism, names, reasons, remarks) {SQLITE_DOCUMENT}
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS submission_search_delete AFTER DELETE ON inspection_submissions BEGIN
+        DELETE FROM submission_search WHERE rowid = OLD.id;
+    END
+    ''',
+)
+
+SQLITE_REBUILD = (
+    'DELETE FROM submission_search',
+    '''
+    INSERT INTO submission_search (rowid, isolated_organism, names, reasons, remarks)
+    SELECT sub.id, sub.isolated_organism,
+           ws.name || ' ' || COALESCE(sp.name, ''),
+           COALESCE(sub.bacteriological_rejected_reason, '') || ' ' || COALESCE(sub.bacteriological_broken_reason, ''),
+           sub.remarks
+    FROM inspection_submissions sub
+    JOIN water_supplies ws ON ws.id = sub.supply_id
+    LEFT JOIN sampling_points sp ON sp.id = sub.sampling_point_id
+    ''',
+)
+
+POSTGRES_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS submission_search (
+        submission_id INTEGER PRIMARY KEY,
+        document TSVECTOR NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_submission_search_document ON submission_search USING GIN (document)',
+    '''
+    CREATE OR REPLACE FUNCTION submission_search_document(sub inspection_submissions) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', COALESCE(sub.isolated_organism, '')), 'A')
+            || setweight(to_tsvector('simple', ws.name || ' ' || COALESCE(sp.name, '')), 'B')
+            || setweight(to_tsvector('simple', COALESCE(sub.bacteriological_rejected_reason, '') || ' '
+                                               || COALESCE(sub.bacteriological_broken_reason, '')), 'C')
+            || setweight(to_tsvector('simple', COALESCE(sub.remarks, '')), 'D')
+        FROM water_supplies ws
+        LEFT JOIN sampling_points sp ON sp.id = sub.sampling_point_id
+        WHERE ws.id = sub.supply_id
+    $$ LANGUAGE sql STABLE
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION submission_search_sync() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO submission_search (submission_id, document)
+        VALUES (NEW.id, COALESCE(submission_search_document(NEW), ''::tsvector))
+        ON CONFLICT (submission_id) DO UPDATE SET document = excluded.document;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS submission_search_sync ON inspection_submissions',
+    '''
+    CREATE TRIGGER submission_search_sync AFTER INSERT OR UPDATE ON inspection_submissions
+    FOR EACH ROW EXECUTE FUNCTION submission_search_sync()
+    ''',
+    # Deletes follow by trigger: a foreign key would need the full (id, submission_date) key of partitions.py's table
+    '''
+    CREATE OR REPLACE FUNCTION submission_search_delete() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM submission_search WHERE submission_id = OLD.id;
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS submission_search_delete ON inspection_submissions',
+    '''
+    CREATE TRIGGER submission_search_delete AFTER DELETE ON inspection_submissions
+    FOR EACH ROW EXECUTE FUNCTION submission_search_delete()
+    ''',
+)
+
+POSTGRES_REBUILD = (
+    '''
+    INSERT INTO submission_search (submission_id, document)
+    SELECT sub.id, COALESCE(submission_search_document(sub), ''::tsvector) FROM inspection_submissions sub
+    ON CONFLICT (submission_id) DO UPDATE SET document = excluded.document
+    ''',
+)
+
+
+def create_schema(cursor, postgres=False):
+    """Create the index and its triggers (called from init_db); fills the index when it is new"""
+    if postgres:
+        cursor.execute("SELECT to_regclass('submission_search') AS name")
+        row = cursor.fetchone()
+        exists = (row['name'] if isinstance(row, dict) else row[0]) is not None
+        statements, rebuild = POSTGRES_SCHEMA, POSTGRES_REBUILD
+    else:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'submission_search'")
+        exists = cursor.fetchone() is not None
+        statements, rebuild = SQLITE_SCHEMA, SQLITE_REBUILD
+    for statement in statements:
+        cursor.execute(statement)
+    if not exists:
+        for statement in rebuild:
+            cursor.execute(statement)
+        print("[SEARCH] Built the submission search index")
+
+
+def match_expression(query, postgres=False):
+    """
+    The words of a free-text query as an FTS5 MATCH expression or a
+    to_tsquery() argument: every word must match, the last one as a prefix
+    (so results appear while typing). None when there are no words.
+    """
+    words = [word.lower() for word in _TOKEN.findall(query or '')]
+    if not words:
+        return None
+    if postgres:
+        return ' & '.join(words[:-1] + [f"{words[-1]}:*"])
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def parse_cursor(value):
+    """(score, id) of the last result of the previous page, or None"""
+    if not value:
+        return None
+    score, _, last_id = value.rpartition(':')
+    return float(score), int(last_id)
+
+
+def highlight(excerpt):
+    """HTML of an excerpt with database highlight delimiters: the text escaped, matches in <mark>"""
+    if excerpt is None:
+        return None
+    return str(escape(excerpt)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class SubmissionSearch:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.postgres = False
+
+    def init_app(self, app, connect, postgres=False):
+        self.app = app
+        self.connect = connect
+        self.postgres = postgres
+        self._register_routes(app)
+
+    def _execute(self, conn, sql, params=()):
+        cursor = conn.cursor()
+        cursor.execute(sql.replace('?', '%s') if self.postgres else sql, params)
+        return cursor
+
+    def _ranked_sql(self):
+        """
+        (select-list excerpt expression, subquery of matching ids with their
+        score, lower is better); both take the match expression as parameter
+        """
+        if self.postgres:
+            # Headlines are only worth computing for the page being returned
+            excerpt = '''ts_headline('simple', concat_ws(' - ', sub.isolated_organism, sub.remarks,
+                                                        sub.bacteriological_rejected_reason,
+                                                        sub.bacteriological_broken_reason),
+                                    to_tsquery('simple', ?),
+                                    'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=20, MinWords=8')'''
+            return excerpt, '''
+                SELECT ss.submission_id AS id, -ts_rank_cd(ss.document, query, 32) AS score
+                FROM submission_search ss, to_tsquery('simple', ?) query
+                WHERE ss.document @@ query
+            '''
+        weights = ', '.join(str(weight) for _, weight in FIELD_WEIGHTS)
+        return None, f'''
+            SELECT rowid AS id, bm25(submission_search, {weights}) AS score,
+                   snippet(submission_search, -1, char(2), char(3), '...', 16) AS excerpt
+            FROM submission_search
+            WHERE submission_search MATCH ?
+        '''
+
+    def search(self, query, parish=None, after=None, limit=DEFAULT_LIMIT):
+        """
+        One page of submissions matching ``query``, best first; ``after`` is
+        the (score, id) of the previous page's last result. Returns
+        (results, next cursor or None).
+        """
+        expression = match_expression(query, self.postgres)
+        if expression is None:
+            return [], None
+        excerpt, ranked = self._ranked_sql()
+        conditions, values = [], [expression, expression] if excerpt else [expression]
+        if parish:
+            conditions.append('ws.parish = ?')
+            values.append(parish)
+        if after is not None:
+            conditions.append('(r.score > ? OR (r.score = ? AND r.id > ?))')
+            values += [after[0], after[0], after[1]]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        conn = self.connect()
+        try:
+            rows = self._execute(conn, f'''
+                SELECT r.id, r.score, {excerpt or 'r.excerpt'} AS excerpt,
+                       sub.submission_date, sub.isolated_organism, sub.remarks,
+                       sub.bacteriological_rejected_reason, sub.bacteriological_broken_reason,
+                       ws.id AS supply_id, ws.name AS supply_name, ws.parish,
+                       sp.name AS sampling_point_name, u.full_name AS inspector_name
+                FROM ({ranked}) r
+                JOIN inspection_submissions sub ON sub.id = r.id
+                JOIN water_supplies ws ON ws.id = sub.supply_id
+                LEFT JOIN sampling_points sp ON sp.id = sub.sampling_point_id
+                JOIN users u ON u.id = sub.inspector_id
+                {where}
+                ORDER BY r.score, r.id
+                LIMIT ?
+            ''', values + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+        results = [dict(row) for row in rows[:limit]]
+        for result in results:
+            result['excerpt'] = highlight(result['excerpt'])
+        next_cursor = None
+        if len(rows) > limit:
+            last = results[-1]
+            next_cursor = f"{last['score']!r}:{last['id']}"
+        return results, next_cursor
+
+    def rebuild(self):
+        conn = self.connect()
+        try:
+            for statement in (POSTGRES_REBUILD if self.postgres else SQLITE_REBUILD):
+                self._execute(conn, statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _register_routes(self, app):
+        def require_admin():
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            if session.get('role') != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+            return None
+
+        @app.route('/api/search')
+        def search_submissions():
+            """?q= words to find, ?parish=, ?limit= (default 20, at most 100), ?cursor= from the previous page"""
+            denied = require_admin()
+            if denied:
+                return denied
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({'error': 'q is required'}), 400
+            limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+            try:
+                after = parse_cursor(request.args.get('cursor'))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            results, next_cursor = self.search(query, request.args.get('parish') or None, after, limit)
+            return jsonify({'query': query, 'results': results, 'next_cursor': next_cursor})
+
+        @app.route('/api/admin/search/rebuild', methods=['POST'])
+        def rebuild_search_index():
+            denied = require_admin()
+            if denied:
+                return denied
+            self.rebuild()
+            return jsonify({'success': True})
+
+
+search_index = SubmissionSearch()
@@ -0,0 +1,145 @@
+"""
+Submission documents
+
+Renders the printable inspection record served by
+/api/submission/<id>/download (and bundled by /api/submissions/download)
+from templates/submission_document.html. The template is compiled once per
+process by a Jinja environment of its own, so it also renders in job worker
+processes that have no application context. render_bundle_batch() (the
+ZIP download's job pool function) lives here too, so worker processes
+only import this module, never the app.
+
+Rendered documents are cached in memory keyed by (submission id,
+revision); inspection_submissions.revision is incremented by every update
+of a submission, so an edited submission is simply a new key and stale
+entries age out. The cache is bounded by the total size of the documents
+it holds (SUBMISSION_DOC_CACHE_BYTES), evicting least recently used first.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from jinja2 import Environment, FileSystemLoader
+from werkzeug.utils import secure_filename
+
+from metrics import record_cache, registry
+
+DEFAULT_CONFIG = {
+    'SUBMISSION_DOC_CACHE_BYTES': 32 * 1024 * 1024,
+}
+
+TEMPLATE = 'submission_document.html'
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# created_at as SQLite returns it; Postgres returns datetime objects
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f',
+                     '%Y-%m-%d')
+
+
+def parse_timestamp(value):
+    """datetime from a datetime, date or timestamp string; None when it cannot be read"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def format_timestamp(value):
+    moment = parse_timestamp(value)
+    if moment is None:
+        return str(value or '')
+    return moment.strftime('%B %d, %Y at %I:%M %p')
+
+
+_environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True, trim_blocks=True,
+                           lstrip_blocks=True)
+_environment.filters['timestamp'] = format_timestamp
+
+
+class SubmissionDocuments:
+    def __init__(self):
+        self.max_bytes = DEFAULT_CONFIG['SUBMISSION_DOC_CACHE_BYTES']
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self._template = None
+
+    def init_app(self, app):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.max_bytes = app.config['SUBMISSION_DOC_CACHE_BYTES']
+        # The app's environment compiles every template at startup (page_shells.py)
+        app.jinja_env.filters['timestamp'] = format_timestamp
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = _environment.get_template(TEMPLATE)
+        return self._template
+
+    def render(self, submission):
+        """The document of a submission row (joined with supply, sampling point and inspector names)"""
+        return self.template.render(submission=submission)
+
+    def document(self, submission):
+        """Rendered document as UTF-8 bytes, from the cache when this revision was rendered before"""
+        key = (submission['id'], submission.get('revision') or 0)
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+        record_cache('submission-document', body is not None)
+        if body is not None:
+            return body
+
+        body = self.render(submission).encode('utf-8')
+        if len(body) <= self.max_bytes:
+            with self.lock:
+                previous = self.entries.pop(key, None)
+                if previous is not None:
+                    self.size -= len(previous)
+                self.entries[key] = body
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return body
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+submission_documents = SubmissionDocuments()
+
+
+def bundle_member(submission):
+    """(path in the archive, document, date_time) of one submission"""
+    day = str(submission['submission_date'])[:10]
+    supply = secure_filename(submission['supply_name'] or '') or f"supply_{submission['supply_id']}"
+    year, month, day_of_month = (int(part) for part in day.split('-'))
+    return (f"{day[:7]}/{supply}/submission_{submission['id']}_{day}.html",
+            submission_documents.render(submission).encode('utf-8'), (year, month, day_of_month, 0, 0, 0))
+
+
+def render_bundle_batch(submissions):
+    """Archive members of a batch of submissions; runs in a job worker process"""
+    return [bundle_member(submission) for submission in submissions]
+
+registry.gauge_callback('submission_document_cache_bytes', 'Size of the rendered submission documents held in memory',
+                        (), lambda: {(): submission_documents.size})
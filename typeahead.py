@@ -0,0 +1,210 @@
+"""
+Typeahead over water supplies and sampling points
+
+An in-memory index built from the water_supplies and sampling_points
+tables answers GET /api/typeahead?q=negr without touching the database.
+Names are normalised before indexing and querying: accents are stripped,
+case is folded, apostrophes are dropped and other punctuation (en dashes,
+"@", "/") becomes a word break, so "negril logwood", "Négril-Logwood" and
+"Negril–Logwood" all find the same supply and "deans valley" finds
+"Dean's Valley".
+
+Two structures are kept:
+
+    prefixes  every prefix of every word -> entries; a query matches an
+              entry when each of its words is a prefix of one of the
+              entry's words
+    trigrams  3-grams of the whole normalised name -> entries; used when
+              prefixes find too little, so infixes and small typos
+              ("logwod", "shetlewood") still match
+
+The catalog only changes when the app seeds it, so the index is rebuilt
+lazily once it is older than TYPEAHEAD_MAX_AGE seconds.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from flask import jsonify, request, session
+
+DEFAULT_CONFIG = {
+    'TYPEAHEAD_MAX_AGE': 300,
+}
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Share of the query's trigrams an entry must contain to match on trigrams
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+_APOSTROPHES = re.compile(r"['\u2018\u2019\u02bc`]")
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """'Dean’s Valley – Négril' -> 'deans valley negril'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', _APOSTROPHES.sub('', stripped.lower())).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Entry:
+    __slots__ = ('kind', 'id', 'name', 'parish', 'data', 'normalized', 'words')
+
+    def __init__(self, kind, id, name, parish, data, search_text):
+        self.kind = kind
+        self.id = id
+        self.name = name
+        self.parish = parish
+        self.data = data
+        self.normalized = normalize(search_text)
+        self.words = self.normalized.split()
+
+    def to_dict(self):
+        return dict(self.data, kind=self.kind, id=self.id, name=self.name, parish=self.parish)
+
+
+class TypeaheadIndex:
+    def __init__(self, entries):
+        self.entries = entries
+        self.prefixes = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        for index, entry in enumerate(entries):
+            for word in entry.words:
+                for end in range(1, len(word) + 1):
+                    self.prefixes[word[:end]].add(index)
+            for gram in trigrams(entry.normalized):
+                self.trigrams[gram].add(index)
+
+    def _prefix_matches(self, words):
+        matches = None
+        for word in sorted(words, key=len, reverse=True):
+            found = self.prefixes.get(word)
+            if not found:
+                return set()
+            matches = set(found) if matches is None else matches & found
+        return matches
+
+    def _trigram_matches(self, text):
+        grams = trigrams(text)
+        counts = defaultdict(int)
+        for gram in grams:
+            for index in self.trigrams.get(gram, ()):
+                counts[index] += 1
+        return {index: count / len(grams) for index, count in counts.items()
+                if count / len(grams) >= MIN_TRIGRAM_SIMILARITY}
+
+    def search(self, query, limit=DEFAULT_LIMIT, accept=None):
+        """Best entries for ``query``; ``accept(entry)`` filters (parish, kind, supply)"""
+        text = normalize(query)
+        if not text:
+            return []
+        words = text.split()
+
+        def rank(index):
+            entry = self.entries[index]
+            # Whole name starts with the query, then the first word does, then shorter names
+            return (not entry.normalized.startswith(text), not entry.words[0].startswith(words[0]),
+                    entry.kind != 'supply', len(entry.normalized), entry.normalized)
+
+        results = sorted((index for index in self._prefix_matches(words)
+                          if accept is None or accept(self.entries[index])), key=rank)[:limit]
+        if len(results) < limit:
+            seen = set(results)
+            similar = self._trigram_matches(text)
+            extra = sorted((index for index in similar
+                            if index not in seen and (accept is None or accept(self.entries[index]))),
+                           key=lambda index: (-similar[index], rank(index)))
+            results += extra[:limit - len(results)]
+        return [self.entries[index] for index in results]
+
+
+class Typeahead:
+    def __init__(self):
+        self.app = None
+        self.connect = None
+        self.index = None
+        self.built = 0
+        self.lock = threading.Lock()
+
+    def init_app(self, app, connect):
+        for key, value in DEFAULT_CONFIG.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        self.connect = connect
+        self._register_routes(app)
+
+    def load(self):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, name, type, agency, location, parish FROM water_supplies')
+            supplies = [dict(row) for row in cursor.fetchall()]
+            cursor.execute('SELECT id, supply_id, name, location FROM sampling_points')
+            points = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        by_id = {supply['id']: supply for supply in supplies}
+        entries = [Entry('supply', supply['id'], supply['name'], supply['parish'],
+                         {'type': supply['type'], 'agency': supply['agency'], 'location': supply['location']},
+                         supply['name'])
+                   for supply in supplies]
+        for point in points:
+            supply = by_id.get(point['supply_id'])
+            if supply is None:
+                continue
+            # Points are found by their own name or their supply's ("great river tap")
+            entries.append(Entry('sampling_point', point['id'], point['name'], supply['parish'],
+                                 {'supply_id': supply['id'], 'supply_name': supply['name'],
+                                  'location': point['location']},
+                                 f"{point['name']} {supply['name']}"))
+        return TypeaheadIndex(entries)
+
+    def current(self):
+        """The index, rebuilt first when it is older than TYPEAHEAD_MAX_AGE"""
+        if self.index is None or time.time() - self.built > self.app.config['TYPEAHEAD_MAX_AGE']:
+            with self.lock:
+                if self.index is None or time.time() - self.built > self.app.config['TYPEAHEAD_MAX_AGE']:
+                    self.index = self.load()
+                    self.built = time.time()
+        return self.index
+
+    def _register_routes(self, app):
+        @app.route('/api/typeahead')
+        def typeahead():
+            """
+            ?q= partial name; ?kind=supply|sampling_point; ?supply_id= (points of
+            one supply); ?parish= (admins; inspectors always get their own parish);
+            ?limit= (default 10, at most 50)
+            """
+            if 'user_id' not in session:
+                return jsonify({'error': 'Not authenticated'}), 401
+            started = time.perf_counter()
+            kind = request.args.get('kind')
+            supply_id = request.args.get('supply_id', type=int)
+            parish = request.args.get('parish') if session.get('role') == 'admin' else session.get('parish')
+            limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+            def accept(entry):
+                if kind and entry.kind != kind:
+                    return False
+                if parish and entry.parish != parish:
+                    return False
+                return not supply_id or entry.data.get('supply_id') == supply_id
+
+            index = self.current()
+            results = index.search(request.args.get('q', ''), limit, accept)
+            return jsonify({
+                'results': [entry.to_dict() for entry in results],
+                'took_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+typeahead = Typeahead()
@@ -2,6 +2,21 @@
 Water supplies data for all parishes
 """
 
+# Parishes with an inspector dashboard. slug is the dashboard URL (/<slug>)
+# and the prefix of the browser's offline submission cache.
+PARISHES = [
+    {'name': 'Westmoreland', 'slug': 'westmoreland', 'color': '#667eea'},  # Blue
+    {'name': 'Trelawny', 'slug': 'trelawny', 'color': '#28a745'},          # Green
+    {'name': 'Hanover', 'slug': 'hanover', 'color': '#dc3545'},            # Red
+    {'name': 'St. James', 'slug': 'st_james', 'color': '#fd7e14'},         # Orange
+]
+
+PARISH_NAMES = [parish['name'] for parish in PARISHES]
+
+def get_parish(name):
+    """Returns the catalog entry for a parish name, or None"""
+    return next((parish for parish in PARISHES if parish['name'] == name), None)
+
 def get_all_supplies():
     """Returns all water supplies with parish information"""
     return [
@@ -0,0 +1,57 @@
+"""
+Streamed ZIP archives
+
+Writes a ZIP archive as a sequence of byte chunks, one per member, for use
+as a streamed Flask response. zipfile is given a write-only sink instead of
+a file; because the sink cannot seek, zipfile puts each member's sizes and
+CRC in a data descriptor after its data, so nothing has to be rewritten and
+only the member being written is ever held in memory (plus the central
+directory, a few dozen bytes per member, written at the end).
+
+    def generate():
+        yield from stream_zip((name, data, date_time) for ... in rows)
+    return Response(generate(), mimetype='application/zip')
+"""
+import time
+import zipfile
+
+
+class _Sink:
+    """Write-only file object collecting the bytes written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(members):
+    """
+    Yield the ZIP archive of ``members``, an iterable of (name, data,
+    date_time) where data is bytes and date_time a (Y, M, D, h, m, s) tuple or
+    None for now. ``members`` is consumed lazily.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data, date_time in members:
+            info = zipfile.ZipInfo(name, date_time=date_time or time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            yield sink.drain()
+    yield sink.drain()